@@ -0,0 +1,327 @@
+"""
+Mergeable summary accumulators.
+
+A SummaryAccumulator folds CSV chunks into running state (counts, moments,
+min/max, type counts, pairwise co-moments and a quantile sketch per numeric
+column). The state is JSON-serialisable so it can be kept on the Dataset and
+extended later: appending a delta only costs O(delta), never a re-read of
+the rows already stored.
+
+Moments are merged with Chan et al.'s parallel formulas, so counts, means,
+std, min/max, per-Type aggregates and correlations are exact; percentiles
+and IQR outlier counts come from the sketch and are approximate.
+"""
+import math
+from collections import Counter
+from itertools import combinations
+
+import numpy as np
+import pandas as pd
+
+PERCENTILES = (50, 95, 99)
+IQR_FACTOR = 1.5
+
+# Sketch size: roughly compression / 2 centroids are kept per column.
+SKETCH_COMPRESSION = 400
+
+
+def json_float(x):
+    """JSON-safe float: NaN/inf become None."""
+    if x is None:
+        return None
+    x = float(x)
+    return x if math.isfinite(x) else None
+
+
+# Moments are [n, mean, m2, min, max]; m2 is the sum of squared deviations.
+EMPTY_MOMENTS = [0, 0.0, 0.0, None, None]
+
+
+def _moments(values):
+    if values.size == 0:
+        return list(EMPTY_MOMENTS)
+    mean = float(values.mean())
+    return [
+        int(values.size),
+        mean,
+        float(((values - mean) ** 2).sum()),
+        float(values.min()),
+        float(values.max()),
+    ]
+
+
+def _merge_moments(a, b):
+    if a[0] == 0:
+        return list(b)
+    if b[0] == 0:
+        return list(a)
+    n = a[0] + b[0]
+    delta = b[1] - a[1]
+    return [
+        n,
+        a[1] + delta * b[0] / n,
+        a[2] + b[2] + delta * delta * a[0] * b[0] / n,
+        min(a[3], b[3]),
+        max(a[4], b[4]),
+    ]
+
+
+# Co-moments are [n, mean_x, mean_y, m2_x, m2_y, c_xy] over rows where
+# both columns are present.
+EMPTY_COMOMENTS = [0, 0.0, 0.0, 0.0, 0.0, 0.0]
+
+
+def _comoments(x, y):
+    if x.size == 0:
+        return list(EMPTY_COMOMENTS)
+    mx, my = float(x.mean()), float(y.mean())
+    dx, dy = x - mx, y - my
+    return [int(x.size), mx, my, float((dx * dx).sum()), float((dy * dy).sum()),
+            float((dx * dy).sum())]
+
+
+def _merge_comoments(a, b):
+    if a[0] == 0:
+        return list(b)
+    if b[0] == 0:
+        return list(a)
+    n = a[0] + b[0]
+    f = a[0] * b[0] / n
+    dx, dy = b[1] - a[1], b[2] - a[2]
+    return [
+        n,
+        a[1] + dx * b[0] / n,
+        a[2] + dy * b[0] / n,
+        a[3] + b[3] + dx * dx * f,
+        a[4] + b[4] + dy * dy * f,
+        a[5] + b[5] + dx * dy * f,
+    ]
+
+
+class QuantileSketch:
+    """
+    A small merging t-digest: values are kept as weighted centroids, with an
+    arcsine scale so the tails (p95/p99) stay sharp while the middle is
+    compressed harder. Sketches merge by concatenating and re-compressing.
+    """
+
+    def __init__(self, means=None, weights=None, compression=SKETCH_COMPRESSION):
+        self.compression = compression
+        self.means = np.asarray(means if means is not None else [], dtype=float)
+        self.weights = np.asarray(weights if weights is not None else [], dtype=float)
+
+    @property
+    def total(self):
+        return float(self.weights.sum())
+
+    def update(self, values):
+        if values.size:
+            self._compress(np.concatenate([self.means, values]),
+                           np.concatenate([self.weights, np.ones(values.size)]))
+
+    def merge(self, other):
+        self._compress(np.concatenate([self.means, other.means]),
+                       np.concatenate([self.weights, other.weights]))
+
+    def _compress(self, means, weights):
+        order = np.argsort(means, kind="stable")
+        means, weights = means[order], weights[order]
+        total = weights.sum()
+        if total == 0:
+            return
+        q_mid = (np.cumsum(weights) - weights / 2) / total
+        k = np.floor(
+            self.compression / (2 * math.pi)
+            * (np.arcsin(np.clip(2 * q_mid - 1, -1, 1)) + math.pi / 2)
+        )
+        # k is non-decreasing, so each bucket is a contiguous run
+        starts = np.flatnonzero(np.r_[True, k[1:] != k[:-1]])
+        w = np.add.reduceat(weights, starts)
+        self.means = np.add.reduceat(means * weights, starts) / w
+        self.weights = w
+
+    def _knots(self, lo, hi):
+        centers = np.cumsum(self.weights) - self.weights / 2
+        xs = np.r_[lo, self.means, hi]
+        ys = np.r_[0.0, centers, self.total]
+        return xs, ys
+
+    def quantiles(self, qs, lo, hi):
+        """Approximate quantiles for `qs` in [0, 1], clamped to [lo, hi]."""
+        xs, ys = self._knots(lo, hi)
+        return np.interp(np.asarray(qs) * self.total, ys, xs)
+
+    def rank(self, x, lo, hi):
+        """Approximate number of values <= x."""
+        xs, ys = self._knots(lo, hi)
+        return float(np.interp(x, xs, ys))
+
+    def to_state(self):
+        return {"means": self.means.tolist(), "weights": self.weights.tolist()}
+
+    @classmethod
+    def from_state(cls, state):
+        return cls(state["means"], state["weights"])
+
+
+def _type_key(value):
+    return None if pd.isna(value) else str(value)
+
+
+class SummaryAccumulator:
+    """Running, mergeable state behind a dataset summary."""
+
+    def __init__(self, numeric_cols):
+        self.numeric_cols = list(numeric_cols)
+        self.total_count = 0
+        self.moments = {col: list(EMPTY_MOMENTS) for col in self.numeric_cols}
+        self.sketches = {col: QuantileSketch() for col in self.numeric_cols}
+        self.pairs = {
+            pair: list(EMPTY_COMOMENTS) for pair in combinations(self.numeric_cols, 2)
+        }
+        self.types = Counter()
+        self.by_type = {}
+
+    def update(self, chunk):
+        """Fold one DataFrame chunk into the running state."""
+        self.total_count += len(chunk)
+        numeric = {
+            col: pd.to_numeric(chunk[col], errors='coerce').to_numpy(dtype=float, na_value=np.nan)
+            for col in self.numeric_cols
+        }
+
+        for col, values in numeric.items():
+            present = values[~np.isnan(values)]
+            self.moments[col] = _merge_moments(self.moments[col], _moments(present))
+            self.sketches[col].update(present)
+
+        for (a, b) in self.pairs:
+            both = ~np.isnan(numeric[a]) & ~np.isnan(numeric[b])
+            self.pairs[(a, b)] = _merge_comoments(
+                self.pairs[(a, b)], _comoments(numeric[a][both], numeric[b][both])
+            )
+
+        codes, uniques = pd.factorize(chunk["Type"], use_na_sentinel=False)
+        for code, eq_type in enumerate(uniques):
+            eq_type = _type_key(eq_type)
+            rows = codes == code
+            count = int(rows.sum())
+            self.types[eq_type] += count
+            group = self.by_type.setdefault(eq_type, {
+                "count": 0,
+                "moments": {col: list(EMPTY_MOMENTS) for col in self.numeric_cols},
+            })
+            group["count"] += count
+            for col, values in numeric.items():
+                sub = values[rows]
+                group["moments"][col] = _merge_moments(
+                    group["moments"][col], _moments(sub[~np.isnan(sub)])
+                )
+
+    def merge(self, other):
+        """Merge another accumulator (e.g. built from a delta) into this one."""
+        self.total_count += other.total_count
+        for col in self.numeric_cols:
+            self.moments[col] = _merge_moments(self.moments[col], other.moments[col])
+            self.sketches[col].merge(other.sketches[col])
+        for pair in self.pairs:
+            self.pairs[pair] = _merge_comoments(self.pairs[pair], other.pairs[pair])
+        self.types.update(other.types)
+        for eq_type, group in other.by_type.items():
+            mine = self.by_type.setdefault(eq_type, {
+                "count": 0,
+                "moments": {col: list(EMPTY_MOMENTS) for col in self.numeric_cols},
+            })
+            mine["count"] += group["count"]
+            for col in self.numeric_cols:
+                mine["moments"][col] = _merge_moments(mine["moments"][col], group["moments"][col])
+
+    # ---------- summary ----------
+
+    @staticmethod
+    def _describe(m):
+        n, mean, m2, lo, hi = m
+        return {
+            "count": n,
+            "mean": json_float(mean) if n else None,
+            "min": json_float(lo),
+            "max": json_float(hi),
+            "std": json_float(math.sqrt(m2 / (n - 1))) if n > 1 else None,
+        }
+
+    def _column_stats(self, col):
+        m = self.moments[col]
+        if m[0] == 0:
+            return {"count": 0}
+        stats = self._describe(m)
+        lo, hi = m[3], m[4]
+        sketch = self.sketches[col]
+        q1, q3, *pcts = sketch.quantiles([0.25, 0.75, *(p / 100 for p in PERCENTILES)], lo, hi)
+        iqr = q3 - q1
+        below = sketch.rank(q1 - IQR_FACTOR * iqr, lo, hi)
+        above = m[0] - sketch.rank(q3 + IQR_FACTOR * iqr, lo, hi)
+        stats.update({
+            "q1": json_float(q1),
+            "q3": json_float(q3),
+            "outliers": int(round(max(below, 0) + max(above, 0))),
+        })
+        for p, v in zip(PERCENTILES, pcts):
+            stats[f"p{p}"] = json_float(v)
+        return stats
+
+    def _correlation(self):
+        corr = {col: {col: None for col in self.numeric_cols} for col in self.numeric_cols}
+        for col in self.numeric_cols:
+            if self.moments[col][0] > 1 and self.moments[col][2] > 0:
+                corr[col][col] = 1.0
+        for (a, b), (n, _, _, m2x, m2y, cxy) in self.pairs.items():
+            r = cxy / math.sqrt(m2x * m2y) if n > 1 and m2x > 0 and m2y > 0 else None
+            corr[a][b] = corr[b][a] = json_float(r)
+        return corr
+
+    def result(self):
+        by_type = {}
+        for eq_type in sorted(self.by_type, key=lambda t: (t is None, t or "")):
+            group = self.by_type[eq_type]
+            by_type[eq_type] = {"count": group["count"]}
+            for col in self.numeric_cols:
+                by_type[eq_type][col] = self._describe(group["moments"][col])
+
+        return {
+            "total_count": self.total_count,
+            "averages": {
+                col: self.moments[col][1] if self.moments[col][0] else None
+                for col in self.numeric_cols
+            },
+            "type_distribution": dict(self.types.most_common()),
+            "statistics": {col: self._column_stats(col) for col in self.numeric_cols},
+            "by_type": by_type,
+            "correlation": self._correlation(),
+            "quantiles": "approximate",
+        }
+
+    # ---------- persistence ----------
+
+    def to_state(self):
+        return {
+            "numeric_cols": self.numeric_cols,
+            "total_count": self.total_count,
+            "moments": self.moments,
+            "sketches": {col: s.to_state() for col, s in self.sketches.items()},
+            "pairs": [[a, b, m] for (a, b), m in self.pairs.items()],
+            "types": [[t, n] for t, n in self.types.items()],
+            "by_type": [[t, g] for t, g in self.by_type.items()],
+        }
+
+    @classmethod
+    def from_state(cls, state):
+        acc = cls(state["numeric_cols"])
+        acc.total_count = state["total_count"]
+        acc.moments = state["moments"]
+        acc.sketches = {
+            col: QuantileSketch.from_state(s) for col, s in state["sketches"].items()
+        }
+        acc.pairs = {(a, b): m for a, b, m in state["pairs"]}
+        acc.types = Counter({t: n for t, n in state["types"]})
+        acc.by_type = {t: g for t, g in state["by_type"]}
+        return acc
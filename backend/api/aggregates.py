@@ -0,0 +1,169 @@
+"""
+Chart-ready aggregates computed from the column store.
+
+Everything here is sized by the request (number of bins / points / Types),
+never by the number of rows, so a chart of a multi-million-row dataset costs
+a few KB on the wire. Columns are read as memory-mapped float64 arrays and
+reduced with numpy.
+"""
+import numpy as np
+
+from .accumulators import IQR_FACTOR, json_float
+
+DEFAULT_BINS = 20
+MAX_BINS = 200
+DEFAULT_POINTS = 500
+MAX_POINTS = 5000
+
+# Types beyond this many (by row count) share one box, keyed OTHER_TYPES.
+MAX_BOX_TYPES = 12
+OTHER_TYPES = "(other types)"
+
+LTTB = "lttb"
+MINMAX = "minmax"
+DOWNSAMPLE_METHODS = (LTTB, MINMAX)
+
+
+def _floats(values):
+    return [json_float(v) for v in values]
+
+
+def histogram(values, bins=DEFAULT_BINS):
+    """Equal-width histogram of the non-missing values."""
+    values = values[~np.isnan(values)]
+    if values.size == 0:
+        return {"edges": [], "counts": []}
+    counts, edges = np.histogram(values, bins=bins)
+    return {"edges": _floats(edges), "counts": counts.tolist()}
+
+
+def box_stats(values):
+    """Five-number summary with IQR whiskers and an outlier count."""
+    values = values[~np.isnan(values)]
+    if values.size == 0:
+        return {"count": 0}
+    q1, median, q3 = np.percentile(values, [25, 50, 75])
+    iqr = q3 - q1
+    inside = values[(values >= q1 - IQR_FACTOR * iqr) & (values <= q3 + IQR_FACTOR * iqr)]
+    return {
+        "count": int(values.size),
+        "min": json_float(values.min()),
+        "q1": json_float(q1),
+        "median": json_float(median),
+        "q3": json_float(q3),
+        "max": json_float(values.max()),
+        "whisker_low": json_float(inside.min()),
+        "whisker_high": json_float(inside.max()),
+        "outliers": int(values.size - inside.size),
+    }
+
+
+def box_stats_by_type(codes, uniques, columns, max_types=MAX_BOX_TYPES):
+    """
+    Box stats per equipment Type for each of `columns` ({name: array}): the
+    `max_types` most common Types, plus OTHER_TYPES for all remaining rows.
+    Types come factorized (see ColumnarReader.factorize). Rows are grouped
+    with one stable sort, so the cost does not grow with the number of
+    distinct Types.
+    """
+    counts = np.bincount(codes, minlength=len(uniques))
+    by_count = sorted(
+        range(len(uniques)), key=lambda i: (-counts[i], uniques[i] is None, str(uniques[i]))
+    )
+    top = sorted(by_count[:max_types], key=lambda i: (uniques[i] is None, str(uniques[i])))
+    keys = [uniques[i] for i in top]
+    if len(uniques) > max_types:
+        keys.append(OTHER_TYPES)
+
+    # group number per row: position in `top`, or len(top) for the rest
+    group = np.full(len(uniques), len(top), dtype=np.int32)
+    group[top] = np.arange(len(top), dtype=np.int32)
+    group = group[codes]
+    order = np.argsort(group, kind="stable")
+    bounds = np.r_[0, np.cumsum(np.bincount(group, minlength=len(keys)))]
+
+    out = {key: {} for key in keys}
+    for col, values in columns.items():
+        grouped = values[order]
+        for g, key in enumerate(keys):
+            out[key][col] = box_stats(grouped[bounds[g]:bounds[g + 1]])
+    return out
+
+
+def minmax_downsample(x, y, points):
+    """
+    Keep the min and max of each of points // 2 equal buckets: cheap and
+    preserves spikes, which is what matters for sensor-style data.
+    """
+    n_buckets = max(points // 2, 1)
+    if y.size <= points:
+        return x, y
+    starts = np.linspace(0, y.size, n_buckets + 1).astype(np.int64)[:-1]
+    # reduceat gives per-bucket extremes; map them back to positions
+    lo = np.minimum.reduceat(y, starts)
+    hi = np.maximum.reduceat(y, starts)
+    bucket = np.repeat(np.arange(n_buckets), np.diff(np.r_[starts, y.size]))
+    is_lo = y == lo[bucket]
+    is_hi = y == hi[bucket]
+    first_lo = np.unique(bucket[is_lo], return_index=True)[1]
+    first_hi = np.unique(bucket[is_hi], return_index=True)[1]
+    keep = np.union1d(np.flatnonzero(is_lo)[first_lo], np.flatnonzero(is_hi)[first_hi])
+    return x[keep], y[keep]
+
+
+def lttb_downsample(x, y, points):
+    """
+    Largest-Triangle-Three-Buckets: keeps the point of each bucket that
+    forms the largest triangle with its neighbours, which preserves the
+    visual shape of the line far better than striding.
+    """
+    n = y.size
+    if points >= n or points < 3:
+        return x, y
+
+    edges = np.linspace(1, n - 1, points - 1).astype(np.int64)
+    keep = np.empty(points, dtype=np.int64)
+    keep[0], keep[-1] = 0, n - 1
+    a = 0
+    for i in range(points - 2):
+        start, stop = edges[i], edges[i + 1]
+        # average of the next bucket (or the last point)
+        if i + 2 < len(edges):
+            nx = x[stop:edges[i + 2]].mean()
+            ny = y[stop:edges[i + 2]].mean()
+        else:
+            nx, ny = x[-1], y[-1]
+        bx, by = x[start:stop], y[start:stop]
+        area = np.abs((x[a] - nx) * (by - y[a]) - (x[a] - bx) * (ny - y[a]))
+        a = start + int(area.argmax())
+        keep[i + 1] = a
+    return x[keep], y[keep]
+
+
+def downsample(values, points=DEFAULT_POINTS, method=LTTB):
+    """
+    Downsample a column against its row index. Missing values are skipped,
+    so `x` carries the original row numbers.
+    """
+    x = np.flatnonzero(~np.isnan(values))
+    y = np.asarray(values[x], dtype=float)
+    fn = lttb_downsample if method == LTTB else minmax_downsample
+    x, y = fn(x.astype(float), y, points)
+    return {"x": x.astype(np.int64).tolist(), "y": _floats(y)}
+
+
+def compute_aggregates(reader, columns, bins=DEFAULT_BINS, points=DEFAULT_POINTS,
+                       method=LTTB, max_types=MAX_BOX_TYPES):
+    """
+    Histograms, per-Type box stats and downsampled series for `columns`.
+    points=0 skips the series (e.g. for histogram-only charts).
+    """
+    data = {col: np.asarray(reader.column(col)) for col in columns}
+    return {
+        "histograms": {col: histogram(values, bins) for col, values in data.items()},
+        "box": box_stats_by_type(*reader.factorize("Type"), data, max_types)
+        if reader.row_count else {},
+        "series": {
+            col: downsample(values, points, method) for col, values in data.items()
+        } if points else {},
+    }
@@ -0,0 +1,119 @@
+"""
+Token authentication with an in-process cache.
+
+DRF's TokenAuthentication looks up the Token and its User on every request.
+CachedTokenAuthentication keeps recently used tokens in a small LRU
+(AUTH_TOKEN_CACHE_SIZE entries, each trusted for AUTH_TOKEN_CACHE_TTL
+seconds), so polling clients authenticate without touching the database.
+
+Entries are dropped as soon as their token is deleted (logout) or their
+user is saved or deleted (deactivation, password change). Those signals
+only reach this process, and queryset .update() sends none, so the TTL is
+what bounds staleness across worker processes and for bulk updates.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.utils.translation import gettext_lazy as _
+from rest_framework import exceptions
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+
+
+class TokenCache:
+    """Thread-safe LRU of token key -> (token, expiry), with a TTL."""
+
+    def __init__(self, size, ttl):
+        self.size, self.ttl = size, ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        # bumped by every invalidation, so a lookup that raced one is not stored
+        self._generation = 0
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            token, expires = entry
+            if expires < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return token
+
+    @property
+    def generation(self):
+        return self._generation
+
+    def put(self, key, token, generation):
+        with self._lock:
+            if generation != self._generation:
+                return
+            self._entries[key] = (token, time.monotonic() + self.ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.size:
+                self._entries.popitem(last=False)
+
+    def discard(self, key):
+        with self._lock:
+            self._generation += 1
+            self._entries.pop(key, None)
+
+    def discard_user(self, user_id):
+        with self._lock:
+            self._generation += 1
+            for key in [k for k, (t, _) in self._entries.items() if t.user_id == user_id]:
+                del self._entries[key]
+
+    def clear(self):
+        with self._lock:
+            self._generation += 1
+            self._entries.clear()
+
+
+token_cache = TokenCache(
+    size=getattr(settings, "AUTH_TOKEN_CACHE_SIZE", 1024),
+    ttl=getattr(settings, "AUTH_TOKEN_CACHE_TTL", 60),
+)
+
+
+def get_token(key):
+    """The active user's Token for `key` (with .user loaded), or None."""
+    token = token_cache.get(key)
+    if token is not None:
+        return token
+
+    generation = token_cache.generation
+    token = Token.objects.select_related('user').filter(key=key).first()
+    if token is None or not token.user.is_active:
+        return None
+    token_cache.put(key, token, generation)
+    return token
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """TokenAuthentication served from token_cache when possible."""
+
+    def authenticate_credentials(self, key):
+        token = get_token(key)
+        if token is None:
+            raise exceptions.AuthenticationFailed(_('Invalid token.'))
+        return (token.user, token)
+
+
+@receiver(post_delete, sender=Token, dispatch_uid="api.auth.token_deleted")
+@receiver(post_save, sender=Token, dispatch_uid="api.auth.token_saved")
+def _token_changed(sender, instance, **kwargs):
+    token_cache.discard(instance.key)
+
+
+@receiver(post_delete, sender=get_user_model(), dispatch_uid="api.auth.user_deleted")
+@receiver(post_save, sender=get_user_model(), dispatch_uid="api.auth.user_saved")
+def _user_changed(sender, instance, **kwargs):
+    token_cache.discard_user(instance.pk)
@@ -0,0 +1,251 @@
+"""
+Benchmarks for ingestion and the read paths, on synthetic data.
+
+generate_csv() writes a seeded equipment CSV shaped like the files users
+upload (generated_equipment_data.csv): the same columns, equipment named
+"<Type>-<letter><n>" that repeats across rows, and a small share of dirty
+cells (blanks, "N/A", typos) in the numeric columns. The same seed and size
+always produce the same bytes.
+
+run_benchmarks() ingests one CSV per size and times each scenario, recording
+wall time, peak RSS and the number of DB queries. compare_to_baseline()
+flags results that got slower or heavier than a stored baseline by more
+than a threshold. `manage.py benchmark` drives both against a throwaway
+database and media directory.
+"""
+import json
+import os
+import platform
+import sys
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from .reports import iter_report
+from .services import compute_summary, create_dataset_from_csv
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+SCENARIOS = ("ingest", "summary", "history", "rows", "report")
+DEFAULT_SIZES = (1_000, 100_000)
+DEFAULT_THRESHOLD = 0.25
+# below this many seconds, timing noise outweighs any regression
+MIN_REGRESSION_SECONDS = 0.05
+BASELINE_PATH = os.path.join(os.path.dirname(__file__), "benchmark_baseline.json")
+
+# (Type, name letter, Flowrate, Pressure, Temperature) as (mean, std)
+EQUIPMENT_TYPES = [
+    ("Pump", "A", (115, 15), (5.6, 0.4), (116, 6)),
+    ("Valve", "B", (95, 10), (6.1, 0.3), (121, 5)),
+    ("Compressor", "C", (180, 20), (7.2, 0.5), (131, 7)),
+    ("HeatExchanger", "D", (200, 25), (4.9, 0.4), (141, 8)),
+    ("Reactor", "E", (155, 18), (6.9, 0.5), (149, 9)),
+    ("Condenser", "F", (135, 12), (5.5, 0.3), (111, 5)),
+]
+DIRTY_VALUES = np.array(["", "N/A", "error", "--", "1.2.3", "n/a", "?"], dtype=object)
+GENERATE_CHUNK = 200_000
+
+
+def generate_csv(path, rows, seed=0, dirty=0.01):
+    """
+    Write `rows` synthetic readings to `path`. About `dirty` of the numeric
+    cells are replaced by non-numeric junk. Deterministic for a given seed.
+    """
+    rng = np.random.default_rng(seed)
+    equipment = max(10, rows // 50)
+    with open(path, "w", newline="") as f:
+        f.write("Equipment Name,Type,Flowrate,Pressure,Temperature\n")
+        for start in range(0, rows, GENERATE_CHUNK):
+            n = min(GENERATE_CHUNK, rows - start)
+            kinds = rng.integers(0, len(EQUIPMENT_TYPES), n)
+            numbers = rng.integers(1, equipment + 1, n)
+            chunk = {
+                "Equipment Name": [
+                    f"{EQUIPMENT_TYPES[k][0]}-{EQUIPMENT_TYPES[k][1]}{i}"
+                    for k, i in zip(kinds.tolist(), numbers.tolist())
+                ],
+                "Type": [EQUIPMENT_TYPES[k][0] for k in kinds.tolist()],
+            }
+            for c, col in enumerate(("Flowrate", "Pressure", "Temperature"), start=2):
+                mean = np.array([t[c][0] for t in EQUIPMENT_TYPES])[kinds]
+                std = np.array([t[c][1] for t in EQUIPMENT_TYPES])[kinds]
+                values = np.round(rng.normal(mean, std), 1).astype(object)
+                junk = rng.random(n) < dirty
+                values[junk] = rng.choice(DIRTY_VALUES, int(junk.sum()))
+                chunk[col] = values
+            pd.DataFrame(chunk).to_csv(f, header=False, index=False)
+    return path
+
+
+def _rss_bytes():
+    """Current resident set size, if the platform exposes it cheaply."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+def _max_rss_bytes():
+    """Peak RSS of the whole process so far (ru_maxrss is KiB on Linux)."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+class _PeakRSS:
+    """
+    Samples RSS on a background thread while the block runs. Without
+    /proc, falls back to the process-wide peak from getrusage.
+    """
+
+    INTERVAL = 0.005
+
+    def __enter__(self):
+        self.peak = _rss_bytes()
+        self._stop = threading.Event()
+        if self.peak is not None:
+            self._thread = threading.Thread(target=self._sample, daemon=True)
+            self._thread.start()
+        return self
+
+    def _sample(self):
+        while not self._stop.wait(self.INTERVAL):
+            self.peak = max(self.peak, _rss_bytes() or 0)
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        if self.peak is None:
+            self.peak = _max_rss_bytes()
+        else:
+            self._thread.join()
+            self.peak = max(self.peak, _rss_bytes() or 0)
+
+
+def measure(fn):
+    """Run fn(); return (its result, {seconds, peak_rss_mb, queries})."""
+    with _PeakRSS() as rss, CaptureQueriesContext(connection) as queries:
+        started = time.perf_counter()
+        result = fn()
+        seconds = time.perf_counter() - started
+    return result, {
+        "seconds": round(seconds, 4),
+        "peak_rss_mb": round(rss.peak / 2**20, 1) if rss.peak else None,
+        "queries": len(queries.captured_queries),
+    }
+
+
+def _get(client, url, **params):
+    response = client.get(url, params)
+    assert response.status_code == 200, (url, response.status_code)
+    return response
+
+
+def _drain(chunks):
+    return sum(len(chunk) for chunk in chunks)
+
+
+def run_benchmarks(sizes=DEFAULT_SIZES, scenarios=SCENARIOS, seed=0, data_dir=None, log=None):
+    """
+    Benchmark each scenario at each size (rows); returns
+    {str(size): {scenario: measurement}}. Needs a database with the schema
+    and a writable MEDIA_ROOT; generated CSVs are kept in `data_dir`.
+    Ingestion always runs, since the other scenarios read its dataset.
+    """
+    client = APIClient()
+    client.force_authenticate(user=User(username="benchmark"))
+    results = {}
+    for size in sizes:
+        path = os.path.join(data_dir, f"equipment_{size}_s{seed}.csv")
+        if not os.path.exists(path):
+            generate_csv(path, size, seed=seed)
+
+        def ingest():
+            with open(path, "rb") as f:
+                return create_dataset_from_csv(f, os.path.basename(path))
+
+        def summary():
+            with open(path, "rb") as f:
+                return compute_summary(f)
+
+        ds, ingested = measure(ingest)
+        runs = {
+            "summary": summary,
+            "history": lambda: _get(client, "/api/history/"),
+            "rows": lambda: _get(client, f"/api/dataset/{ds.pk}/rows/", sort="-Flowrate",
+                                 search="Pump", offset=size // 20, limit=100),
+            "report": lambda: _drain(iter_report(ds)),
+        }
+        measured = results[str(size)] = {"ingest": ingested}
+        for name in scenarios:
+            if name in runs:
+                measured[name] = measure(runs[name])[1]
+        if log:
+            for name, m in measured.items():
+                log(f"{size:>10} {name:<8} {_format(m)}")
+    return results
+
+
+def _format(m):
+    rss = f"{m['peak_rss_mb']:.1f} MB" if m["peak_rss_mb"] is not None else "n/a"
+    return f"{m['seconds']:9.3f} s  {rss:>10}  {m['queries']:>4} queries"
+
+
+def environment():
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "database": connection.vendor,
+    }
+
+
+def load_baseline(path=BASELINE_PATH):
+    with open(path) as f:
+        return json.load(f)
+
+
+def save_baseline(results, seed, path=BASELINE_PATH):
+    with open(path, "w") as f:
+        json.dump({"seed": seed, "environment": environment(), "results": results},
+                  f, indent=2, sort_keys=True)
+        f.write("\n")
+
+
+def compare_to_baseline(results, baseline, threshold=DEFAULT_THRESHOLD):
+    """
+    Human-readable regressions against `baseline`: wall time or peak RSS up
+    by more than `threshold` (a fraction), or more DB queries at all.
+    Sizes and scenarios missing from either side are skipped.
+    """
+    regressions = []
+    for size, scenarios in results.items():
+        for name, m in scenarios.items():
+            base = baseline.get("results", {}).get(size, {}).get(name)
+            if not base:
+                continue
+            label = f"{name} @ {size} rows"
+            if (m["seconds"] > base["seconds"] * (1 + threshold)
+                    and m["seconds"] - base["seconds"] > MIN_REGRESSION_SECONDS):
+                regressions.append(
+                    f"{label}: {m['seconds']:.3f} s vs {base['seconds']:.3f} s baseline"
+                )
+            if (m["peak_rss_mb"] and base.get("peak_rss_mb")
+                    and m["peak_rss_mb"] > base["peak_rss_mb"] * (1 + threshold)):
+                regressions.append(
+                    f"{label}: peak RSS {m['peak_rss_mb']} MB vs {base['peak_rss_mb']} MB baseline"
+                )
+            if m["queries"] > base["queries"]:
+                regressions.append(
+                    f"{label}: {m['queries']} queries vs {base['queries']} baseline"
+                )
+    return regressions
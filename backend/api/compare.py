@@ -0,0 +1,198 @@
+"""
+Cross-dataset comparison and trends.
+
+Dataset-level and per-Type deltas come straight from the stored summaries,
+so no rows are read. Per-equipment deltas join the two column stores on
+Equipment Name: each side is reduced to one row per equipment (the mean of
+its readings) with a pandas groupby, then both sides are aligned with a
+single outer join. The joined table is cached per pair of dataset versions,
+so paging, sorting and filtering it are cheap.
+"""
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+
+from .accumulators import json_float
+from .services import NUMERIC_COLS
+from .storage import ColumnarReader
+
+NAME_COL = "Equipment Name"
+TYPE_COL = "Type"
+
+# equipment status in the comparison
+BOTH = "both"
+ADDED = "added"      # only in the target dataset
+REMOVED = "removed"  # only in the base dataset
+STATUSES = (BOTH, ADDED, REMOVED)
+
+COLUMN_METRICS = ("count", "mean", "std", "min", "max")
+TYPE_METRICS = ("mean", "std", "min", "max")
+TREND_METRICS = ("mean", "std", "min", "max")
+
+COMPARE_CACHE_SIZE = 4
+
+
+def _change(base, target):
+    """{base, target, delta, pct_change} for one metric (None-safe)."""
+    delta = pct = None
+    if base is not None and target is not None:
+        delta = json_float(target - base)
+        if base:
+            pct = json_float((target - base) / abs(base) * 100)
+    return {"base": base, "target": target, "delta": delta, "pct_change": pct}
+
+
+def _changes(base, target, metrics):
+    return {m: _change(base.get(m), target.get(m)) for m in metrics}
+
+
+def compare_summaries(base, target):
+    """
+    Dataset-level and per-Type deltas of the numeric columns between two
+    datasets, from their stored summaries.
+    """
+    bs, ts = base.summary or {}, target.summary or {}
+    b_stats, t_stats = bs.get("statistics", {}), ts.get("statistics", {})
+    b_types, t_types = bs.get("by_type", {}), ts.get("by_type", {})
+
+    by_type = {}
+    for eq_type in sorted(set(b_types) | set(t_types)):
+        b, t = b_types.get(eq_type, {}), t_types.get(eq_type, {})
+        by_type[eq_type] = {
+            "count": _change(b.get("count", 0), t.get("count", 0)),
+            **{col: _changes(b.get(col, {}), t.get(col, {}), TYPE_METRICS)
+               for col in NUMERIC_COLS},
+        }
+
+    return {
+        "total_count": _change(bs.get("total_count", 0), ts.get("total_count", 0)),
+        "columns": {
+            col: _changes(b_stats.get(col, {}), t_stats.get(col, {}), COLUMN_METRICS)
+            for col in NUMERIC_COLS
+        },
+        "by_type": by_type,
+    }
+
+
+# ---------- per equipment ----------
+
+def equipment_means(reader):
+    """
+    One row per Equipment Name: mean of each numeric column, the (last)
+    Type and the number of readings.
+    """
+    frame = pd.DataFrame({
+        NAME_COL: reader.column(NAME_COL),
+        TYPE_COL: reader.column(TYPE_COL),
+        **{col: np.asarray(reader.column(col)) for col in NUMERIC_COLS},
+    })
+    grouped = frame[frame[NAME_COL].notna()].groupby(NAME_COL, sort=False)
+    out = grouped[NUMERIC_COLS].mean()
+    out[TYPE_COL] = grouped[TYPE_COL].last()
+    out["readings"] = grouped.size()
+    return out
+
+
+def equipment_deltas(base, target):
+    """Per-equipment comparison table of two datasets (cached, read-only)."""
+    return _equipment_table(base.storage_path, base.version_tag,
+                            target.storage_path, target.version_tag)
+
+
+@lru_cache(maxsize=COMPARE_CACHE_SIZE)
+def _equipment_table(base_path, base_version, target_path, target_version):
+    base = equipment_means(ColumnarReader(base_path))
+    target = equipment_means(ColumnarReader(target_path))
+    joined = base.join(target, how="outer", lsuffix="_base", rsuffix="_target", sort=True)
+
+    in_base = joined["readings_base"].notna().to_numpy()
+    in_target = joined["readings_target"].notna().to_numpy()
+    out = pd.DataFrame({
+        NAME_COL: joined.index.to_numpy(dtype=object),
+        TYPE_COL: joined[f"{TYPE_COL}_target"].fillna(joined[f"{TYPE_COL}_base"]).to_numpy(),
+        "status": np.where(in_base & in_target, BOTH, np.where(in_target, ADDED, REMOVED)),
+        "readings_base": joined["readings_base"].fillna(0).astype(np.int64).to_numpy(),
+        "readings_target": joined["readings_target"].fillna(0).astype(np.int64).to_numpy(),
+    })
+    for col in NUMERIC_COLS:
+        b = joined[f"{col}_base"].to_numpy(dtype=float)
+        t = joined[f"{col}_target"].to_numpy(dtype=float)
+        out[f"{col}_base"] = b
+        out[f"{col}_target"] = t
+        out[f"{col}_delta"] = t - b
+    return out
+
+
+def clear_compare_cache():
+    """Forget cached comparison tables, e.g. after datasets were deleted."""
+    _equipment_table.cache_clear()
+
+
+def equipment_columns():
+    return [NAME_COL, TYPE_COL, "status", "readings_base", "readings_target"] + [
+        f"{col}_{part}" for col in NUMERIC_COLS for part in ("base", "target", "delta")
+    ]
+
+
+def select_equipment(table, status=None, type_=None, sort=None, descending=False,
+                     by_magnitude=False):
+    """Row positions of `table` after filtering and sorting (stable)."""
+    mask = np.ones(len(table), dtype=bool)
+    if status:
+        mask &= table["status"].to_numpy() == status
+    if type_:
+        mask &= table[TYPE_COL].to_numpy() == type_
+    order = np.flatnonzero(mask)
+    if sort:
+        values = table[sort].iloc[order]
+        if by_magnitude and values.dtype.kind == "f":
+            values = values.abs()
+        ranked = values.sort_values(ascending=not descending, kind="stable",
+                                    na_position="last")
+        order = ranked.index.to_numpy()  # the table has a RangeIndex
+    return order
+
+
+def equipment_rows(table, positions):
+    """Rows at `positions` as JSON-ready dicts."""
+    rows = table.iloc[positions].to_dict("records")
+    for row in rows:
+        for key, value in row.items():
+            if isinstance(value, float):
+                row[key] = json_float(value)
+            elif isinstance(value, np.integer):
+                row[key] = int(value)
+    return rows
+
+
+# ---------- trends ----------
+
+def trend_series(datasets):
+    """
+    Summary metrics over time as parallel arrays (oldest first), ready to
+    plot: one entry per dataset in `datasets` (dicts with id, name,
+    uploaded_at and summary).
+    """
+    metrics = {col: {m: [] for m in TREND_METRICS} for col in NUMERIC_COLS}
+    series = {"dataset_ids": [], "filenames": [], "uploaded_at": [], "total_count": []}
+    types = {}
+
+    for i, ds in enumerate(datasets):
+        summary = ds["summary"] or {}
+        series["dataset_ids"].append(ds["id"])
+        series["filenames"].append(ds["name"])
+        series["uploaded_at"].append(ds["uploaded_at"])
+        series["total_count"].append(summary.get("total_count", 0))
+        stats = summary.get("statistics", {})
+        for col in NUMERIC_COLS:
+            for m in TREND_METRICS:
+                metrics[col][m].append(stats.get(col, {}).get(m))
+        for eq_type, count in summary.get("type_distribution", {}).items():
+            # a Type missing from earlier datasets had zero units there
+            types.setdefault(eq_type, [0] * i).append(count)
+        for counts in types.values():
+            if len(counts) < i + 1:
+                counts.append(0)
+
+    return {**series, "metrics": metrics, "type_counts": types}
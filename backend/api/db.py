@@ -0,0 +1,30 @@
+"""
+Single-writer queue for dataset writes.
+
+SQLite lets one connection write at a time. With DATABASE_SINGLE_WRITER on
+(the default for SQLite), dataset writes in this process take turns on a
+lock instead of all opening transactions and polling SQLite's busy timeout.
+Reads never wait for it, and under WAL they don't wait for SQLite's write
+lock either.
+
+The lock is per process. Writers in other worker processes are serialised
+by SQLite alone: each transaction begins IMMEDIATE, taking the write lock
+up front, and waits out the busy timeout (backend/database.py) if another
+process holds it.
+"""
+import threading
+from contextlib import contextmanager
+
+from django.conf import settings
+
+_write_lock = threading.RLock()
+
+
+@contextmanager
+def single_writer():
+    """Hold the process-wide write lock if DATABASE_SINGLE_WRITER is set."""
+    if not getattr(settings, "DATABASE_SINGLE_WRITER", False):
+        yield
+        return
+    with _write_lock:
+        yield
@@ -0,0 +1,159 @@
+"""
+Server-sent events.
+
+Events (dataset created/updated, job progress) are rows in the Event table,
+written once the publishing transaction commits. Any process can publish:
+request threads, ingestion workers, retention, `manage.py` commands. The id
+orders them, and a reconnecting client (Last-Event-ID) is replayed what it
+missed from the table.
+
+Each ASGI worker process tails the table with one query per POLL_SECONDS,
+however many /api/events/ streams it serves, and fans new rows out to them.
+Each stream owns an asyncio.Queue on the event loop. Only the newest
+HISTORY_SIZE events are kept.
+"""
+import asyncio
+import json
+import logging
+
+from asgiref.sync import sync_to_async
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import close_old_connections, transaction
+
+from .models import Event
+
+logger = logging.getLogger(__name__)
+
+DATASET_CREATED = "dataset.created"
+DATASET_UPDATED = "dataset.updated"
+JOB_PROGRESS = "job.progress"
+JOB_FINISHED = "job.finished"
+
+HISTORY_SIZE = 1000
+QUEUE_SIZE = 256
+POLL_SECONDS = 0.5
+HEARTBEAT_SECONDS = 15
+RETRY_MS = 3000
+
+
+def _insert(event, data):
+    row = Event.objects.create(event=event, data=json.dumps(data, cls=DjangoJSONEncoder))
+    # trim now and then rather than on every insert
+    if row.pk % 100 == 0:
+        Event.objects.filter(pk__lte=row.pk - HISTORY_SIZE).delete()
+
+
+def publish(event, data):
+    """
+    Publish once the current transaction (if any) commits. A failed insert
+    is logged; it never fails the write that published it.
+    """
+    transaction.on_commit(lambda: _insert(event, data), robust=True)
+
+
+def _events(after, upto=None):
+    """(id, event, data) of the stored events after id `after`, oldest first."""
+    close_old_connections()
+    rows = Event.objects.filter(pk__gt=after).order_by('pk')
+    if upto is not None:
+        rows = rows.filter(pk__lte=upto)
+    return list(rows.values_list('pk', 'event', 'data')[:HISTORY_SIZE])
+
+
+def _last_id():
+    close_old_connections()
+    return Event.objects.order_by('-pk').values_list('pk', flat=True).first() or 0
+
+
+class EventHub:
+    """Tails the Event table for the streams open in this process."""
+
+    def __init__(self):
+        self._loop = None
+        self._subscribers = set()
+        self._start_lock = None
+        self._task = None
+        self._cursor = 0
+
+    async def subscribe(self, last_id=None):
+        """
+        Register a queue on the running event loop; returns (queue, backlog)
+        where backlog holds the stored events after `last_id`. Everything
+        newer arrives on the queue, with no gap or overlap in between.
+        """
+        loop = asyncio.get_running_loop()
+        if loop is not self._loop:
+            # first stream in this process (or on a new loop, as in tests)
+            self._loop, self._start_lock, self._task = loop, asyncio.Lock(), None
+            self._subscribers = set()
+        async with self._start_lock:
+            if self._task is None:
+                self._cursor = await sync_to_async(_last_id, thread_sensitive=False)()
+                self._task = asyncio.create_task(self._tail())
+            queue = asyncio.Queue(maxsize=QUEUE_SIZE)
+            self._subscribers.add(queue)
+            upto = self._cursor
+
+        backlog = []
+        if last_id is not None and last_id < upto:
+            backlog = await sync_to_async(_events, thread_sensitive=False)(last_id, upto)
+        return queue, backlog
+
+    def unsubscribe(self, queue):
+        self._subscribers.discard(queue)
+
+    @property
+    def subscriber_count(self):
+        return len(self._subscribers)
+
+    async def _tail(self):
+        task = asyncio.current_task()
+        try:
+            while self._subscribers:
+                await asyncio.sleep(POLL_SECONDS)
+                try:
+                    messages = await sync_to_async(_events, thread_sensitive=False)(self._cursor)
+                except Exception:
+                    logger.exception("Reading events failed")
+                    continue
+                if messages:
+                    self._cursor = messages[-1][0]
+                for queue in list(self._subscribers):
+                    for message in messages:
+                        _offer(queue, message)
+        finally:
+            if self._task is task:
+                self._task = None
+
+
+def _offer(queue, message):
+    # a client that stopped reading loses its oldest events, never the newest
+    if queue.full():
+        queue.get_nowait()
+    queue.put_nowait(message)
+
+
+hub = EventHub()
+
+
+def format_event(message):
+    event_id, event, data = message
+    return f"id: {event_id}\nevent: {event}\ndata: {data}\n\n"
+
+
+async def stream(last_id=None):
+    """Async iterator of SSE frames for one client."""
+    queue, backlog = await hub.subscribe(last_id)
+    try:
+        yield f"retry: {RETRY_MS}\n\n"
+        for message in backlog:
+            yield format_event(message)
+        while True:
+            try:
+                message = await asyncio.wait_for(queue.get(), HEARTBEAT_SECONDS)
+            except asyncio.TimeoutError:
+                yield ": ping\n\n"  # keeps proxies from closing an idle stream
+                continue
+            yield format_event(message)
+    finally:
+        hub.unsubscribe(queue)
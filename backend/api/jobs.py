@@ -0,0 +1,193 @@
+"""
+Background ingestion jobs.
+
+Large uploads are spooled to disk and handed to a local thread pool instead
+of being parsed inside the request. Progress and the final result live on
+the Job row, so any worker process can answer /api/jobs/<id>/.
+
+Each progress report also bumps the row's updated_at. The pool lives in the
+process that queued the job, so a job silent for JOB_STALE_MINUTES is taken
+to have died with it (restart, crash): it no longer blocks its upload, and
+retention marks it failed (retention.fail_stale_jobs).
+"""
+import logging
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import connection
+from django.utils import timezone
+
+from . import events
+from .models import Job
+from .reports import build_report
+from .retention import prune_datasets
+from .services import create_dataset_from_csv, dataset_payload, reuse_duplicate
+from .storage import absolute_path
+from .uploads import INCOMING_DIR, complete_upload, open_source, remove_source, source_size
+
+logger = logging.getLogger(__name__)
+
+# Progress is written back at most this often (seconds).
+PROGRESS_INTERVAL = 0.5
+
+_executor = ThreadPoolExecutor(
+    max_workers=getattr(settings, "INGEST_WORKERS", 2),
+    thread_name_prefix="ingest",
+)
+
+_retention_lock = threading.Lock()
+_retention_queued = False
+
+
+class ProgressReader:
+    """File wrapper that reports how many bytes pandas has consumed."""
+
+    def __init__(self, f, on_progress):
+        self._f = f
+        self._on_progress = on_progress
+        self._done = 0
+        self._last = 0.0
+
+    def _count(self, n):
+        self._done += n
+        now = time.monotonic()
+        if now - self._last >= PROGRESS_INTERVAL:
+            self._last = now
+            self._on_progress(self._done)
+
+    def read(self, size=-1):
+        data = self._f.read(size)
+        self._count(len(data))
+        return data
+
+    def read1(self, size=-1):
+        data = self._f.read1(size)
+        self._count(len(data))
+        return data
+
+    def readinto(self, b):
+        n = self._f.readinto(b)
+        self._count(n or 0)
+        return n
+
+    def __getattr__(self, name):
+        return getattr(self._f, name)
+
+
+def spool_upload(uploaded_file):
+    """Copy an uploaded file to MEDIA_ROOT/incoming/; returns its relpath."""
+    relpath = os.path.join(INCOMING_DIR, f"{uuid.uuid4().hex}.csv")
+    path = absolute_path(relpath)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "wb") as out:
+        for chunk in uploaded_file.chunks():
+            out.write(chunk)
+    return relpath
+
+
+def enqueue_ingest(source_path, filename, upload_id=None, declared_hash=""):
+    """
+    Queue ingestion of a spooled CSV or, with `upload_id`, of a chunked
+    upload's parts (relative to MEDIA_ROOT). The parts are kept if ingestion
+    fails, so the upload can be completed again. A `declared_hash` is first
+    looked up among stored datasets, then checked on the ingest pass.
+    """
+    job = Job.objects.create(
+        filename=filename,
+        source_path=source_path,
+        bytes_total=source_size(source_path),
+    )
+    _executor.submit(_run, job.pk, upload_id, declared_hash)
+    return job
+
+
+def active_job(source_path):
+    """The queued or running (not stale) job ingesting `source_path`, if any."""
+    return Job.objects.active().filter(source_path=source_path).first()
+
+
+def schedule_retention():
+    """
+    Apply retention on the worker pool, off the request path. Uploads in a
+    burst share one run: nothing is queued while a run is still waiting.
+    """
+    global _retention_queued
+    with _retention_lock:
+        if _retention_queued:
+            return
+        _retention_queued = True
+    _executor.submit(_run_retention)
+
+
+def _run_retention():
+    global _retention_queued
+    with _retention_lock:
+        _retention_queued = False
+    try:
+        prune_datasets()
+    except Exception:
+        # the next upload (or `manage.py prune_datasets`) tries again
+        logger.exception("Retention run failed")
+    finally:
+        connection.close()
+
+
+def _run(job_id, upload_id=None, declared_hash=""):
+    # a job that waited in the queue until retention gave it up stays failed
+    started = Job.objects.filter(pk=job_id, status=Job.QUEUED).update(
+        status=Job.RUNNING, updated_at=timezone.now(),
+    )
+    if not started:
+        connection.close()
+        return
+    job = Job.objects.get(pk=job_id)
+
+    def report(done):
+        Job.objects.filter(pk=job_id).update(bytes_done=done, updated_at=timezone.now())
+        events.publish(events.JOB_PROGRESS, {
+            "job_id": job_id,
+            "filename": job.filename,
+            "bytes_done": done,
+            "bytes_total": job.bytes_total,
+            "progress": done / job.bytes_total if job.bytes_total else 0.0,
+        })
+
+    try:
+        ds = reuse_duplicate(declared_hash)
+        if ds is None:
+            with open_source(job.source_path) as f:
+                ds = create_dataset_from_csv(
+                    ProgressReader(f, report), name=job.filename, declared_hash=declared_hash,
+                )
+        if upload_id is not None:
+            complete_upload(upload_id)
+        schedule_retention()
+        Job.objects.filter(pk=job_id).update(
+            status=Job.SUCCEEDED,
+            bytes_done=job.bytes_total,
+            dataset=ds,
+            result=dataset_payload(ds),
+        )
+    except Exception as e:
+        Job.objects.filter(pk=job_id).update(status=Job.FAILED, error=str(e))
+        events.publish(events.JOB_FINISHED, {
+            "job_id": job_id, "status": Job.FAILED, "error": str(e), "dataset_id": None,
+        })
+    else:
+        events.publish(events.JOB_FINISHED, {
+            "job_id": job_id, "status": Job.SUCCEEDED, "error": "", "dataset_id": ds.id,
+        })
+        # Pre-render so the first report download is a cache hit; a failure
+        # here only means the report is rendered on request instead.
+        try:
+            build_report(ds)
+        except Exception:
+            logger.exception("Pre-rendering the report for dataset %s failed", ds.id)
+    finally:
+        if upload_id is None:
+            remove_source(job.source_path)
+        connection.close()
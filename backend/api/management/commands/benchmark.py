@@ -0,0 +1,97 @@
+import json
+import os
+import shutil
+import tempfile
+
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import (
+    override_settings, setup_databases, setup_test_environment, teardown_databases,
+    teardown_test_environment,
+)
+
+from api.benchmark import (
+    BASELINE_PATH, DEFAULT_SIZES, DEFAULT_THRESHOLD, SCENARIOS, compare_to_baseline,
+    load_baseline, run_benchmarks, save_baseline,
+)
+
+
+def _sizes(value):
+    """'1K,100K,1M' -> [1000, 100000, 1000000]"""
+    units = {"k": 1_000, "m": 1_000_000}
+    sizes = []
+    for part in value.split(","):
+        part = part.strip().lower()
+        try:
+            sizes.append(int(float(part[:-1]) * units[part[-1]]) if part[-1] in units else int(part))
+        except (ValueError, IndexError):
+            raise CommandError(f"Bad size: {part!r}")
+    return sizes
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark ingestion, summary, history, rows and report on synthetic "
+        "CSVs and compare against the stored baseline. Runs against a "
+        "throwaway database and media directory."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--sizes", type=_sizes, default=list(DEFAULT_SIZES),
+                            help="comma-separated row counts, e.g. 1K,100K,1M,10M")
+        parser.add_argument("--only", default=",".join(SCENARIOS),
+                            help=f"comma-separated scenarios ({', '.join(SCENARIOS)})")
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument("--data-dir",
+                            help="keep generated CSVs here (reused on later runs)")
+        parser.add_argument("--baseline", default=BASELINE_PATH)
+        parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                            help="allowed slowdown as a fraction (default 0.25)")
+        parser.add_argument("--save-baseline", action="store_true",
+                            help="store these results as the new baseline")
+        parser.add_argument("--json", dest="json_path",
+                            help="also write the results to this file")
+
+    def handle(self, *args, **options):
+        scenarios = [s.strip() for s in options["only"].split(",") if s.strip()]
+        unknown = set(scenarios) - set(SCENARIOS)
+        if unknown:
+            raise CommandError(f"Unknown scenario(s): {', '.join(sorted(unknown))}")
+
+        media = tempfile.mkdtemp(prefix="benchmark-media-")
+        data_dir = options["data_dir"] or tempfile.mkdtemp(prefix="benchmark-data-")
+        os.makedirs(data_dir, exist_ok=True)
+        setup_test_environment()
+        databases = setup_databases(verbosity=0, interactive=False)
+        try:
+            with override_settings(MEDIA_ROOT=media):
+                results = run_benchmarks(
+                    options["sizes"], scenarios, seed=options["seed"],
+                    data_dir=data_dir, log=self.stdout.write,
+                )
+        finally:
+            teardown_databases(databases, verbosity=0)
+            teardown_test_environment()
+            shutil.rmtree(media, ignore_errors=True)
+            if not options["data_dir"]:
+                shutil.rmtree(data_dir, ignore_errors=True)
+
+        if options["json_path"]:
+            with open(options["json_path"], "w") as f:
+                json.dump(results, f, indent=2)
+
+        if options["save_baseline"]:
+            save_baseline(results, options["seed"], options["baseline"])
+            self.stdout.write(f"Saved baseline to {options['baseline']}")
+            return
+
+        try:
+            baseline = load_baseline(options["baseline"])
+        except FileNotFoundError:
+            self.stdout.write("No baseline to compare against.")
+            return
+        regressions = compare_to_baseline(results, baseline, options["threshold"])
+        if regressions:
+            for line in regressions:
+                self.stderr.write(line)
+            raise CommandError(f"{len(regressions)} regression(s) against the baseline.")
+        self.stdout.write(self.style.SUCCESS("No regressions against the baseline."))
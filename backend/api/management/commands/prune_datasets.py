@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand
+
+from api.retention import prune_datasets, retention_limits
+
+
+class Command(BaseCommand):
+    help = (
+        "Delete datasets beyond the retention limits (RETENTION_* settings) "
+        "and sweep orphaned files. Suitable for cron."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--keep", type=int, dest="max_datasets",
+                            help="keep at most this many datasets")
+        parser.add_argument("--max-age-days", type=float, dest="max_age_days",
+                            help="delete datasets uploaded longer ago than this")
+        parser.add_argument("--max-bytes", type=int, dest="max_bytes",
+                            help="cap on the total size of stored datasets")
+        parser.add_argument("--dry-run", action="store_true",
+                            help="only report what would be deleted")
+
+    def handle(self, *args, **options):
+        limits = {
+            key: options[key] for key in retention_limits()
+            if options[key] is not None
+        }
+        dataset_ids, paths = prune_datasets(dry_run=options["dry_run"], **limits)
+
+        verb = "Would delete" if options["dry_run"] else "Deleted"
+        self.stdout.write(f"{verb} {len(dataset_ids)} dataset(s)"
+                          + (f": {', '.join(map(str, dataset_ids))}" if dataset_ids else ""))
+        for path in paths:
+            self.stdout.write(f"{verb} {path}")
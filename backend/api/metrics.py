@@ -0,0 +1,312 @@
+"""
+In-process request and pipeline metrics, exposed in the Prometheus text
+format on /api/metrics/.
+
+MetricsMiddleware records, per route and method: a latency histogram, the
+number of DB queries and the time spent in them, and response sizes
+(streamed responses are counted as they are sent). Queries are counted by
+a database execute wrapper that reports to the request in the current
+context, so sync views run in a worker thread under ASGI are counted too.
+
+Stages times named parts of a pipeline (ingestion: parse, summarise,
+serialise, statistics, db_write) and records them when the run ends.
+
+Everything is kept in this process's memory: nothing to deploy, but each
+worker process reports only its own requests.
+
+With PROFILE_REQUESTS on, requests served synchronously (WSGI, runserver)
+run under cProfile and those slower than PROFILE_SLOW_MS are dumped to
+PROFILE_DIR for `python -m pstats`.
+"""
+import cProfile
+import os
+import re
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.signals import request_started
+from django.db import connections
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+QUERY_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 500)
+SIZE_BUCKETS = tuple(256 * 4 ** i for i in range(10))  # 256 B .. 64 MiB
+STAGE_BUCKETS = (0.001, 0.01, 0.05, 0.1, 0.5, 1, 5, 10, 30, 60, 300)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names, values, extra=()):
+    pairs = [*zip(names, values), *extra]
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{n}="{_escape(v)}"' for n, v in pairs) + "}"
+
+
+def _number(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    def __init__(self, name, help, labels=()):
+        self.name, self.help, self.labelnames = name, help, tuple(labels)
+        self._values = defaultdict(int)
+        self._lock = threading.Lock()
+
+    def inc(self, labels=(), amount=1):
+        with self._lock:
+            self._values[tuple(labels)] += amount
+
+    def render(self):
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} counter"
+        with self._lock:
+            values = sorted(self._values.items())
+        for labels, value in values:
+            yield f"{self.name}{_labels(self.labelnames, labels)} {_number(value)}"
+
+
+class Histogram:
+    def __init__(self, name, help, buckets, labels=()):
+        self.name, self.help, self.labelnames = name, help, tuple(labels)
+        self.buckets = tuple(buckets)
+        self._series = {}  # labels -> [count per bucket..., +Inf count, sum]
+        self._lock = threading.Lock()
+
+    def observe(self, value, labels=()):
+        labels = tuple(labels)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [0] * (len(self.buckets) + 2)
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+                    break
+            else:
+                series[len(self.buckets)] += 1
+            series[-1] += value
+
+    def render(self):
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} histogram"
+        with self._lock:
+            series = sorted((labels, list(s)) for labels, s in self._series.items())
+        for labels, counts in series:
+            cumulative = 0
+            for bound, count in zip((*self.buckets, "+Inf"), counts):
+                cumulative += count
+                le = (("le", bound if bound == "+Inf" else _number(bound)),)
+                yield f"{self.name}_bucket{_labels(self.labelnames, labels, le)} {cumulative}"
+            yield f"{self.name}_sum{_labels(self.labelnames, labels)} {_number(counts[-1])}"
+            yield f"{self.name}_count{_labels(self.labelnames, labels)} {cumulative}"
+
+
+REQUEST_LABELS = ("method", "route")
+
+requests_total = Counter(
+    "api_requests_total", "Requests handled.", ("method", "route", "status"))
+request_seconds = Histogram(
+    "api_request_duration_seconds", "Time until the response was returned.",
+    LATENCY_BUCKETS, REQUEST_LABELS)
+request_queries = Histogram(
+    "api_request_db_queries", "DB queries per request.", QUERY_BUCKETS, REQUEST_LABELS)
+request_db_seconds = Histogram(
+    "api_request_db_seconds", "Time per request spent in DB queries.",
+    LATENCY_BUCKETS, REQUEST_LABELS)
+response_bytes = Histogram(
+    "api_response_bytes", "Response body size.", SIZE_BUCKETS, REQUEST_LABELS)
+stage_seconds = Histogram(
+    "api_stage_duration_seconds", "Time per pipeline stage, per run.",
+    STAGE_BUCKETS, ("pipeline", "stage"))
+
+REGISTRY = [
+    requests_total, request_seconds, request_queries, request_db_seconds,
+    response_bytes, stage_seconds,
+]
+
+
+def render():
+    """All metrics in the Prometheus text exposition format."""
+    return "\n".join(line for metric in REGISTRY for line in metric.render()) + "\n"
+
+
+# ---------- pipeline stages ----------
+
+class Stages:
+    """
+    Accumulates time per named stage over one pipeline run and records the
+    totals when the `with` block ends:
+
+        with Stages("ingest") as stages:
+            with stages("parse"):
+                ...
+    """
+
+    def __init__(self, pipeline):
+        self.pipeline = pipeline
+        self.totals = defaultdict(float)
+
+    @contextmanager
+    def __call__(self, stage):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.totals[stage] += time.perf_counter() - started
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        for stage, seconds in self.totals.items():
+            stage_seconds.observe(seconds, (self.pipeline, stage))
+
+
+# ---------- DB queries ----------
+
+class _RequestStats:
+    __slots__ = ("queries", "db_seconds")
+
+    def __init__(self):
+        self.queries = 0
+        self.db_seconds = 0.0
+
+
+_current = ContextVar("api_request_stats", default=None)
+
+
+def _track_query(execute, sql, params, many, context):
+    stats = _current.get()
+    if stats is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        stats.queries += 1
+        stats.db_seconds += time.perf_counter() - started
+
+
+def _install_query_tracker(**kwargs):
+    # Connection wrappers are per thread; request_started runs in the thread
+    # that will run a sync view, under WSGI and ASGI alike.
+    for conn in connections.all():
+        if _track_query not in conn.execute_wrappers:
+            conn.execute_wrappers.append(_track_query)
+
+
+request_started.connect(_install_query_tracker, dispatch_uid="api.metrics.query_tracker")
+
+
+# ---------- middleware ----------
+
+def _route(request):
+    match = getattr(request, "resolver_match", None)
+    return "/" + match.route if match else "unmatched"
+
+
+def _counted(chunks, done):
+    total = 0
+    try:
+        for chunk in chunks:
+            total += len(chunk)
+            yield chunk
+    finally:
+        done(total)
+
+
+async def _acounted(chunks, done):
+    total = 0
+    try:
+        async for chunk in chunks:
+            total += len(chunk)
+            yield chunk
+    finally:
+        done(total)
+
+
+def _profile_name(request):
+    slug = re.sub(r"[^A-Za-z0-9]+", "_", request.path).strip("_") or "root"
+    return f"{time.strftime('%Y%m%d-%H%M%S')}-{request.method}-{slug}.prof"
+
+
+class MetricsMiddleware:
+    """Records per-route request metrics; see the module docstring."""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+        self.profile = getattr(settings, "PROFILE_REQUESTS", False)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        stats, token, started = self._begin()
+        try:
+            if self.profile:
+                response = self._profiled(request)
+            else:
+                response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self._finish(request, response, stats, started)
+
+    async def __acall__(self, request):
+        stats, token, started = self._begin()
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self._finish(request, response, stats, started)
+
+    def _begin(self):
+        stats = _RequestStats()
+        return stats, _current.set(stats), time.perf_counter()
+
+    def _finish(self, request, response, stats, started):
+        elapsed = time.perf_counter() - started
+        labels = (request.method, _route(request))
+        requests_total.inc((*labels, response.status_code))
+        request_seconds.observe(elapsed, labels)
+        request_queries.observe(stats.queries, labels)
+        request_db_seconds.observe(stats.db_seconds, labels)
+
+        def sent(size):
+            response_bytes.observe(size, labels)
+
+        if not response.streaming:
+            sent(len(response.content))
+        elif response.is_async:
+            response.streaming_content = _acounted(response.streaming_content, sent)
+        else:
+            response.streaming_content = _counted(response.streaming_content, sent)
+        return response
+
+    def _profiled(self, request):
+        """
+        Run the rest of the stack under cProfile (sync stacks only). Wrapping
+        get_response, rather than calling the view from process_view, keeps
+        every later middleware's process_view (e.g. CSRF) in the path.
+        """
+        profile = cProfile.Profile()
+        started = time.perf_counter()
+        response = profile.runcall(self.get_response, request)
+        if (time.perf_counter() - started) * 1000 >= getattr(settings, "PROFILE_SLOW_MS", 500):
+            directory = getattr(settings, "PROFILE_DIR", "profiles")
+            os.makedirs(directory, exist_ok=True)
+            profile.dump_stats(os.path.join(directory, _profile_name(request)))
+        return response
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.8 on 2026-10-17 19:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0003_alter_dataset_uploaded_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='dataset',
+            name='row_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='dataset',
+            name='storage_path',
+            field=models.CharField(blank=True, default='', max_length=255),
+        ),
+    ]
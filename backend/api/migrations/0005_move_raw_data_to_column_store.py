@@ -0,0 +1,106 @@
+# Generated by Django 5.2.8 on 2026-10-17 19:45
+
+import json
+import os
+import shutil
+import uuid
+
+import numpy as np
+import pandas as pd
+from django.conf import settings
+from django.db import migrations
+
+NUMERIC_COLS = ["Flowrate", "Pressure", "Temperature"]
+
+# The column store as api/storage.py wrote and read it (format 1) when this
+# migration was written, frozen here so later changes to the app don't
+# change what it does.
+STORAGE_DIR = "datasets"
+
+
+def write_store(rows, columns):
+    """Store `rows` (dicts) as a new column store; returns its relpath."""
+    relpath = os.path.join(STORAGE_DIR, uuid.uuid4().hex)
+    path = os.path.join(settings.MEDIA_ROOT, relpath)
+    os.makedirs(path)
+    try:
+        meta = []
+        for i, name in enumerate(columns):
+            base = os.path.join(path, f"c{i}")
+            values = pd.Series([row.get(name) for row in rows], dtype=object)
+            if name in NUMERIC_COLS:
+                numbers = pd.to_numeric(values, errors="coerce")
+                numbers.to_numpy(dtype="<f8", na_value=np.nan).tofile(base + ".f8")
+                meta.append({"name": name, "kind": "float", "file": f"c{i}"})
+                continue
+            nulls = values.isna().to_numpy()
+            encoded = [b"" if null else str(v).encode("utf-8") for v, null in zip(values, nulls)]
+            offsets = np.zeros(len(encoded) + 1, dtype="<i8")
+            np.cumsum([len(b) for b in encoded], out=offsets[1:])
+            offsets.tofile(base + ".off")
+            with open(base + ".dat", "wb") as f:
+                f.write(b"".join(encoded))
+            nulls.astype(np.uint8).tofile(base + ".nul")
+            meta.append({"name": name, "kind": "text", "file": f"c{i}"})
+        with open(os.path.join(path, "meta.json"), "w") as f:
+            json.dump({"version": 1, "row_count": len(rows), "columns": meta}, f)
+    except BaseException:
+        shutil.rmtree(path, ignore_errors=True)
+        raise
+    return relpath
+
+
+def read_rows(relpath):
+    """Every row of a column store as a dict, missing values as None."""
+    path = os.path.join(settings.MEDIA_ROOT, relpath)
+    with open(os.path.join(path, "meta.json")) as f:
+        meta = json.load(f)
+    n = meta["row_count"]
+    columns = {}
+    for col in meta["columns"]:
+        base = os.path.join(path, col["file"])
+        if col["kind"] == "float":
+            values = np.fromfile(base + ".f8", dtype="<f8", count=n)
+            columns[col["name"]] = [None if np.isnan(v) else v for v in values.tolist()]
+            continue
+        offsets = np.fromfile(base + ".off", dtype="<i8", count=n + 1).tolist()
+        nulls = np.fromfile(base + ".nul", dtype=np.uint8, count=n).tolist()
+        with open(base + ".dat", "rb") as f:
+            blob = f.read()
+        columns[col["name"]] = [
+            None if nulls[i] else blob[offsets[i]:offsets[i + 1]].decode("utf-8")
+            for i in range(n)
+        ]
+    return [{name: values[i] for name, values in columns.items()} for i in range(n)]
+
+
+def raw_data_to_columns(apps, schema_editor):
+    Dataset = apps.get_model('api', 'Dataset')
+    for ds in Dataset.objects.filter(storage_path="").iterator():
+        rows = ds.raw_data or []
+        columns = list(rows[0].keys()) if rows else []
+        ds.storage_path = write_store(rows, columns)
+        ds.row_count = len(rows)
+        ds.raw_data = []
+        ds.save(update_fields=['storage_path', 'row_count', 'raw_data'])
+
+
+def columns_to_raw_data(apps, schema_editor):
+    Dataset = apps.get_model('api', 'Dataset')
+    for ds in Dataset.objects.exclude(storage_path="").iterator():
+        ds.raw_data = read_rows(ds.storage_path)
+        shutil.rmtree(os.path.join(settings.MEDIA_ROOT, ds.storage_path), ignore_errors=True)
+        ds.storage_path = ""
+        ds.row_count = 0
+        ds.save(update_fields=['storage_path', 'row_count', 'raw_data'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0004_dataset_storage_path_row_count'),
+    ]
+
+    operations = [
+        migrations.RunPython(raw_data_to_columns, columns_to_raw_data),
+    ]
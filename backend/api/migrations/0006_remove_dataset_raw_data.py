@@ -0,0 +1,17 @@
+# Generated by Django 5.2.8 on 2026-10-17 19:45
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0005_move_raw_data_to_column_store'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='dataset',
+            name='raw_data',
+        ),
+    ]
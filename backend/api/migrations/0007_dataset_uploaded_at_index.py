@@ -0,0 +1,18 @@
+# Generated by Django 5.2.8 on 2026-10-17 19:46
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0006_remove_dataset_raw_data'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='dataset',
+            name='uploaded_at',
+            field=models.DateTimeField(db_index=True),
+        ),
+    ]
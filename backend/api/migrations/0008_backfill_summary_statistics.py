@@ -0,0 +1,127 @@
+# Generated by Django 5.2.8 on 2026-10-17 19:47
+
+import json
+import math
+import os
+
+import numpy as np
+import pandas as pd
+from django.conf import settings
+from django.db import migrations
+
+REQUIRED_COLS = ["Equipment Name", "Type", "Flowrate", "Pressure", "Temperature"]
+NUMERIC_COLS = ["Flowrate", "Pressure", "Temperature"]
+PERCENTILES = (50, 95, 99)
+IQR_FACTOR = 1.5
+
+# The statistics and the column store reads as api/services.py and
+# api/storage.py (format 1) had them when this migration was written,
+# frozen here so later changes to the app don't change what it does.
+
+
+def _num(x):
+    x = float(x)
+    return x if math.isfinite(x) else None
+
+
+def read_columns(relpath):
+    """{name: values} of a column store: float64 arrays, or lists of str/None."""
+    path = os.path.join(settings.MEDIA_ROOT, relpath)
+    with open(os.path.join(path, "meta.json")) as f:
+        meta = json.load(f)
+    n = meta["row_count"]
+    columns = {}
+    for col in meta["columns"]:
+        base = os.path.join(path, col["file"])
+        if col["kind"] == "float":
+            columns[col["name"]] = np.fromfile(base + ".f8", dtype="<f8", count=n)
+            continue
+        offsets = np.fromfile(base + ".off", dtype="<i8", count=n + 1).tolist()
+        nulls = np.fromfile(base + ".nul", dtype=np.uint8, count=n).tolist()
+        with open(base + ".dat", "rb") as f:
+            blob = f.read()
+        columns[col["name"]] = [
+            None if nulls[i] else blob[offsets[i]:offsets[i + 1]].decode("utf-8")
+            for i in range(n)
+        ]
+    return columns
+
+
+def column_stats(values):
+    values = values[~np.isnan(values)]
+    if values.size == 0:
+        return {"count": 0}
+
+    q1, q3, *pcts = np.percentile(values, [25, 75, *PERCENTILES])
+    iqr = q3 - q1
+    low, high = q1 - IQR_FACTOR * iqr, q3 + IQR_FACTOR * iqr
+    stats = {
+        "count": int(values.size),
+        "min": _num(values.min()),
+        "max": _num(values.max()),
+        "mean": _num(values.mean()),
+        "std": _num(values.std(ddof=1)) if values.size > 1 else None,
+        "q1": _num(q1),
+        "q3": _num(q3),
+        "outliers": int(np.count_nonzero((values < low) | (values > high))),
+    }
+    for p, v in zip(PERCENTILES, pcts):
+        stats[f"p{p}"] = _num(v)
+    return stats
+
+
+def compute_statistics(columns):
+    numeric = pd.DataFrame({col: columns[col] for col in NUMERIC_COLS})
+
+    by_type = {}
+    if len(numeric):
+        frame = numeric.assign(Type=columns["Type"])
+        grouped = frame.groupby("Type", dropna=False)[NUMERIC_COLS].agg(
+            ["count", "mean", "min", "max", "std"]
+        )
+        sizes = frame.groupby("Type", dropna=False).size()
+        for eq_type, row in grouped.iterrows():
+            key = None if pd.isna(eq_type) else str(eq_type)
+            by_type[key] = {"count": int(sizes[eq_type])}
+            for col in NUMERIC_COLS:
+                by_type[key][col] = {
+                    "count": int(row[(col, "count")]),
+                    "mean": _num(row[(col, "mean")]),
+                    "min": _num(row[(col, "min")]),
+                    "max": _num(row[(col, "max")]),
+                    "std": _num(row[(col, "std")]),
+                }
+
+    corr = numeric.corr()
+    return {
+        "quantiles": "exact",
+        "statistics": {col: column_stats(numeric[col].to_numpy()) for col in NUMERIC_COLS},
+        "by_type": by_type,
+        "correlation": {
+            col: {other: _num(corr.at[col, other]) for other in NUMERIC_COLS}
+            for col in NUMERIC_COLS
+        },
+    }
+
+
+def backfill_statistics(apps, schema_editor):
+    Dataset = apps.get_model('api', 'Dataset')
+    for ds in Dataset.objects.exclude(storage_path="").iterator():
+        if "statistics" in ds.summary:
+            continue
+        columns = read_columns(ds.storage_path)
+        if not set(REQUIRED_COLS) <= set(columns):
+            continue  # empty legacy dataset, nothing to describe
+        ds.summary.update(compute_statistics(columns))
+        ds.save(update_fields=['summary'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0007_dataset_uploaded_at_index'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_statistics, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.8 on 2026-10-17 19:49
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0008_backfill_summary_statistics'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='dataset',
+            name='revision',
+            field=models.PositiveIntegerField(default=1),
+        ),
+        migrations.AddField(
+            model_name='dataset',
+            name='stats_state',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 5.2.8 on 2026-10-17 20:40
+
+import os
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+def storage_size(relpath):
+    """Bytes of a dataset's column files, as api/storage.py counted them."""
+    path = os.path.join(settings.MEDIA_ROOT, relpath) if relpath else ""
+    if not os.path.isdir(path):
+        return 0
+    with os.scandir(path) as entries:
+        return sum(e.stat().st_size for e in entries if e.is_file())
+
+
+def backfill_size(apps, schema_editor):
+    Dataset = apps.get_model('api', 'Dataset')
+    for ds in Dataset.objects.only('id', 'storage_path').iterator():
+        Dataset.objects.filter(pk=ds.pk).update(size_bytes=storage_size(ds.storage_path))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0012_dataset_content_hash'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='dataset',
+            name='size_bytes',
+            field=models.BigIntegerField(default=0),
+        ),
+        migrations.RunPython(backfill_size, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,89 @@
+# Generated by Django 5.2.8 on 2026-10-17 20:32
+
+import json
+import os
+
+import django.db.models.deletion
+import numpy as np
+from django.conf import settings
+from django.db import migrations, models
+
+NUMERIC_COLS = ("Flowrate", "Pressure", "Temperature")
+
+
+def read_column(path, col, row_count):
+    """
+    One column of a column store, read as api/storage.py (format 1) did when
+    this migration was written: a float64 array, or a list of str/None.
+    """
+    base = os.path.join(path, col["file"])
+    if col["kind"] == "float":
+        return np.fromfile(base + ".f8", dtype="<f8", count=row_count)
+    offsets = np.fromfile(base + ".off", dtype="<i8", count=row_count + 1).tolist()
+    nulls = np.fromfile(base + ".nul", dtype=np.uint8, count=row_count).tolist()
+    with open(base + ".dat", "rb") as f:
+        blob = f.read()
+    return [
+        None if nulls[i] else blob[offsets[i]:offsets[i + 1]].decode("utf-8")
+        for i in range(row_count)
+    ]
+
+
+def backfill_readings(apps, schema_editor):
+    Dataset = apps.get_model('api', 'Dataset')
+    Reading = apps.get_model('api', 'Reading')
+    for ds in Dataset.objects.only('id', 'storage_path', 'uploaded_at').iterator():
+        if not ds.storage_path:
+            continue
+        path = os.path.join(settings.MEDIA_ROOT, ds.storage_path)
+        with open(os.path.join(path, "meta.json")) as f:
+            meta = json.load(f)
+        if not meta["row_count"]:
+            continue
+        columns = {
+            col["name"]: read_column(path, col, meta["row_count"]) for col in meta["columns"]
+        }
+        values = [
+            np.where(np.isnan(columns[col]), None, columns[col]).tolist() for col in NUMERIC_COLS
+        ]
+        Reading.objects.bulk_create(
+            [
+                Reading(
+                    dataset_id=ds.pk, equipment_name=name[:255],
+                    equipment_type=(eq_type or "")[:255], uploaded_at=ds.uploaded_at,
+                    flowrate=flowrate, pressure=pressure, temperature=temperature,
+                )
+                for name, eq_type, flowrate, pressure, temperature in zip(
+                    columns["Equipment Name"], columns["Type"], *values
+                )
+                if name
+            ],
+            batch_size=2000,
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0013_dataset_size_bytes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Reading',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('equipment_name', models.CharField(max_length=255)),
+                ('equipment_type', models.CharField(blank=True, default='', max_length=255)),
+                ('uploaded_at', models.DateTimeField()),
+                ('flowrate', models.FloatField(null=True)),
+                ('pressure', models.FloatField(null=True)),
+                ('temperature', models.FloatField(null=True)),
+                ('dataset', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='readings', to='api.dataset')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['equipment_name', 'uploaded_at'], name='reading_name_time'), models.Index(fields=['equipment_type', 'uploaded_at'], name='reading_type_time')],
+            },
+        ),
+        migrations.RunPython(backfill_readings, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.8 on 2026-10-17 20:57
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0014_reading'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='reading',
+            name='reading_name_time',
+        ),
+        migrations.RemoveIndex(
+            model_name='reading',
+            name='reading_type_time',
+        ),
+        migrations.RemoveField(
+            model_name='reading',
+            name='uploaded_at',
+        ),
+        migrations.AddIndex(
+            model_name='reading',
+            index=models.Index(fields=['equipment_name', 'dataset'], name='reading_name_dataset'),
+        ),
+        migrations.AddIndex(
+            model_name='reading',
+            index=models.Index(fields=['equipment_type', 'dataset'], name='reading_type_dataset'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.8 on 2026-10-17 21:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0015_reading_dataset_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='uploadsession',
+            name='sha256',
+            field=models.CharField(blank=True, default='', max_length=64),
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 5.2.8 on 2026-10-17 21:22
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0016_uploadsession_sha256'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Event',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('event', models.CharField(max_length=32)),
+                ('data', models.TextField()),
+            ],
+        ),
+    ]
@@ -1,11 +1,182 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
 from django.db import models
+from django.utils import timezone
+
+from .db import single_writer
+from .reports import remove_reports
+from .storage import ColumnarReader, remove_storage
+
+
+class DatasetQuerySet(models.QuerySet):
+    def latest_first(self):
+        return self.order_by('-uploaded_at')
+
+    def metadata(self):
+        """Only the columns metadata endpoints need (name, time, hash, summary)."""
+        return self.latest_first().only(
+            'id', 'name', 'uploaded_at', 'content_hash', 'summary', 'revision'
+        )
+
 
 class Dataset(models.Model):
     name = models.CharField(max_length=255)
-    uploaded_at = models.DateTimeField()
+    uploaded_at = models.DateTimeField(db_index=True)
     summary = models.JSONField(default=dict)
-    # NEW: store the raw CSV rows
-    raw_data = models.JSONField(default=list, blank=True)
+    # Raw CSV rows live in a column store on disk (see storage.py);
+    # the path is relative to MEDIA_ROOT.
+    storage_path = models.CharField(max_length=255, blank=True, default="")
+    row_count = models.PositiveIntegerField(default=0)
+    # Bytes of column files on disk; what retention's byte limit counts.
+    size_bytes = models.BigIntegerField(default=0)
+    # SHA-256 of the uploaded file; identical re-uploads reuse this dataset.
+    # Cleared on append, since the rows no longer match a single file.
+    content_hash = models.CharField(max_length=64, blank=True, default="", db_index=True)
+    # Mergeable accumulator state (accumulators.py) so appends can update
+    # the summary without re-reading stored rows; bumped on every append.
+    stats_state = models.JSONField(default=dict, blank=True)
+    revision = models.PositiveIntegerField(default=1)
+
+    objects = DatasetQuerySet.as_manager()
 
     def __str__(self):
         return self.name
+
+    @property
+    def version_tag(self):
+        """Changes whenever the dataset's rows, summary or upload time change."""
+        uploaded = int(self.uploaded_at.timestamp() * 1_000_000)
+        return f"{self.pk}-r{self.revision}-u{uploaded}"
+
+    def open_rows(self):
+        """Return a ColumnarReader over this dataset's stored rows."""
+        return ColumnarReader(self.storage_path)
+
+    def delete(self, *args, **kwargs):
+        dataset_id, storage_path = self.pk, self.storage_path
+        with single_writer():
+            result = super().delete(*args, **kwargs)
+        remove_storage(storage_path)
+        remove_reports(dataset_id)
+        return result
+
+
+class Reading(models.Model):
+    """
+    One stored CSV row, normalized out of its dataset's column store so an
+    equipment's history across uploads is a single indexed range scan.
+    """
+
+    dataset = models.ForeignKey(Dataset, on_delete=models.CASCADE, related_name='readings')
+    equipment_name = models.CharField(max_length=255)
+    equipment_type = models.CharField(max_length=255, blank=True, default="")
+    flowrate = models.FloatField(null=True)
+    pressure = models.FloatField(null=True)
+    temperature = models.FloatField(null=True)
+
+    class Meta:
+        indexes = [
+            # history is read by joining on the dataset's upload time, so a
+            # re-upload (dedupe) only touches the one Dataset row
+            models.Index(fields=['equipment_name', 'dataset'], name='reading_name_dataset'),
+            models.Index(fields=['equipment_type', 'dataset'], name='reading_type_dataset'),
+        ]
+
+    def __str__(self):
+        return f"{self.equipment_name} in dataset {self.dataset_id}"
+
+
+class JobQuerySet(models.QuerySet):
+    def _unfinished(self):
+        return self.filter(status__in=[Job.QUEUED, Job.RUNNING])
+
+    def _stale_before(self):
+        return timezone.now() - timedelta(minutes=getattr(settings, "JOB_STALE_MINUTES", 30))
+
+    def active(self):
+        """Queued or running jobs that have reported within JOB_STALE_MINUTES."""
+        return self._unfinished().filter(updated_at__gte=self._stale_before())
+
+    def stale(self):
+        """
+        Queued or running jobs silent for longer than that: their worker
+        process was restarted or died, so they will never finish.
+        """
+        return self._unfinished().filter(updated_at__lt=self._stale_before())
+
+
+class Job(models.Model):
+    """A background ingestion job (see jobs.py)."""
+
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    SUCCEEDED = 'succeeded'
+    FAILED = 'failed'
+    STATUS_CHOICES = [
+        (QUEUED, 'Queued'),
+        (RUNNING, 'Running'),
+        (SUCCEEDED, 'Succeeded'),
+        (FAILED, 'Failed'),
+    ]
+
+    filename = models.CharField(max_length=255)
+    status = models.CharField(max_length=16, choices=STATUS_CHOICES, default=QUEUED)
+    # Incoming CSV spooled to disk, relative to MEDIA_ROOT; removed when done.
+    source_path = models.CharField(max_length=255, blank=True, default="")
+    bytes_total = models.BigIntegerField(default=0)
+    bytes_done = models.BigIntegerField(default=0)
+    dataset = models.ForeignKey(Dataset, null=True, blank=True, on_delete=models.SET_NULL)
+    result = models.JSONField(default=dict, blank=True, encoder=DjangoJSONEncoder)
+    error = models.TextField(blank=True, default="")
+    created_at = models.DateTimeField(auto_now_add=True)
+    # Also the worker's heartbeat: bumped with every progress report.
+    updated_at = models.DateTimeField(auto_now=True)
+
+    objects = JobQuerySet.as_manager()
+
+    def __str__(self):
+        return f"{self.filename} ({self.status})"
+
+    @property
+    def progress(self):
+        if self.status == self.SUCCEEDED:
+            return 1.0
+        return self.bytes_done / self.bytes_total if self.bytes_total else 0.0
+
+
+class UploadSession(models.Model):
+    """A chunked, resumable upload in progress (see uploads.py)."""
+
+    filename = models.CharField(max_length=255)
+    size = models.BigIntegerField()
+    chunk_size = models.PositiveIntegerField()
+    # SHA-256 of the whole file if the client declared it; checked on ingest.
+    sha256 = models.CharField(max_length=64, blank=True, default="")
+    created_at = models.DateTimeField(auto_now_add=True)
+    completed_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return self.filename
+
+    @property
+    def total_parts(self):
+        return max(1, -(-self.size // self.chunk_size))
+
+    def part_size(self, number):
+        """Expected byte size of 1-based part `number`."""
+        if number < self.total_parts:
+            return self.chunk_size
+        return self.size - self.chunk_size * (self.total_parts - 1)
+
+
+class Event(models.Model):
+    """A server-sent event; ids give the publication order (see events.py)."""
+
+    event = models.CharField(max_length=32)
+    # JSON payload, sent to clients as it is stored
+    data = models.TextField()
+
+    def __str__(self):
+        return f"{self.pk} {self.event}"
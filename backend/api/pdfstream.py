@@ -0,0 +1,186 @@
+"""
+A minimal streaming PDF writer.
+
+ReportLab's canvas keeps every page in memory until save(), which does not
+scale to reports with thousands of table pages. PDFStream instead returns
+the bytes of each page as soon as the page is finished and only remembers
+object offsets for the cross-reference table, so memory stays flat however
+long the document gets. Text uses the standard (non-embedded) Helvetica
+fonts; ReportLab's font metrics measure strings.
+"""
+import zlib
+
+from reportlab.pdfbase.pdfmetrics import stringWidth
+
+FONTS = {"Helvetica": "F1", "Helvetica-Bold": "F2"}
+
+BLACK = (0, 0, 0)
+
+PRODUCER = "Chemical Equipment Parameter Visualizer"
+
+# fixed object numbers; pages start after these
+_CATALOG, _PAGES, _INFO = 1, 2, 3
+_FIRST_FONT = 4
+
+
+def rgb(hex_color):
+    """'#RRGGBB' -> (r, g, b) in 0..1."""
+    value = hex_color.lstrip("#")
+    return tuple(int(value[i:i + 2], 16) / 255 for i in (0, 2, 4))
+
+
+# Helvetica and Helvetica-Bold share these widths (1/1000 em), so numbers are
+# measured without going through the font metrics
+_DIGIT_WIDTH = 556
+_NUMERIC_CHARS = "0123456789.,-+e"
+_ESCAPES = str.maketrans({"\\": "\\\\", "(": "\\(", ")": "\\)"})
+
+
+def text_width(text, font="Helvetica", size=10):
+    if not text.strip(_NUMERIC_CHARS):
+        narrow = text.count(".") + text.count(",")
+        return (_DIGIT_WIDTH * len(text) - 278 * narrow - 223 * text.count("-")
+                + 28 * text.count("+")) * size / 1000
+    return stringWidth(text, font, size)
+
+
+def fit_text(text, width, font="Helvetica", size=10):
+    """Cut `text` (adding an ellipsis) so it is at most `width` points wide."""
+    # Helvetica glyphs are at most ~1 em wide, so short strings need no measuring
+    if len(text) * size <= width or text_width(text, font, size) <= width:
+        return text
+    while text and stringWidth(text + "...", font, size) > width:
+        text = text[:-1]
+    return text + "..."
+
+
+def _string(text):
+    return b"(" + text.translate(_ESCAPES).encode("cp1252", errors="replace") + b")"
+
+
+def _color(color, op):
+    return "%.3f %.3f %.3f %s" % (*color, op)
+
+
+class Page:
+    """
+    Drawing operations for one page; PDF coordinates (origin bottom-left).
+    Operators are collected as text and encoded (WinAnsi) once per page.
+    """
+
+    def __init__(self, width, height):
+        self.width, self.height = width, height
+        self._ops = []
+
+    def text(self, x, y, text, font="Helvetica", size=10, color=BLACK, align="left"):
+        self.texts([(x, y, text)], font, size, color, align)
+
+    def texts(self, items, font="Helvetica", size=10, color=BLACK, align="left"):
+        """Draw many (x, y, text) strings in one text object."""
+        ops = [f"BT /{FONTS[font]} {size:.2f} Tf {_color(color, 'rg')}"]
+        for x, y, text in items:
+            if align != "left":
+                w = text_width(text, font, size)
+                x -= w if align == "right" else w / 2
+            ops.append(f"1 0 0 1 {x:.2f} {y:.2f} Tm ({text.translate(_ESCAPES)}) Tj")
+        ops.append("ET")
+        self._ops.append("\n".join(ops))
+
+    def rect(self, x, y, width, height, fill=None, stroke=None, line_width=0.5):
+        if fill is None and stroke is None:
+            return
+        ops = ["q"]
+        if fill is not None:
+            ops.append(_color(fill, "rg"))
+        if stroke is not None:
+            ops.append(f"{_color(stroke, 'RG')} {line_width:.2f} w")
+        paint = "B" if fill is not None and stroke is not None else "f" if fill is not None else "S"
+        ops.append(f"{x:.2f} {y:.2f} {width:.2f} {height:.2f} re {paint} Q")
+        self._ops.append(" ".join(ops))
+
+    def line(self, x1, y1, x2, y2, color=BLACK, line_width=0.5):
+        self._ops.append(
+            f"q {_color(color, 'RG')} {line_width:.2f} w {x1:.2f} {y1:.2f} m {x2:.2f} {y2:.2f} l S Q"
+        )
+
+    def content(self):
+        return "\n".join(self._ops).encode("cp1252", errors="replace")
+
+
+class PDFStream:
+    """
+    begin() -> header bytes, add_page(page) -> bytes of that page,
+    end() -> page tree, cross-reference table and trailer. Concatenated in
+    that order they form the document.
+    """
+
+    def __init__(self, pagesize, title="", compress=True):
+        self.width, self.height = pagesize
+        self.title = title
+        self.compress = compress
+        self._offsets = {}
+        self._pos = 0
+        self._next = _FIRST_FONT + len(FONTS)
+        self._page_ids = []
+
+    def _object(self, num, body):
+        self._offsets[num] = self._pos
+        data = b"%d 0 obj\n%s\nendobj\n" % (num, body)
+        self._pos += len(data)
+        return data
+
+    def _emit(self, data):
+        self._pos += len(data)
+        return data
+
+    def new_page(self):
+        return Page(self.width, self.height)
+
+    def begin(self):
+        out = [self._emit(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n")]
+        for i, name in enumerate(FONTS):
+            out.append(self._object(_FIRST_FONT + i, (
+                b"<< /Type /Font /Subtype /Type1 /BaseFont /%s /Encoding /WinAnsiEncoding >>"
+                % name.encode()
+            )))
+        return b"".join(out)
+
+    def add_page(self, page):
+        content_id, page_id = self._next, self._next + 1
+        self._next += 2
+        self._page_ids.append(page_id)
+
+        data = page.content()
+        extra = b""
+        if self.compress:
+            data, extra = zlib.compress(data, 6), b" /Filter /FlateDecode"
+        fonts = b" ".join(
+            b"/%s %d 0 R" % (ref.encode(), _FIRST_FONT + i) for i, ref in enumerate(FONTS.values())
+        )
+        return self._object(
+            content_id, b"<< /Length %d%s >>\nstream\n%s\nendstream" % (len(data), extra, data)
+        ) + self._object(page_id, (
+            b"<< /Type /Page /Parent %d 0 R /MediaBox [0 0 %.2f %.2f] "
+            b"/Resources << /Font << %s >> >> /Contents %d 0 R >>"
+            % (_PAGES, self.width, self.height, fonts, content_id)
+        ))
+
+    def end(self):
+        kids = b" ".join(b"%d 0 R" % i for i in self._page_ids)
+        out = [
+            self._object(_PAGES, b"<< /Type /Pages /Kids [%s] /Count %d >>"
+                         % (kids, len(self._page_ids))),
+            self._object(_CATALOG, b"<< /Type /Catalog /Pages %d 0 R >>" % _PAGES),
+            self._object(_INFO, b"<< /Title %s /Producer %s >>"
+                         % (_string(self.title), _string(PRODUCER))),
+        ]
+        xref_at = self._pos
+        size = self._next
+        xref = [b"xref\n0 %d\n0000000000 65535 f \n" % size]
+        xref += [b"%010d 00000 n \n" % self._offsets[num] for num in range(1, size)]
+        out.append(self._emit(b"".join(xref)))
+        out.append(self._emit(
+            b"trailer\n<< /Size %d /Root %d 0 R /Info %d 0 R >>\nstartxref\n%d\n%%%%EOF\n"
+            % (size, _CATALOG, _INFO, xref_at)
+        ))
+        return b"".join(out)
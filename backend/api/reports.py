@@ -0,0 +1,443 @@
+"""
+PDF reports, streamed and cached on disk.
+
+A report is an overview page (metadata, summary statistics, Type
+distribution), one chart page per numeric column (histogram and per-Type
+box plots), and the complete equipment table. Charts are drawn as vector
+shapes from the stored summary and the aggregates, never from raw rows; the
+table is read from the column store one block of pages at a time. Pages are
+written with PDFStream as they are produced, so neither building nor
+serving a report holds the document in memory.
+
+A report is cached per (dataset id, revision, upload time, REPORT_VERSION)
+under MEDIA_ROOT/reports/. The same key doubles as the ETag, which lets
+clients revalidate with If-None-Match and get a 304 without any PDF work.
+The first request for a report streams it to the client while it is being
+written to the cache.
+"""
+import asyncio
+import glob
+import math
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait
+
+from django.conf import settings
+from django.http import FileResponse, HttpResponseNotModified, StreamingHttpResponse
+from django.utils.http import content_disposition_header, http_date, parse_http_date_safe
+from reportlab.lib.pagesizes import A4
+
+from .aggregates import compute_aggregates
+from .pdfstream import PDFStream, fit_text, rgb
+from .storage import FLOAT, absolute_path
+
+REPORTS_DIR = "reports"
+
+# Bump when the layout changes so cached PDFs are rebuilt.
+REPORT_VERSION = 2
+
+REPORT_BINS = 30
+# Types beyond this many (by count) are folded into "other" / left out of box plots
+MAX_TYPES = 12
+ROWS_PER_PAGE = 60
+# table rows read from the column store at a time
+TABLE_BLOCK = ROWS_PER_PAGE * 50
+# bytes collected before a chunk is handed to the response
+STREAM_BLOCK = 64 * 1024
+
+_executor = ThreadPoolExecutor(
+    max_workers=getattr(settings, "REPORT_WORKERS", 4),
+    thread_name_prefix="report",
+)
+
+MARGIN = 40
+ROW_HEIGHT = 11.5
+TABLE_FONT_SIZE = 7.5
+
+TEXT_COLOR = rgb("#111827")
+MUTED = rgb("#6b7280")
+GRID = rgb("#d1d5db")
+STRIPE = rgb("#f3f4f6")
+COLORS = [rgb(c) for c in ("#6366f1", "#ec4899", "#14b8a6", "#f59e0b", "#8b5cf6")]
+
+
+def report_key(ds):
+    return f"{ds.version_tag}-v{REPORT_VERSION}"
+
+
+def report_path(ds):
+    return absolute_path(os.path.join(REPORTS_DIR, f"{report_key(ds)}.pdf"))
+
+
+def _fmt(value):
+    if value is None or (isinstance(value, float) and math.isnan(value)):
+        return ""
+    if isinstance(value, float):
+        return f"{value:.6g}"
+    return str(value)
+
+
+def _column_text(values):
+    """Cell strings for one block of a stored column."""
+    if values.dtype == object:
+        return ["" if v is None else v for v in values.tolist()]
+    return ["" if v != v else f"{v:.6g}" for v in values.tolist()]
+
+
+# ---------- charts ----------
+
+def _draw_type_bars(page, x, top, width, dist):
+    """Horizontal bar chart of the Type distribution; returns the bottom y."""
+    items = list(dist.items())
+    if len(items) > MAX_TYPES:
+        rest = items[MAX_TYPES - 1:]
+        items = items[:MAX_TYPES - 1] + [(f"({len(rest)} other types)", sum(n for _, n in rest))]
+    peak = max((n for _, n in items), default=0) or 1
+    label_w, value_w = 120, 60
+    bar_w = width - label_w - value_w
+    y = top
+    for i, (label, count) in enumerate(items):
+        y -= 16
+        page.text(x, y + 3, fit_text(_fmt(label) or "(blank)", label_w - 6, size=9), size=9)
+        page.rect(x + label_w, y, max(bar_w * count / peak, 0.5), 11,
+                  fill=COLORS[i % len(COLORS)])
+        page.text(x + width, y + 3, f"{count:,}", size=9, color=MUTED, align="right")
+    return y
+
+
+def _draw_histogram(page, x, y, width, height, hist, color):
+    """Bars for one histogram ({edges, counts}) in the box (x, y, width, height)."""
+    page.rect(x, y, width, height, stroke=GRID)
+    edges, counts = hist["edges"], hist["counts"]
+    if not counts:
+        page.text(x + width / 2, y + height / 2, "No values", size=9, color=MUTED, align="center")
+        return
+    peak = max(counts) or 1
+    step = width / len(counts)
+    for i, count in enumerate(counts):
+        if count:
+            page.rect(x + i * step, y, step * 0.92, height * 0.95 * count / peak, fill=color)
+
+    ticks = [(x + width * i / 4, y - 11, _fmt(edges[0] + (edges[-1] - edges[0]) * i / 4))
+             for i in range(5)]
+    page.texts(ticks, size=7, color=MUTED, align="center")
+    page.text(x - 4, y + height * 0.95 - 3, f"{peak:,}", size=7, color=MUTED, align="right")
+    page.text(x - 4, y, "0", size=7, color=MUTED, align="right")
+
+
+def _draw_boxes(page, x, top, width, boxes, color):
+    """Horizontal box plots, one row per (label, box stats); returns the bottom y."""
+    boxes = [(label, b) for label, b in boxes if b.get("count")]
+    if not boxes:
+        return top
+    lo = min(b["min"] for _, b in boxes)
+    hi = max(b["max"] for _, b in boxes)
+    span = (hi - lo) or 1
+    label_w = 110
+    plot_x, plot_w = x + label_w, width - label_w
+
+    def pos(v):
+        return plot_x + plot_w * (v - lo) / span
+
+    y = top
+    for label, b in boxes:
+        y -= 20
+        mid = y + 6
+        page.text(x, mid - 3, fit_text(label, label_w - 6, size=8), size=8)
+        page.line(pos(b["whisker_low"]), mid, pos(b["q1"]), mid, color=MUTED)
+        page.line(pos(b["q3"]), mid, pos(b["whisker_high"]), mid, color=MUTED)
+        page.rect(pos(b["q1"]), y, max(pos(b["q3"]) - pos(b["q1"]), 0.5), 12,
+                  fill=color, stroke=TEXT_COLOR)
+        page.line(pos(b["median"]), y, pos(b["median"]), y + 12, color=TEXT_COLOR, line_width=1.2)
+        if b.get("outliers"):
+            page.text(x + width, mid - 3, f"+{b['outliers']:,} outliers", size=6,
+                      color=MUTED, align="right")
+    page.line(plot_x, y - 4, plot_x + plot_w, y - 4, color=GRID)
+    ticks = [(plot_x + plot_w * i / 4, y - 13, _fmt(lo + span * i / 4)) for i in range(5)]
+    page.texts(ticks, size=7, color=MUTED, align="center")
+    return y - 13
+
+
+# ---------- pages ----------
+
+def _header(page, title):
+    page.text(MARGIN, page.height - MARGIN - 14, title, font="Helvetica-Bold", size=14,
+              color=TEXT_COLOR)
+    page.line(MARGIN, page.height - MARGIN - 22, page.width - MARGIN,
+              page.height - MARGIN - 22, color=GRID)
+    return page.height - MARGIN - 40
+
+
+def _footer(page, number, total, ds):
+    page.text(MARGIN, MARGIN / 2, fit_text(ds.name, 300, size=7), size=7, color=MUTED)
+    page.text(page.width - MARGIN, MARGIN / 2, f"Page {number:,} of {total:,}", size=7,
+              color=MUTED, align="right")
+
+
+def _overview_page(page, ds, numeric):
+    summary = ds.summary or {}
+    y = _header(page, "Chemical Equipment Report")
+    meta = [
+        ("File", ds.name),
+        ("Dataset", f"#{ds.id}, revision {ds.revision}"),
+        ("Uploaded at", str(ds.uploaded_at)),
+        ("Rows", f"{ds.row_count:,}"),
+    ]
+    for label, value in meta:
+        page.text(MARGIN, y, label, font="Helvetica-Bold", size=10)
+        page.text(MARGIN + 90, y, fit_text(value, page.width - 2 * MARGIN - 90), size=10)
+        y -= 15
+
+    y -= 15
+    page.text(MARGIN, y, "Summary statistics", font="Helvetica-Bold", size=12)
+    y -= 18
+    headings = ["Column", "Count", "Mean", "Std", "Min", "Q1", "Q3", "Max", "Outliers"]
+    keys = [None, "count", "mean", "std", "min", "q1", "q3", "max", "outliers"]
+    col_w = (page.width - 2 * MARGIN) / len(headings)
+    page.texts([(MARGIN + col_w * (i + 1) - 4, y, h) for i, h in enumerate(headings)],
+               font="Helvetica-Bold", size=8, align="right")
+    page.line(MARGIN, y - 4, page.width - MARGIN, y - 4, color=GRID)
+    stats = summary.get("statistics", {})
+    for col in numeric:
+        y -= 14
+        col_stats = stats.get(col, {})
+        cells = [col] + [_fmt(col_stats.get(k)) for k in keys[1:]]
+        page.texts([(MARGIN + col_w * (i + 1) - 4, y, fit_text(c, col_w - 6, size=8))
+                    for i, c in enumerate(cells)], size=8, align="right")
+
+    y -= 35
+    page.text(MARGIN, y, "Equipment Type distribution", font="Helvetica-Bold", size=12)
+    _draw_type_bars(page, MARGIN, y - 6, page.width - 2 * MARGIN,
+                    summary.get("type_distribution", {}))
+
+
+def _chart_page(page, col, color, hist, boxes):
+    y = _header(page, col)
+    width = page.width - 2 * MARGIN
+    page.text(MARGIN, y, "Distribution", font="Helvetica-Bold", size=11)
+    plot_x = MARGIN + 40
+    _draw_histogram(page, plot_x, y - 250, width - 40, 235, hist, color)
+
+    y -= 290
+    page.text(MARGIN, y, "By equipment Type", font="Helvetica-Bold", size=11)
+    _draw_boxes(page, MARGIN, y - 6, width, boxes, color)
+
+
+def _table_layout(page_width, names):
+    """Left x and width of each table column (the row number is narrower)."""
+    width = page_width - 2 * MARGIN
+    weights = [0.6] + [1.0] * len(names)
+    unit = width / sum(weights)
+    xs, x = [], MARGIN
+    for w in weights:
+        xs.append((x, w * unit))
+        x += w * unit
+    return xs
+
+
+def _table_page(page, ds, names, kinds, layout, first, block, offset, count):
+    y = _header(page, f"Equipment table: rows {first + 1:,} to {first + count:,} "
+                      f"of {ds.row_count:,}")
+    headings = ["#"] + names
+    left, right = [], []
+    for (x, w), heading, kind in zip(layout, headings, [FLOAT] + kinds):
+        label = fit_text(heading, w - 6, font="Helvetica-Bold", size=TABLE_FONT_SIZE)
+        (right if kind == FLOAT else left).append(
+            (x + w - 3 if kind == FLOAT else x + 3, y, label))
+    page.texts(left, font="Helvetica-Bold", size=TABLE_FONT_SIZE)
+    page.texts(right, font="Helvetica-Bold", size=TABLE_FONT_SIZE, align="right")
+    page.line(MARGIN, y - 4, page.width - MARGIN, y - 4, color=GRID)
+
+    left, right = [], []
+    for r in range(count):
+        y -= ROW_HEIGHT
+        if r % 2:
+            page.rect(MARGIN, y - 3, page.width - 2 * MARGIN, ROW_HEIGHT, fill=STRIPE)
+        x, w = layout[0]
+        right.append((x + w - 3, y, f"{first + r + 1:,}"))
+        for (x, w), values, kind in zip(layout[1:], block, kinds):
+            text = fit_text(values[offset + r], w - 6, size=TABLE_FONT_SIZE)
+            if kind == FLOAT:
+                right.append((x + w - 3, y, text))
+            else:
+                left.append((x + 3, y, text))
+    page.texts(left, size=TABLE_FONT_SIZE, color=TEXT_COLOR)
+    page.texts(right, size=TABLE_FONT_SIZE, color=TEXT_COLOR, align="right")
+
+
+def iter_report(ds):
+    """
+    Yield the PDF for `ds` in chunks of about STREAM_BLOCK bytes, rendering
+    page by page; only one block of table rows is in memory at a time.
+    """
+    reader = ds.open_rows()
+    names = reader.column_names
+    kinds = [c["kind"] for c in reader.columns]
+    numeric = [c["name"] for c in reader.columns if c["kind"] == FLOAT]
+    table_pages = math.ceil(reader.row_count / ROWS_PER_PAGE)
+    total_pages = 1 + len(numeric) + table_pages
+
+    pdf = PDFStream(A4, title=f"Chemical Equipment Report: {ds.name}")
+    pending = [pdf.begin()]
+    size = len(pending[0])
+    number = 0
+
+    def add(page):
+        nonlocal size, number
+        number += 1
+        _footer(page, number, total_pages, ds)
+        data = pdf.add_page(page)
+        pending.append(data)
+        size += len(data)
+
+    def flush():
+        nonlocal size
+        chunk = b"".join(pending)
+        pending.clear()
+        size = 0
+        return chunk
+
+    page = pdf.new_page()
+    _overview_page(page, ds, numeric)
+    add(page)
+
+    if numeric:
+        agg = compute_aggregates(reader, numeric, bins=REPORT_BINS, points=0, max_types=MAX_TYPES)
+        types = list((ds.summary or {}).get("type_distribution", {}))[:MAX_TYPES]
+        for i, col in enumerate(numeric):
+            boxes = [(t, agg["box"][t][col]) for t in types if t in agg["box"]]
+            page = pdf.new_page()
+            _chart_page(page, col, COLORS[i % len(COLORS)], agg["histograms"][col], boxes)
+            add(page)
+        del agg
+    yield flush()
+
+    layout = _table_layout(pdf.width, names)
+    for start in range(0, reader.row_count, TABLE_BLOCK):
+        stop = min(start + TABLE_BLOCK, reader.row_count)
+        block = [_column_text(reader.column(name, start, stop)) for name in names]
+        for first in range(start, stop, ROWS_PER_PAGE):
+            page = pdf.new_page()
+            _table_page(page, ds, names, kinds, layout, first, block,
+                        first - start, min(ROWS_PER_PAGE, stop - first))
+            add(page)
+            if size >= STREAM_BLOCK:
+                yield flush()
+
+    pending.append(pdf.end())
+    yield flush()
+
+
+# ---------- cache ----------
+
+def _write_through(ds):
+    """
+    Yield the report chunks while writing them to the cache. The file only
+    becomes visible once complete; an abandoned stream leaves nothing behind.
+    """
+    path = report_path(ds)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = f"{path}.{os.getpid()}-{threading.get_ident()}.tmp"
+    try:
+        with open(tmp, "wb") as f:
+            for chunk in iter_report(ds):
+                f.write(chunk)
+                yield chunk
+        os.replace(tmp, path)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+
+    # older revisions of this dataset's report are now stale
+    remove_reports(ds.id, keep=path)
+
+
+def build_report(ds):
+    """Return the cached PDF path for `ds`, rendering it first if needed."""
+    path = report_path(ds)
+    if not os.path.exists(path):
+        for _ in _write_through(ds):
+            pass
+    return path
+
+
+def remove_reports(dataset_id, keep=None):
+    """Evict the cached reports of a dataset (except `keep`)."""
+    for path in glob.glob(absolute_path(os.path.join(REPORTS_DIR, f"{dataset_id}-*.pdf"))):
+        if path == keep:
+            continue
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+async def _async_chunks(chunks):
+    """
+    Feed a blocking iterator to an ASGI server one chunk at a time (Django
+    would otherwise collect a sync iterator into a list first).
+    """
+    done = object()
+    step = None
+    try:
+        while True:
+            step = _executor.submit(next, chunks, done)
+            chunk = await asyncio.wrap_future(step)
+            if chunk is done:
+                break
+            yield chunk
+    finally:
+        # e.g. a client that went away: a step may still be running, so the
+        # generator is closed (dropping its temp file) once that finishes
+        if hasattr(chunks, "close"):
+            _executor.submit(_close_after, step, chunks)
+
+
+def _close_after(step, chunks):
+    if step is not None:
+        wait([step])
+    chunks.close()
+
+
+def _for_server(request, chunks):
+    return chunks if "wsgi.version" in request.META else _async_chunks(chunks)
+
+
+def serve_report(request, ds, filename):
+    """
+    Respond with the report: from the cache (honouring If-None-Match and
+    If-Modified-Since so unchanged reports cost a 304), or streamed while it
+    is rendered and cached.
+    """
+    etag = f'"{report_key(ds)}"'
+    if_none_match = request.headers.get("If-None-Match")
+    if if_none_match and etag in [t.strip() for t in if_none_match.split(",")]:
+        return _not_modified(etag)
+
+    path = report_path(ds)
+    if not os.path.exists(path):
+        response = StreamingHttpResponse(_for_server(request, _write_through(ds)),
+                                         content_type="application/pdf")
+        response["Content-Disposition"] = content_disposition_header(True, filename)
+        response["ETag"] = etag
+        response["Cache-Control"] = "private, no-cache"
+        return response
+
+    mtime = int(os.path.getmtime(path))
+    since = parse_http_date_safe(request.headers.get("If-Modified-Since", ""))
+    if not if_none_match and since is not None and mtime <= since:
+        return _not_modified(etag)
+
+    response = FileResponse(open(path, "rb"), as_attachment=True, filename=filename,
+                            content_type="application/pdf")
+    response.streaming_content = _for_server(request, iter(response.streaming_content))
+    response["ETag"] = etag
+    response["Last-Modified"] = http_date(mtime)
+    response["Cache-Control"] = "private, no-cache"
+    return response
+
+
+def _not_modified(etag):
+    response = HttpResponseNotModified()
+    response["ETag"] = etag
+    return response
@@ -0,0 +1,53 @@
+"""
+Versioned cache of rendered responses that only change with the datasets
+(latest summary, history).
+
+Entries are keyed by a generation read from the database: one aggregate
+over the (small, retention-capped) dataset table that changes with every
+create, re-upload, append and delete. A write therefore makes every older
+entry unreachable at once, in every worker process and for writes made
+elsewhere (e.g. `manage.py prune_datasets` from cron); no key has to be
+found and deleted. Between writes a poll costs that one query and a cache
+hit, with no serialisation.
+
+The rendered bodies themselves live in the Django cache. With the default
+local-memory backend each process renders its own copy once per
+generation; ETags are built from the data, so they agree across workers.
+"""
+import hashlib
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, Max, Sum
+from rest_framework.renderers import JSONRenderer
+
+from .models import Dataset
+
+
+def generation():
+    """
+    Fingerprint of the dataset table: new rows raise the max id, re-uploads
+    the latest upload time, appends the revision total and deletes the count.
+    """
+    state = Dataset.objects.aggregate(
+        count=Count('id'), last_id=Max('id'), last_upload=Max('uploaded_at'),
+        revisions=Sum('revision'),
+    )
+    fingerprint = "|".join(str(state[k]) for k in ("count", "last_id", "last_upload", "revisions"))
+    return hashlib.sha1(fingerprint.encode()).hexdigest()[:16]
+
+
+def cached_json(name, build):
+    """
+    (etag, JSON bytes) for response `name` at the current generation.
+    On a miss, build() returns (etag, payload); a None payload is cached too.
+    The generation is read before building, so a write that commits
+    meanwhile can only leave a newer body under an already stale key.
+    """
+    key = f"response:{name}:{generation()}"
+    entry = cache.get(key)
+    if entry is None:
+        etag, payload = build()
+        entry = (etag, None if payload is None else JSONRenderer().render(payload))
+        cache.set(key, entry, getattr(settings, "RESPONSE_CACHE_TTL", 300))
+    return entry
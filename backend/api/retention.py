@@ -0,0 +1,192 @@
+"""
+Dataset retention.
+
+Datasets are kept newest first while they fit every configured limit
+(RETENTION_MAX_DATASETS, RETENTION_MAX_AGE_DAYS, RETENTION_MAX_BYTES; None
+disables a limit); everything older goes. The newest dataset is always
+kept. Expired rows are removed with one bulk DELETE and their column files
+and cached reports once that commits.
+
+The same pass sweeps files no row accounts for: column stores and reports
+of datasets that no longer exist, chunked uploads that were never completed
+(or finished long ago) and spooled uploads no job is waiting for. Only files older than
+RETENTION_STALE_HOURS are touched, so in-flight uploads and ingests are safe.
+Jobs that stopped reporting (their worker process is gone, see jobs.py) are
+marked failed first, so they no longer hold on to their files.
+
+Runs on the ingest worker pool after each upload (jobs.schedule_retention)
+and from `manage.py prune_datasets`, never inside a request.
+"""
+import os
+import shutil
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from . import events
+from .compare import clear_compare_cache
+from .db import single_writer
+from .models import Dataset, Job, UploadSession
+from .reports import REPORTS_DIR, remove_reports
+from .services import clear_row_cache
+from .storage import STORAGE_DIR, absolute_path, remove_storage
+from .uploads import CHUNKED_DIR, INCOMING_DIR, discard_parts
+
+
+def retention_limits():
+    """Configured limits, as keyword arguments for select_expired()."""
+    return {
+        "max_datasets": getattr(settings, "RETENTION_MAX_DATASETS", 5),
+        "max_age_days": getattr(settings, "RETENTION_MAX_AGE_DAYS", None),
+        "max_bytes": getattr(settings, "RETENTION_MAX_BYTES", None),
+    }
+
+
+def select_expired(max_datasets=None, max_age_days=None, max_bytes=None, now=None):
+    """
+    (id, storage_path) of every dataset past the newest ones that fit all
+    limits. One query over four narrow columns.
+    """
+    now = now or timezone.now()
+    cutoff = now - timedelta(days=max_age_days) if max_age_days is not None else None
+    rows = Dataset.objects.latest_first().values_list(
+        'id', 'storage_path', 'uploaded_at', 'size_bytes'
+    )
+
+    expired, kept_bytes = [], 0
+    for i, (pk, storage_path, uploaded_at, size) in enumerate(rows.iterator()):
+        kept_bytes += size
+        # once one dataset is over a limit, so is everything older
+        if expired or i > 0 and (
+            (max_datasets is not None and i >= max_datasets)
+            or (cutoff is not None and uploaded_at < cutoff)
+            or (max_bytes is not None and kept_bytes > max_bytes)
+        ):
+            expired.append((pk, storage_path))
+    return expired
+
+
+def delete_datasets(expired):
+    """Bulk-delete the given (id, storage_path) pairs and their files."""
+    if not expired:
+        return
+    with single_writer(), transaction.atomic():
+        Dataset.objects.filter(pk__in=[pk for pk, _ in expired]).only('id').delete()
+        transaction.on_commit(lambda: _remove_files(expired))
+
+
+def _remove_files(expired):
+    for pk, storage_path in expired:
+        remove_storage(storage_path)
+        remove_reports(pk)
+    clear_row_cache()
+    clear_compare_cache()
+
+
+def fail_stale_jobs():
+    """Mark queued or running jobs that stopped reporting as failed; returns their ids."""
+    error = "Interrupted: the worker stopped reporting progress."
+    failed = []
+    for job_id in Job.objects.stale().values_list('id', flat=True):
+        # stale() again: a job that reported meanwhile is still alive
+        if Job.objects.stale().filter(pk=job_id).update(status=Job.FAILED, error=error):
+            failed.append(job_id)
+            events.publish(events.JOB_FINISHED, {
+                "job_id": job_id, "status": Job.FAILED, "error": error, "dataset_id": None,
+            })
+    return failed
+
+
+def _older_than(path, stale_seconds):
+    try:
+        return time.time() - os.path.getmtime(path) > stale_seconds
+    except OSError:
+        return False
+
+
+def _entries(reldir):
+    path = absolute_path(reldir)
+    return [os.path.join(path, name) for name in os.listdir(path)] if os.path.isdir(path) else []
+
+
+def _remove_path(path):
+    if os.path.isdir(path):
+        shutil.rmtree(path, ignore_errors=True)
+    else:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+def sweep_orphans(stale_hours=None, dry_run=False):
+    """
+    Remove leftovers no row accounts for; returns the paths (relative to
+    MEDIA_ROOT) removed, or that would be with dry_run.
+    """
+    if stale_hours is None:
+        stale_hours = getattr(settings, "RETENTION_STALE_HOURS", 24)
+    stale_seconds = stale_hours * 3600
+    stale_before = timezone.now() - timedelta(hours=stale_hours)
+
+    sources = {
+        os.path.basename(p) for p in Job.objects.active().values_list('source_path', flat=True)
+    }
+
+    # upload sessions abandoned before completion, or long finished: rows
+    # and parts go together unless a job is still reading the parts
+    stale_sessions = [
+        pk for pk in UploadSession.objects.filter(
+            Q(completed_at__isnull=True, created_at__lt=stale_before)
+            | Q(completed_at__lt=stale_before)
+        ).values_list('id', flat=True)
+        if str(pk) not in sources
+    ]
+    if stale_sessions and not dry_run:
+        UploadSession.objects.filter(pk__in=stale_sessions).delete()
+        for session_id in stale_sessions:
+            discard_parts(session_id)
+
+    stores = {os.path.basename(p) for p in Dataset.objects.values_list('storage_path', flat=True)}
+    dataset_ids = {str(pk) for pk in Dataset.objects.values_list('id', flat=True)}
+    sessions = {str(pk) for pk in UploadSession.objects.values_list('id', flat=True)}
+
+    orphans = []
+    for path in _entries(STORAGE_DIR):
+        if os.path.basename(path) not in stores:
+            orphans.append(path)
+    for path in _entries(REPORTS_DIR):
+        name = os.path.basename(path)
+        if name.endswith(".tmp") or name.split("-", 1)[0] not in dataset_ids:
+            orphans.append(path)
+    for path in _entries(CHUNKED_DIR):
+        name = os.path.basename(path)
+        if name not in sessions and name not in sources:
+            orphans.append(path)
+    for path in _entries(INCOMING_DIR):
+        if os.path.basename(path) not in sources:
+            orphans.append(path)
+
+    removed = [os.path.join(CHUNKED_DIR, str(session_id)) for session_id in stale_sessions]
+    for path in orphans:
+        if _older_than(path, stale_seconds):
+            if not dry_run:
+                _remove_path(path)
+            removed.append(os.path.relpath(path, absolute_path("")))
+    return removed
+
+
+def prune_datasets(dry_run=False, **limits):
+    """
+    Apply retention with the configured limits (overridable per call) and
+    sweep orphaned files. Returns (expired dataset ids, removed paths).
+    """
+    expired = select_expired(**{**retention_limits(), **limits})
+    if not dry_run:
+        delete_datasets(expired)
+        fail_stale_jobs()
+    return [pk for pk, _ in expired], sweep_orphans(dry_run=dry_run)
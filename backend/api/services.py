@@ -1,28 +1,300 @@
+from functools import lru_cache
+
+import numpy as np
 import pandas as pd
+from django.db import connection, transaction
+from django.utils import timezone
+
+from . import events, metrics
+from .accumulators import SummaryAccumulator
+from .db import single_writer
+from .models import Dataset, Reading
+from .storage import TEXT, ColumnarReader, ColumnarWriter, remove_storage, storage_size
+from .uploads import HashingReader
 
 REQUIRED_COLS = ["Equipment Name", "Type", "Flowrate", "Pressure", "Temperature"]
+NUMERIC_COLS = ["Flowrate", "Pressure", "Temperature"]
+
+# Rows parsed per chunk; peak memory during ingestion scales with this,
+# not with the size of the uploaded file.
+CHUNK_SIZE = 50_000
+
+# Reading columns in insert order (see index_readings).
+READING_FIELDS = [
+    "dataset", "equipment_name", "equipment_type", "flowrate", "pressure", "temperature",
+]
+
+
+def iter_csv_chunks(file_obj, chunksize=CHUNK_SIZE):
+    """
+    Read the CSV once, yielding DataFrames of at most `chunksize` rows.
+    The header is validated on the first chunk.
+    """
+    reader = pd.read_csv(file_obj, chunksize=chunksize)
+    validated = False
+    for chunk in reader:
+        if not validated:
+            for col in REQUIRED_COLS:
+                if col not in chunk.columns:
+                    raise ValueError(f"Missing required column: {col}")
+            validated = True
+        yield chunk
+
+
+def ingest_csv(file_obj, on_chunk=None, chunksize=CHUNK_SIZE, accumulator=None, stages=None):
+    """
+    Single-pass ingestion: parse the CSV in bounded chunks, fold each chunk
+    into a SummaryAccumulator and hand it to `on_chunk` (e.g. to store the
+    rows). Pass an existing `accumulator` to extend it, and metrics.Stages
+    to time the parse, summarise and serialise steps. Returns the
+    accumulator.
+    """
+    acc = accumulator or SummaryAccumulator(NUMERIC_COLS)
+    stages = stages or metrics.Stages("ingest")
+    chunks = iter_csv_chunks(file_obj, chunksize=chunksize)
+    while True:
+        with stages("parse"):
+            chunk = next(chunks, None)
+        if chunk is None:
+            break
+        with stages("summarise"):
+            acc.update(chunk)
+        if on_chunk is not None:
+            with stages("serialise"):
+                on_chunk(chunk)
+    return acc
+
 
 def compute_summary(file_obj):
-    # Read CSV
-    df = pd.read_csv(file_obj)
-
-    # (Optional) validate columns
-    for col in REQUIRED_COLS:
-        if col not in df.columns:
-            raise ValueError(f"Missing required column: {col}")
-
-    # Safe numeric means
-    def mean_of(col):
-        s = pd.to_numeric(df[col], errors='coerce')
-        return float(s.mean()) if s.notna().any() else None
-
-    summary = {
-        "total_count": int(len(df)),
-        "averages": {
-            "Flowrate": mean_of("Flowrate"),
-            "Pressure": mean_of("Pressure"),
-            "Temperature": mean_of("Temperature"),
-        },
-        "type_distribution": df["Type"].value_counts(dropna=False).to_dict(),
+    return ingest_csv(file_obj).result()
+
+
+# Sorted/filtered row orders kept in memory, so paging through a sorted view
+# only pays for the sort once. Keys include row_count, so appends miss.
+ROW_ORDER_CACHE_SIZE = 8
+
+
+def select_rows(ds, sort=None, descending=False, search=None, type_=None):
+    """
+    Row positions of `ds` matching the filters, in display order. Returns
+    None for the plain unsorted, unfiltered view (rows are read by range).
+    """
+    if not (sort or search or type_):
+        return None
+    return _row_order(ds.storage_path, ds.row_count, sort, descending, search or None,
+                      type_ or None)
+
+
+def clear_row_cache():
+    """Forget cached row orders, e.g. after datasets were deleted."""
+    _row_order.cache_clear()
+
+
+@lru_cache(maxsize=ROW_ORDER_CACHE_SIZE)
+def _row_order(storage_path, row_count, sort, descending, search, type_):
+    reader = ColumnarReader(storage_path)
+    keep = np.ones(reader.row_count, dtype=bool)
+    if type_:
+        keep &= reader.text_mask("Type", equals=type_)
+    if search:
+        if search.isascii():
+            hit = np.zeros(reader.row_count, dtype=bool)
+            for col in reader.columns:
+                if col["kind"] == TEXT:
+                    hit |= reader.text_mask(col["name"], contains=search)
+        else:
+            # full Unicode case folding needs decoded values
+            hit = np.zeros(reader.row_count, dtype=bool)
+            for col in reader.columns:
+                if col["kind"] == TEXT:
+                    values = pd.Series(reader.column(col["name"]), dtype=object)
+                    hit |= values.str.contains(search, case=False, regex=False,
+                                               na=False).to_numpy()
+        keep &= hit
+    order = np.flatnonzero(keep)
+
+    if sort:
+        values = pd.Series(reader.take(sort, order))
+        # stable, with missing values last in either direction
+        ranked = values.sort_values(ascending=not descending, kind="stable",
+                                    na_position="last")
+        order = order[ranked.index.to_numpy()]
+    order.setflags(write=False)
+    return order
+
+
+def create_dataset_from_csv(file_obj, name, content_hash=None, declared_hash=None):
+    """
+    Ingest a CSV into a new Dataset: the summary, extended statistics
+    included, is accumulated while the rows are written to the column store
+    in one pass. Percentiles and outlier counts come from the accumulator's
+    sketch, as after an append, so memory does not grow with the row count.
+    Unless the caller already knows it, the content hash is computed on the
+    same pass; a `declared_hash` the client sent ahead must match it.
+    """
+    source = file_obj if content_hash else HashingReader(file_obj)
+    with metrics.Stages("ingest") as stages:
+        with ColumnarWriter(float_columns=NUMERIC_COLS) as writer:
+            acc = ingest_csv(source, on_chunk=writer.write, stages=stages)
+
+        try:
+            if declared_hash and source.hexdigest() != declared_hash:
+                raise ValueError("The file does not match its declared SHA-256.")
+            with stages("statistics"):
+                summary = acc.result()
+            with stages("db_write"), single_writer(), transaction.atomic():
+                ds = Dataset.objects.create(
+                    name=name,
+                    uploaded_at=timezone.now(),
+                    summary=summary,
+                    stats_state=acc.to_state(),
+                    storage_path=writer.relpath,
+                    row_count=writer.row_count,
+                    size_bytes=storage_size(writer.relpath),
+                    content_hash=content_hash or source.hexdigest(),
+                )
+                index_readings(ds)
+        except Exception:
+            writer.discard()
+            raise
+    events.publish(events.DATASET_CREATED, dataset_payload(ds))
+    return ds
+
+
+def index_readings(ds, start=0):
+    """
+    Copy stored rows from `start` on into the Reading table, a chunk of
+    columns at a time. Rows without an Equipment Name are skipped.
+
+    The rows go in through one parameterised INSERT per chunk (executemany):
+    bulk_create would prepare every value through its model field, which
+    costs more than the insert itself at hundreds of thousands of rows.
+    """
+    fields = [Reading._meta.get_field(name) for name in READING_FIELDS]
+    sql = "INSERT INTO {} ({}) VALUES ({})".format(
+        connection.ops.quote_name(Reading._meta.db_table),
+        ", ".join(connection.ops.quote_name(f.column) for f in fields),
+        ", ".join(["%s"] * len(fields)),
+    )
+
+    reader = ds.open_rows()
+    with transaction.atomic(), connection.cursor() as cursor:
+        for lo in range(start, reader.row_count, CHUNK_SIZE):
+            hi = lo + CHUNK_SIZE
+            columns = [
+                np.where(np.isnan(values), None, values).tolist()
+                for values in (reader.column(col, lo, hi) for col in NUMERIC_COLS)
+            ]
+            cursor.executemany(sql, [
+                (ds.pk, name[:255], (eq_type or "")[:255], *values)
+                for name, eq_type, *values in zip(
+                    reader.column("Equipment Name", lo, hi), reader.column("Type", lo, hi),
+                    *columns,
+                )
+                if name
+            ])
+
+
+def reuse_duplicate(content_hash):
+    """
+    If a dataset with this content hash is already stored, mark it as the
+    latest upload and return it instead of ingesting the file again.
+    """
+    if not content_hash:
+        return None
+    ds = Dataset.objects.filter(content_hash=content_hash).order_by('-uploaded_at').first()
+    if ds:
+        ds.uploaded_at = timezone.now()
+        with single_writer(), transaction.atomic():
+            ds.save(update_fields=['uploaded_at'])
+        events.publish(events.DATASET_UPDATED, dataset_payload(ds))
+    return ds
+
+
+def dataset_payload(ds):
+    """Flat response body shared by upload, append and summary endpoints."""
+    return {
+        "dataset_id": ds.id,
+        "filename": ds.name,
+        "uploaded_at": ds.uploaded_at,
+        "content_hash": ds.content_hash,
+        **ds.summary,
     }
-    return summary
+
+
+def _accumulate_stored(reader):
+    """Rebuild accumulator state from stored rows, a chunk at a time."""
+    acc = SummaryAccumulator(NUMERIC_COLS)
+    for start in range(0, reader.row_count, CHUNK_SIZE):
+        stop = start + CHUNK_SIZE
+        acc.update(pd.DataFrame({
+            col: reader.column(col, start, stop) for col in ["Type", *NUMERIC_COLS]
+        }))
+    return acc
+
+
+def _append_staged(dataset_id, relpath, delta, stages):
+    """
+    Copy a staged delta onto the dataset, merge its accumulator and index
+    the new rows in one transaction. meta.json already counts the new rows
+    once the copy is closed, so a failure after it cuts the store back to
+    the row count the rolled-back transaction left behind.
+    """
+    indexed = None
+    try:
+        with transaction.atomic():
+            ds = Dataset.objects.select_for_update().get(pk=dataset_id)
+            if ds.stats_state:
+                acc = SummaryAccumulator.from_state(ds.stats_state)
+            else:
+                acc = _accumulate_stored(ds.open_rows())
+
+            indexed = ds.row_count
+            with ColumnarWriter(ds.storage_path) as writer:
+                with stages("serialise"):
+                    writer.write_store(relpath)
+                with stages("summarise"):
+                    acc.merge(delta)
+                    ds.summary = acc.result()
+                with stages("db_write"):
+                    ds.stats_state = acc.to_state()
+                    ds.row_count = writer.row_count
+                    ds.revision += 1
+                    ds.content_hash = ""
+                    ds.save(update_fields=[
+                        'summary', 'stats_state', 'row_count', 'revision', 'content_hash',
+                    ])
+            with stages("db_write"):
+                ds.size_bytes = storage_size(ds.storage_path)
+                ds.save(update_fields=['size_bytes'])
+                index_readings(ds, start=indexed)
+        return ds
+    except BaseException:
+        if indexed is not None:
+            with ColumnarWriter(ds.storage_path) as writer:
+                writer.truncate(indexed)
+        raise
+
+
+def append_csv_to_dataset(dataset_id, file_obj):
+    """
+    Append a CSV delta to an existing dataset. Only the delta is parsed: its
+    accumulator is merged into the stored state and the summary rebuilt from
+    that.
+
+    The delta is parsed into a staging column store first, outside any lock;
+    the write lock only covers copying those files onto the dataset, merging
+    the state and indexing the new rows.
+    """
+    with metrics.Stages("append") as stages:
+        with ColumnarWriter(float_columns=NUMERIC_COLS) as staged:
+            delta = ingest_csv(file_obj, on_chunk=staged.write, stages=stages)
+
+        try:
+            with single_writer():
+                ds = _append_staged(dataset_id, staged.relpath, delta, stages)
+        finally:
+            remove_storage(staged.relpath)
+        events.publish(events.DATASET_UPDATED, dataset_payload(ds))
+
+    return ds, delta.total_count
@@ -0,0 +1,422 @@
+"""
+Columnar on-disk storage for dataset rows.
+
+Each dataset gets a directory under MEDIA_ROOT/datasets/ holding one set of
+files per column plus a small `meta.json`:
+
+  numeric columns  ->  c<i>.f8   raw little-endian float64 (NaN = missing)
+  text columns     ->  c<i>.off  int64 offsets (row_count + 1 entries)
+                       c<i>.dat  concatenated UTF-8 values
+                       c<i>.nul  uint8 null flags
+
+Every file is fixed-width or offset-indexed, so a reader can memory-map a
+column and pull any row range without touching the rest of the dataset.
+"""
+import json
+import os
+import shutil
+import uuid
+
+import numpy as np
+import pandas as pd
+from django.conf import settings
+
+STORAGE_DIR = "datasets"
+META_FILE = "meta.json"
+FORMAT_VERSION = 1
+
+FLOAT = "float"
+TEXT = "text"
+
+_FLOAT_DTYPE = np.dtype("<f8")
+_OFFSET_DTYPE = np.dtype("<i8")
+
+# write_store() copies at most this many bytes / text offsets at a time.
+_COPY_BLOCK = 1024 * 1024
+_COPY_ROWS = 1 << 16
+
+
+def absolute_path(relpath):
+    return os.path.join(settings.MEDIA_ROOT, relpath)
+
+
+def storage_size(relpath):
+    """Bytes a dataset's column files take on disk (0 if missing)."""
+    path = absolute_path(relpath) if relpath else ""
+    if not os.path.isdir(path):
+        return 0
+    with os.scandir(path) as entries:
+        return sum(e.stat().st_size for e in entries if e.is_file())
+
+
+def remove_storage(relpath):
+    """Delete a dataset's column files (no-op if already gone)."""
+    if relpath:
+        shutil.rmtree(absolute_path(relpath), ignore_errors=True)
+
+
+class ColumnarWriter:
+    """
+    Appends DataFrame chunks to a new (or existing) column store. Columns
+    named in `float_columns` are stored as float64 (non-numeric cells become
+    missing); everything else is stored as text.
+
+    Use as a context manager: the files are finalised on success and removed
+    again if the block raises, so a failed ingestion leaves nothing behind.
+    """
+
+    def __init__(self, relpath=None, float_columns=()):
+        self.float_columns = set(float_columns)
+        self.relpath = relpath or os.path.join(STORAGE_DIR, uuid.uuid4().hex)
+        self.path = absolute_path(self.relpath)
+        self._appending = relpath is not None
+        self.columns = []
+        self.row_count = 0
+        self._text_pos = {}
+        self._files = {}
+
+        if self._appending:
+            meta = _read_meta(self.path)
+            self.columns = meta["columns"]
+            self.row_count = meta["row_count"]
+            self._truncate_to(self.row_count)
+        else:
+            os.makedirs(self.path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.discard()
+        return False
+
+    def _truncate_to(self, row_count):
+        """
+        Cut every column file back to `row_count` rows. Bytes past that point
+        are leftovers of an append that failed before meta.json was updated.
+        """
+        for col in self.columns:
+            base = os.path.join(self.path, col["file"])
+            if col["kind"] == FLOAT:
+                os.truncate(base + ".f8", row_count * _FLOAT_DTYPE.itemsize)
+                continue
+            with open(base + ".off", "rb") as f:
+                f.seek(row_count * _OFFSET_DTYPE.itemsize)
+                end = int(np.frombuffer(f.read(_OFFSET_DTYPE.itemsize), dtype=_OFFSET_DTYPE)[0])
+            os.truncate(base + ".off", (row_count + 1) * _OFFSET_DTYPE.itemsize)
+            os.truncate(base + ".dat", end)
+            os.truncate(base + ".nul", row_count)
+            self._text_pos[col["file"]] = end
+
+    def _open(self, name):
+        if name not in self._files:
+            self._files[name] = open(os.path.join(self.path, name), "ab")
+        return self._files[name]
+
+    def _init_columns(self, chunk):
+        for i, name in enumerate(chunk.columns):
+            kind = FLOAT if name in self.float_columns else TEXT
+            base = f"c{i}"
+            self.columns.append({"name": str(name), "kind": kind, "file": base})
+            if kind == FLOAT:
+                self._open(base + ".f8")
+            else:
+                self._text_pos[base] = 0
+                self._open(base + ".off").write(np.zeros(1, dtype=_OFFSET_DTYPE).tobytes())
+                self._open(base + ".dat")
+                self._open(base + ".nul")
+
+    def write(self, chunk):
+        if not self.columns:
+            self._init_columns(chunk)
+        elif {str(c) for c in chunk.columns} != {c["name"] for c in self.columns}:
+            raise ValueError(
+                "CSV columns do not match the dataset: "
+                + ", ".join(c["name"] for c in self.columns)
+            )
+        if chunk.empty:
+            return
+
+        for col in self.columns:
+            values = chunk[col["name"]]
+            base = col["file"]
+            if col["kind"] == FLOAT:
+                arr = _to_float(values)
+                self._open(base + ".f8").write(arr.astype(_FLOAT_DTYPE).tobytes())
+            else:
+                nulls = values.isna().to_numpy()
+                encoded = [
+                    b"" if null else str(v).encode("utf-8")
+                    for v, null in zip(values.tolist(), nulls)
+                ]
+                lengths = np.fromiter(map(len, encoded), dtype=_OFFSET_DTYPE,
+                                      count=len(encoded))
+                offsets = self._text_pos[base] + np.cumsum(lengths)
+                self._text_pos[base] = int(offsets[-1])
+                self._open(base + ".dat").write(b"".join(encoded))
+                self._open(base + ".off").write(offsets.astype(_OFFSET_DTYPE).tobytes())
+                self._open(base + ".nul").write(nulls.astype(np.uint8).tobytes())
+
+        self.row_count += len(chunk)
+
+    def write_store(self, relpath):
+        """
+        Append every row of another column store (e.g. a delta staged
+        elsewhere) without parsing it again: column files are copied as
+        they are, with text offsets moved past this store's data.
+        """
+        source = ColumnarReader(relpath)
+        if not self.columns:
+            self.float_columns = {c["name"] for c in source.columns if c["kind"] == FLOAT}
+            self._init_columns(pd.DataFrame(columns=source.column_names))
+        elif set(source.column_names) != {c["name"] for c in self.columns}:
+            raise ValueError(
+                "CSV columns do not match the dataset: "
+                + ", ".join(c["name"] for c in self.columns)
+            )
+        rows = source.row_count
+        if rows == 0:
+            return
+
+        for col in self.columns:
+            other = source._by_name[col["name"]]
+            if other["kind"] != col["kind"]:
+                raise ValueError(f"Column {col['name']} is stored as {col['kind']}.")
+            base = col["file"]
+            if col["kind"] == FLOAT:
+                _copy_bytes(source._file(other, ".f8"), self._open(base + ".f8"),
+                            rows * _FLOAT_DTYPE.itemsize)
+                continue
+            offsets = source._memmap(other, ".off", _OFFSET_DTYPE, rows + 1)
+            out = self._open(base + ".off")
+            for lo in range(1, rows + 1, _COPY_ROWS):
+                shifted = offsets[lo:lo + _COPY_ROWS] + self._text_pos[base]
+                out.write(shifted.astype(_OFFSET_DTYPE).tobytes())
+            _copy_bytes(source._file(other, ".dat"), self._open(base + ".dat"), int(offsets[-1]))
+            _copy_bytes(source._file(other, ".nul"), self._open(base + ".nul"), rows)
+            self._text_pos[base] += int(offsets[-1])
+
+        self.row_count += rows
+
+    def truncate(self, row_count):
+        """Drop every row from `row_count` on, e.g. to undo an append."""
+        self._close_files()
+        self._truncate_to(row_count)
+        self.row_count = row_count
+
+    def _close_files(self):
+        for f in self._files.values():
+            f.close()
+        self._files = {}
+
+    def close(self):
+        self._close_files()
+        meta = {
+            "version": FORMAT_VERSION,
+            "row_count": self.row_count,
+            "columns": self.columns,
+        }
+        tmp = os.path.join(self.path, META_FILE + ".tmp")
+        with open(tmp, "w") as f:
+            json.dump(meta, f)
+        os.replace(tmp, os.path.join(self.path, META_FILE))
+
+    def discard(self):
+        self._close_files()
+        if self._appending:
+            self._truncate_to(_read_meta(self.path)["row_count"])
+        else:
+            shutil.rmtree(self.path, ignore_errors=True)
+
+
+class ColumnarReader:
+    """Random-access reads of row ranges and individual columns."""
+
+    def __init__(self, relpath):
+        self.relpath = relpath
+        self.path = absolute_path(relpath)
+        meta = _read_meta(self.path)
+        self.row_count = meta["row_count"]
+        self.columns = meta["columns"]
+        self._by_name = {c["name"]: c for c in self.columns}
+
+    @property
+    def column_names(self):
+        return [c["name"] for c in self.columns]
+
+    def _file(self, col, ext):
+        return os.path.join(self.path, col["file"] + ext)
+
+    def _memmap(self, col, ext, dtype, length):
+        if length == 0:
+            return np.empty(0, dtype=dtype)
+        return np.memmap(self._file(col, ext), dtype=dtype, mode="r", shape=(length,))
+
+    def _bounds(self, start, stop):
+        stop = self.row_count if stop is None else min(stop, self.row_count)
+        start = max(0, min(start, stop))
+        return start, stop
+
+    def column(self, name, start=0, stop=None):
+        """
+        Numeric columns come back as a float64 array (a read-only view of the
+        file for full-column reads); text columns as an object array.
+        """
+        col = self._by_name[name]
+        start, stop = self._bounds(start, stop)
+
+        if col["kind"] == FLOAT:
+            return self._memmap(col, ".f8", _FLOAT_DTYPE, self.row_count)[start:stop]
+
+        offsets = np.array(
+            self._memmap(col, ".off", _OFFSET_DTYPE, self.row_count + 1)[start:stop + 1]
+        )
+        nulls = np.array(self._memmap(col, ".nul", np.uint8, self.row_count)[start:stop])
+        out = np.empty(stop - start, dtype=object)
+        if stop == start:
+            return out
+
+        with open(self._file(col, ".dat"), "rb") as f:
+            f.seek(int(offsets[0]))
+            blob = f.read(int(offsets[-1] - offsets[0]))
+        rel = offsets - offsets[0]
+        for i in range(stop - start):
+            out[i] = None if nulls[i] else blob[rel[i]:rel[i + 1]].decode("utf-8")
+        return out
+
+    def take(self, name, indices):
+        """Values of column `name` at the given row positions (any order)."""
+        col = self._by_name[name]
+        indices = np.asarray(indices, dtype=np.int64)
+        if col["kind"] == FLOAT:
+            return np.array(self._memmap(col, ".f8", _FLOAT_DTYPE, self.row_count)[indices])
+
+        out = np.empty(indices.size, dtype=object)
+        if indices.size == 0:
+            return out
+        offsets = self._memmap(col, ".off", _OFFSET_DTYPE, self.row_count + 1)
+        starts, ends = np.array(offsets[indices]), np.array(offsets[indices + 1])
+        nulls = np.array(self._memmap(col, ".nul", np.uint8, self.row_count)[indices])
+        blob = self._memmap(col, ".dat", np.uint8, int(offsets[-1]))
+        for i in range(indices.size):
+            out[i] = None if nulls[i] else bytes(blob[starts[i]:ends[i]]).decode("utf-8")
+        return out
+
+    def text_mask(self, name, equals=None, contains=None):
+        """
+        Boolean row mask for a text column, computed on the raw bytes without
+        decoding values: `equals` is an exact match, `contains` a substring
+        match that ignores ASCII case.
+        """
+        col = self._by_name[name]
+        offsets = np.array(self._memmap(col, ".off", _OFFSET_DTYPE, self.row_count + 1))
+        nulls = np.array(self._memmap(col, ".nul", np.uint8, self.row_count)).astype(bool)
+        blob = self._memmap(col, ".dat", np.uint8, int(offsets[-1]))
+        starts, lengths = offsets[:-1], np.diff(offsets)
+        mask = ~nulls
+
+        if equals is not None:
+            needle = np.frombuffer(equals.encode("utf-8"), dtype=np.uint8)
+            mask &= lengths == needle.size
+            rows = np.flatnonzero(mask)
+            if needle.size and rows.size:
+                window = blob[starts[rows, None] + np.arange(needle.size)]
+                mask[rows] = (window == needle).all(axis=1)
+
+        if contains:
+            needle = np.frombuffer(contains.lower().encode("utf-8"), dtype=np.uint8)
+            if needle.size > blob.size:
+                return np.zeros(self.row_count, dtype=bool)
+            data = np.array(blob)
+            upper = (data >= 65) & (data <= 90)
+            data[upper] += 32
+            # positions where the whole needle matches
+            hits = np.ones(data.size - needle.size + 1, dtype=bool)
+            for i, byte in enumerate(needle):
+                hits &= data[i:data.size - needle.size + 1 + i] == byte
+            pos = np.flatnonzero(hits)
+            rows = np.searchsorted(offsets, pos, side="right") - 1
+            # a match must not run past the end of its own value
+            inside = pos + needle.size <= offsets[rows + 1]
+            found = np.zeros(self.row_count, dtype=bool)
+            found[rows[inside]] = True
+            mask &= found
+
+        return mask
+
+    def factorize(self, name):
+        """
+        (codes, uniques) for a text column: rows with equal values share a
+        code indexing `uniques` (None for missing). Values are grouped on
+        their raw bytes, one numpy pass per distinct length, and only the
+        distinct ones are decoded.
+        """
+        col = self._by_name[name]
+        offsets = np.array(self._memmap(col, ".off", _OFFSET_DTYPE, self.row_count + 1))
+        nulls = np.array(self._memmap(col, ".nul", np.uint8, self.row_count)).astype(bool)
+        blob = self._memmap(col, ".dat", np.uint8, int(offsets[-1]))
+        starts, lengths = offsets[:-1], np.diff(offsets)
+
+        codes = np.empty(self.row_count, dtype=np.int64)
+        uniques = []
+        if nulls.any():
+            codes[nulls] = len(uniques)
+            uniques.append(None)
+        for length in np.unique(lengths[~nulls]):
+            rows = np.flatnonzero(~nulls & (lengths == length))
+            if length == 0:
+                codes[rows] = len(uniques)
+                uniques.append("")
+                continue
+            window = np.ascontiguousarray(blob[starts[rows, None] + np.arange(length)])
+            keys, inverse = np.unique(
+                window.view(np.dtype((np.void, int(length)))).ravel(), return_inverse=True
+            )
+            codes[rows] = len(uniques) + inverse.ravel()
+            uniques.extend(bytes(key).decode("utf-8") for key in keys)
+        return codes, uniques
+
+    def rows_at(self, indices, fields=None):
+        """Rows at the given positions as dicts, limited to `fields` if given."""
+        names = fields or self.column_names
+        cols = {name: _json_values(self.take(name, indices)) for name in names}
+        return [{name: cols[name][i] for name in names} for i in range(len(indices))]
+
+    def rows(self, start=0, stop=None, fields=None):
+        """Rows [start, stop) as dicts, limited to `fields` if given."""
+        names = fields or self.column_names
+        start, stop = self._bounds(start, stop)
+        cols = {name: _json_values(self.column(name, start, stop)) for name in names}
+        return [
+            {name: cols[name][i] for name in names}
+            for i in range(stop - start)
+        ]
+
+
+def _copy_bytes(path, out, length):
+    """Copy the first `length` bytes of the file at `path` to `out`."""
+    with open(path, "rb") as f:
+        while length > 0:
+            block = f.read(min(length, _COPY_BLOCK))
+            if not block:
+                raise ValueError(f"{path} is shorter than its metadata says.")
+            out.write(block)
+            length -= len(block)
+
+
+def _read_meta(path):
+    with open(os.path.join(path, META_FILE)) as f:
+        return json.load(f)
+
+
+def _to_float(values):
+    return pd.to_numeric(values, errors="coerce").to_numpy(dtype=float, na_value=np.nan)
+
+
+def _json_values(arr):
+    if arr.dtype == object:
+        return arr.tolist()
+    return [None if np.isnan(v) else v for v in arr.tolist()]
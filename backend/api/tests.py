@@ -1,3 +1,1410 @@
-from django.test import TestCase
+import asyncio
+import hashlib
+import io
+import json
+import os
+import re
+import shutil
+import tempfile
+import threading
+import time
+from datetime import timedelta
+from pathlib import Path
+from unittest import mock
 
-# Create your tests here.
+import numpy as np
+import pandas as pd
+from asgiref.sync import sync_to_async
+from django.contrib.auth.models import User
+from django.core.exceptions import ImproperlyConfigured
+from django.db import connection, transaction
+from django.db.migrations.executor import MigrationExecutor
+from django.db.utils import ConnectionHandler, OperationalError
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.utils import timezone
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from backend.database import database_settings
+
+from . import events, jobs
+from .accumulators import QuantileSketch, SummaryAccumulator
+from .aggregates import OTHER_TYPES, compute_aggregates
+from .authentication import TokenCache, token_cache
+from .benchmark import SCENARIOS, compare_to_baseline, generate_csv, run_benchmarks
+from .db import single_writer
+from .models import Dataset, Event, Job, Reading
+from .retention import fail_stale_jobs, prune_datasets, select_expired
+from .services import NUMERIC_COLS, REQUIRED_COLS
+from .storage import ColumnarReader, ColumnarWriter, absolute_path, storage_size
+from .uploads import INCOMING_DIR, parts_dir
+
+
+class MediaRootMixin:
+    """Runs each test against an empty temporary MEDIA_ROOT."""
+
+    def setUp(self):
+        super().setUp()
+        self.tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp, ignore_errors=True)
+        media = override_settings(MEDIA_ROOT=self.tmp)
+        media.enable()
+        self.addCleanup(media.disable)
+
+
+class ApiMixin(MediaRootMixin):
+    """An authenticated APIClient and seeded CSVs to upload."""
+
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_user("alice", password="secret")
+        self.client = APIClient()
+        self.client.credentials(
+            HTTP_AUTHORIZATION="Token " + Token.objects.create(user=self.user).key
+        )
+        token_cache.clear()
+        # retention runs on the worker pool, outside the test's transaction
+        retention = mock.patch("api.views.schedule_retention")
+        retention.start()
+        self.addCleanup(retention.stop)
+
+    def csv(self, rows=300, seed=0):
+        path = generate_csv(os.path.join(self.tmp, f"{rows}_{seed}.csv"), rows, seed=seed)
+        with open(path, "rb") as f:
+            return f.read()
+
+    def upload(self, content, name="a.csv"):
+        return self.client.post(
+            "/api/upload/", {"file": SimpleUploadedFile(name, content)}, format="multipart"
+        )
+
+
+class ColumnStoreTests(MediaRootMixin, TestCase):
+    FRAME = pd.DataFrame({
+        "Equipment Name": ["Pump-1", None, "Valve-ä", "pump-2"],
+        "Type": ["Pump", "Valve", np.nan, "Pump"],
+        "Flowrate": [1.5, "junk", None, 4.0],
+    })
+
+    def _write(self, *chunks):
+        with ColumnarWriter(float_columns=["Flowrate"]) as writer:
+            for chunk in chunks:
+                writer.write(chunk)
+        return writer.relpath
+
+    def test_round_trip(self):
+        reader = ColumnarReader(self._write(self.FRAME.iloc[:3], self.FRAME.iloc[3:]))
+        self.assertEqual(reader.row_count, 4)
+        self.assertEqual(reader.column_names, ["Equipment Name", "Type", "Flowrate"])
+
+        self.assertEqual(list(reader.column("Equipment Name")),
+                         ["Pump-1", None, "Valve-ä", "pump-2"])
+        self.assertEqual(list(reader.column("Type", 1, 3)), ["Valve", None])
+        np.testing.assert_array_equal(reader.column("Flowrate"), [1.5, np.nan, np.nan, 4.0])
+        self.assertEqual(list(reader.take("Equipment Name", [3, 0, 2])),
+                         ["pump-2", "Pump-1", "Valve-ä"])
+        np.testing.assert_array_equal(reader.take("Flowrate", [3, 1]), [4.0, np.nan])
+
+        self.assertEqual(reader.rows(2, 10), [
+            {"Equipment Name": "Valve-ä", "Type": None, "Flowrate": None},
+            {"Equipment Name": "pump-2", "Type": "Pump", "Flowrate": 4.0},
+        ])
+        self.assertEqual(reader.rows(fields=["Flowrate"])[0], {"Flowrate": 1.5})
+        self.assertEqual(reader.rows_at([1], fields=["Equipment Name"]),
+                         [{"Equipment Name": None}])
+
+    def test_text_mask(self):
+        reader = ColumnarReader(self._write(self.FRAME))
+        self.assertEqual(reader.text_mask("Type", equals="Pump").tolist(),
+                         [True, False, False, True])
+        self.assertEqual(reader.text_mask("Equipment Name", contains="PUMP").tolist(),
+                         [True, False, False, True])
+        # matches never span two values, and nulls never match
+        self.assertEqual(reader.text_mask("Equipment Name", contains="1Valve").tolist(),
+                         [False] * 4)
+        self.assertEqual(reader.text_mask("Equipment Name", contains="ä").tolist(),
+                         [False, False, True, False])
+        self.assertEqual(reader.text_mask("Type", equals="").tolist(), [False] * 4)
+
+    def test_append_and_discard(self):
+        relpath = self._write(self.FRAME)
+        with ColumnarWriter(relpath) as writer:
+            writer.write(self.FRAME.iloc[:2])
+        self.assertEqual(ColumnarReader(relpath).row_count, 6)
+
+        # a failed append leaves the store as it was, and the next one fits on
+        with self.assertRaises(RuntimeError):
+            with ColumnarWriter(relpath) as writer:
+                writer.write(self.FRAME)
+                raise RuntimeError
+        with self.assertRaises(ValueError):
+            with ColumnarWriter(relpath) as writer:
+                writer.write(pd.DataFrame({"Other": [1]}))
+        with ColumnarWriter(relpath) as writer:
+            writer.write(self.FRAME.iloc[3:])
+
+        reader = ColumnarReader(relpath)
+        self.assertEqual(reader.row_count, 7)
+        self.assertEqual(list(reader.column("Equipment Name", 4)),
+                         ["Pump-1", None, "pump-2"])
+
+        # e.g. when saving the Dataset row fails after the rows were written
+        with ColumnarWriter(float_columns=["Flowrate"]) as writer:
+            writer.write(self.FRAME)
+        writer.discard()
+        self.assertFalse(os.path.exists(absolute_path(writer.relpath)))
+
+    def test_write_store(self):
+        relpath = self._write(self.FRAME.iloc[:1])
+        delta = self._write(self.FRAME.iloc[1:])
+        with ColumnarWriter(relpath) as writer:
+            writer.write_store(delta)
+
+        reader = ColumnarReader(relpath)
+        expected = ColumnarReader(self._write(self.FRAME))
+        self.assertEqual(reader.rows(), expected.rows())
+        self.assertEqual(reader.text_mask("Type", equals="Pump").tolist(),
+                         [True, False, False, True])
+
+
+class MigrationMixin(MediaRootMixin):
+    """Migrates to the given targets; the latest schema is restored afterwards."""
+
+    def _migrate(self, targets):
+        executor = MigrationExecutor(connection)
+        executor.loader.build_graph()
+        executor.migrate(targets)
+        return executor.loader.project_state(targets).apps
+
+    def tearDown(self):
+        self._migrate(MigrationExecutor(connection).loader.graph.leaf_nodes())
+        super().tearDown()
+
+
+class ColumnStoreMigrationTests(MigrationMixin, TransactionTestCase):
+    before = [("api", "0004_dataset_storage_path_row_count")]
+    after = [("api", "0005_move_raw_data_to_column_store")]
+
+    def test_raw_data_moves_to_the_column_store(self):
+        apps = self._migrate(self.before)
+        rows = [
+            {"Equipment Name": "Pump-1", "Type": "Pump", "Flowrate": 1.5,
+             "Pressure": None, "Temperature": 90},
+            {"Equipment Name": None, "Type": "Valve", "Flowrate": "n/a",
+             "Pressure": 2.0, "Temperature": 80},
+        ]
+        pk = apps.get_model("api", "Dataset").objects.create(
+            name="a.csv", uploaded_at=timezone.now(), summary={}, raw_data=rows,
+        ).pk
+
+        apps = self._migrate(self.after)
+        ds = apps.get_model("api", "Dataset").objects.get(pk=pk)
+        self.assertEqual(ds.row_count, 2)
+        reader = ColumnarReader(ds.storage_path)
+        stored = [
+            {**rows[0], "Temperature": 90.0},
+            {**rows[1], "Flowrate": None, "Temperature": 80.0},
+        ]
+        self.assertEqual(reader.rows(), stored)
+
+        apps = self._migrate(self.before)
+        ds = apps.get_model("api", "Dataset").objects.get(pk=pk)
+        self.assertEqual((ds.raw_data, ds.storage_path), (stored, ""))
+        self.assertFalse(os.path.exists(reader.path))
+
+
+class StatisticsBackfillMigrationTests(MigrationMixin, TransactionTestCase):
+    before = [("api", "0007_dataset_uploaded_at_index")]
+    after = [("api", "0008_backfill_summary_statistics")]
+
+    def test_statistics_are_backfilled(self):
+        apps = self._migrate(self.before)
+        frame = pd.DataFrame({
+            "Equipment Name": ["P-1", "P-2", "V-1", "X-1"],
+            "Type": ["Pump", "Pump", "Valve", None],
+            "Flowrate": [1.0, 3.0, 8.0, None],
+            "Pressure": [2.0, 4.0, 6.0, 1.0],
+            "Temperature": [90.0, 80.0, 70.0, 60.0],
+        })
+        with ColumnarWriter(float_columns=NUMERIC_COLS) as writer:
+            writer.write(frame)
+        pk = apps.get_model("api", "Dataset").objects.create(
+            name="a.csv", uploaded_at=timezone.now(), summary={"total_count": 4},
+            storage_path=writer.relpath, row_count=4,
+        ).pk
+
+        apps = self._migrate(self.after)
+        summary = apps.get_model("api", "Dataset").objects.get(pk=pk).summary
+        self.assertEqual(summary["total_count"], 4)
+        self.assertEqual(summary["quantiles"], "exact")
+        self.assertEqual(summary["statistics"]["Flowrate"]["count"], 3)
+        self.assertEqual(summary["statistics"]["Flowrate"]["p50"], 3.0)
+        self.assertEqual(summary["by_type"]["Pump"]["Flowrate"]["mean"], 2.0)
+        self.assertEqual(summary["by_type"]["null"]["count"], 1)
+        self.assertAlmostEqual(summary["correlation"]["Flowrate"]["Pressure"],
+                               frame["Flowrate"].corr(frame["Pressure"]))
+
+
+class SizeBackfillMigrationTests(MigrationMixin, TransactionTestCase):
+    before = [("api", "0012_dataset_content_hash")]
+    after = [("api", "0013_dataset_size_bytes")]
+
+    def test_sizes_are_backfilled(self):
+        apps = self._migrate(self.before)
+        with ColumnarWriter(float_columns=NUMERIC_COLS) as writer:
+            writer.write(pd.DataFrame({col: ["1"] * 4 for col in REQUIRED_COLS}))
+        Dataset = apps.get_model("api", "Dataset")
+        stored = Dataset.objects.create(name="a.csv", uploaded_at=timezone.now(), summary={},
+                                        storage_path=writer.relpath, row_count=4).pk
+        empty = Dataset.objects.create(name="b.csv", uploaded_at=timezone.now(), summary={}).pk
+
+        Dataset = self._migrate(self.after).get_model("api", "Dataset")
+        self.assertEqual(Dataset.objects.get(pk=stored).size_bytes, storage_size(writer.relpath))
+        self.assertEqual(Dataset.objects.get(pk=empty).size_bytes, 0)
+
+
+class ReadingBackfillMigrationTests(MigrationMixin, TransactionTestCase):
+    before = [("api", "0013_dataset_size_bytes")]
+    after = [("api", "0014_reading")]
+
+    def test_readings_are_backfilled(self):
+        apps = self._migrate(self.before)
+        with ColumnarWriter(float_columns=NUMERIC_COLS) as writer:
+            writer.write(pd.DataFrame({
+                "Equipment Name": ["P-1", None, "V-1"],
+                "Type": ["Pump", "Pump", None],
+                "Flowrate": [1.5, 2.0, "junk"],
+                "Pressure": [1.0, 2.0, 3.0],
+                "Temperature": [90.0, 80.0, 70.0],
+            }))
+        pk = apps.get_model("api", "Dataset").objects.create(
+            name="a.csv", uploaded_at=timezone.now(), summary={},
+            storage_path=writer.relpath, row_count=3,
+        ).pk
+
+        Reading = self._migrate(self.after).get_model("api", "Reading")
+        readings = Reading.objects.filter(dataset_id=pk).order_by("id").values_list(
+            "equipment_name", "equipment_type", "flowrate", "pressure", "temperature",
+        )
+        self.assertEqual(list(readings), [("P-1", "Pump", 1.5, 1.0, 90.0),
+                                          ("V-1", "", None, 3.0, 70.0)])
+
+
+class AccumulatorTests(TestCase):
+    def setUp(self):
+        rng = np.random.default_rng(7)
+        n = 20_000
+        self.frame = pd.DataFrame({
+            "Type": rng.choice(["Pump", "Valve", "Reactor", None], n),
+            "Flowrate": rng.normal(100, 15, n),
+            "Pressure": rng.lognormal(1, 0.5, n),
+            "Temperature": rng.uniform(20, 300, n).astype(object),
+        })
+        self.frame.loc[::50, "Flowrate"] = np.nan
+        self.frame.loc[::97, "Temperature"] = "n/a"
+
+    def _accumulate(self, *frames):
+        acc = SummaryAccumulator(NUMERIC_COLS)
+        for frame in frames:
+            acc.update(frame)
+        return acc
+
+    def assertNested(self, first, second, places=7, path=""):
+        """Equal structures, with floats compared to `places` decimals."""
+        if isinstance(first, dict):
+            self.assertEqual(set(first), set(second), path)
+            for key in first:
+                self.assertNested(first[key], second[key], places, f"{path}.{key}")
+        elif isinstance(first, float) and second is not None:
+            self.assertAlmostEqual(first, second, places=places, msg=path)
+        else:
+            self.assertEqual(first, second, path)
+
+    def test_merged_chunks_match_one_pass(self):
+        one_pass = self._accumulate(self.frame).result()
+        merged = self._accumulate(self.frame.iloc[:7_000])
+        merged.merge(self._accumulate(self.frame.iloc[7_000:12_345], self.frame.iloc[12_345:]))
+        merged = merged.result()
+
+        for key in ("total_count", "averages", "type_distribution", "by_type", "correlation"):
+            self.assertNested(merged[key], one_pass[key], path=key)
+        for col in NUMERIC_COLS:
+            for stat in ("count", "mean", "min", "max", "std"):
+                self.assertAlmostEqual(merged["statistics"][col][stat],
+                                       one_pass["statistics"][col][stat], places=7)
+
+    def test_moments_are_exact(self):
+        result = self._accumulate(self.frame.iloc[:5_000], self.frame.iloc[5_000:]).result()
+        numeric = self.frame[NUMERIC_COLS].apply(pd.to_numeric, errors="coerce")
+
+        self.assertEqual(result["total_count"], len(self.frame))
+        for col in NUMERIC_COLS:
+            stats = result["statistics"][col]
+            self.assertEqual(stats["count"], numeric[col].count())
+            self.assertAlmostEqual(stats["mean"], numeric[col].mean(), places=9)
+            self.assertAlmostEqual(stats["std"], numeric[col].std(), places=9)
+            self.assertEqual(stats["min"], numeric[col].min())
+            self.assertEqual(stats["max"], numeric[col].max())
+        self.assertAlmostEqual(result["correlation"]["Flowrate"]["Pressure"],
+                               numeric["Flowrate"].corr(numeric["Pressure"]), places=9)
+        pumps = numeric[self.frame["Type"] == "Pump"]
+        self.assertAlmostEqual(result["by_type"]["Pump"]["Pressure"]["mean"],
+                               pumps["Pressure"].mean(), places=9)
+        self.assertEqual(result["by_type"][None]["count"], self.frame["Type"].isna().sum())
+
+    def test_sketch_percentiles_within_tolerance(self):
+        values = np.random.default_rng(3).lognormal(0, 1, 200_000)
+        sketch, other = QuantileSketch(), QuantileSketch()
+        for part in np.array_split(values[:120_000], 12):
+            sketch.update(part)
+        other.update(values[120_000:])
+        sketch.merge(other)
+
+        # every estimate lies within 0.5 percentage points of its true rank
+        ordered = np.sort(values)
+        qs = [0.01, 0.25, 0.5, 0.75, 0.95, 0.99]
+        for q, estimate in zip(qs, sketch.quantiles(qs, values.min(), values.max())):
+            rank = np.searchsorted(ordered, estimate) / values.size
+            self.assertLess(abs(rank - q), 0.005, q)
+        self.assertEqual(sketch.total, values.size)
+        self.assertLess(len(sketch.means), 400)
+
+    def test_state_round_trips_through_json(self):
+        acc = self._accumulate(self.frame.iloc[:9_000])
+        state = json.loads(json.dumps(acc.to_state()))
+        restored = SummaryAccumulator.from_state(state)
+        self.assertEqual(restored.result(), acc.result())
+
+        delta = self._accumulate(self.frame.iloc[9_000:])
+        acc.merge(delta)
+        restored.merge(delta)
+        self.assertEqual(restored.result(), acc.result())
+
+
+class StatisticsTests(ApiMixin, TestCase):
+    def _stored(self, dataset_id):
+        ds = Dataset.objects.get(pk=dataset_id)
+        reader = ds.open_rows()
+        frame = pd.DataFrame({col: reader.column(col) for col in ["Type", *NUMERIC_COLS]})
+        return ds.summary, frame
+
+    def assertStatistics(self, summary, frame):
+        self.assertEqual(summary["quantiles"], "approximate")
+        for col in NUMERIC_COLS:
+            values = frame[col].dropna().to_numpy()
+            stats = summary["statistics"][col]
+            self.assertEqual(stats["count"], values.size)
+            self.assertEqual((stats["min"], stats["max"]), (values.min(), values.max()))
+            self.assertAlmostEqual(stats["mean"], values.mean())
+            self.assertAlmostEqual(stats["std"], values.std(ddof=1))
+            # sketch estimates: within one percentage point of the true rank
+            # (values repeat, so an estimate's rank is a range)
+            ordered = np.sort(values)
+            for key, q in (("q1", 0.25), ("p50", 0.5), ("q3", 0.75), ("p95", 0.95)):
+                first = np.searchsorted(ordered, stats[key] - 1e-9) / values.size
+                last = np.searchsorted(ordered, stats[key] + 1e-9) / values.size
+                self.assertTrue(first - 0.01 < q < last + 0.01, (col, key))
+            q1, q3 = np.percentile(values, [25, 75])
+            low, high = q1 - 1.5 * (q3 - q1), q3 + 1.5 * (q3 - q1)
+            outliers = np.count_nonzero((values < low) | (values > high))
+            self.assertLessEqual(abs(stats["outliers"] - outliers), values.size * 0.01)
+
+        pumps = frame[frame["Type"] == "Pump"]
+        self.assertEqual(summary["by_type"]["Pump"]["count"], len(pumps))
+        self.assertAlmostEqual(summary["by_type"]["Pump"]["Pressure"]["mean"],
+                               pumps["Pressure"].mean())
+        self.assertAlmostEqual(summary["correlation"]["Flowrate"]["Temperature"],
+                               frame["Flowrate"].corr(frame["Temperature"]))
+
+    def test_extended_statistics(self):
+        dataset_id = self.upload(self.csv(rows=3000)).json()["dataset_id"]
+        self.assertStatistics(*self._stored(dataset_id))
+
+    def test_statistics_keep_their_meaning_across_appends(self):
+        dataset_id = self.upload(self.csv(rows=2000)).json()["dataset_id"]
+        response = self.client.post(
+            f"/api/dataset/{dataset_id}/append/",
+            {"file": SimpleUploadedFile("delta.csv", self.csv(rows=1000, seed=1))},
+            format="multipart",
+        )
+        self.assertEqual(response.status_code, 200)
+        summary, frame = self._stored(dataset_id)
+        self.assertEqual(len(frame), 3000)
+        self.assertStatistics(summary, frame)
+
+
+class ReportTests(ApiMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.dataset_id = self.upload(self.csv()).json()["dataset_id"]
+        self.url = f"/api/report/{self.dataset_id}/"
+
+    def _get(self, **headers):
+        response = self.client.get(self.url, **headers)
+        if response.status_code == 200:
+            response.pdf = b"".join(response.streaming_content)
+        return response
+
+    def test_xref_offsets_point_at_their_objects(self):
+        streamed = self._get()
+        self.assertEqual(streamed["Content-Type"], "application/pdf")
+        pdf = streamed.pdf
+        self.assertTrue(pdf.startswith(b"%PDF-"))
+
+        xref_at = int(re.search(rb"startxref\n(\d+)\n%%EOF\n$", pdf).group(1))
+        header = re.match(rb"xref\n0 (\d+)\n", pdf[xref_at:])
+        size = int(header.group(1))
+        entries = pdf[xref_at + header.end():].split(b"\n")[:size]
+        self.assertEqual(entries[0], b"0000000000 65535 f ")
+        for number, entry in enumerate(entries[1:], start=1):
+            offset = int(entry[:10])
+            self.assertTrue(pdf[offset:].startswith(b"%d 0 obj" % number), number)
+        self.assertIn(b"/Size %d" % size, pdf[xref_at:])
+
+        # the second download is served from the cache, byte for byte
+        cached = self._get()
+        self.assertIn("Last-Modified", cached)
+        self.assertEqual(cached.pdf, pdf)
+
+    def test_not_modified(self):
+        etag = self._get()["ETag"]
+        response = self._get(HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response["ETag"], etag)
+
+    def test_append_misses_the_cache(self):
+        first = self._get()
+        response = self.client.post(
+            f"/api/dataset/{self.dataset_id}/append/",
+            {"file": SimpleUploadedFile("delta.csv", self.csv(rows=200, seed=1))},
+            format="multipart",
+        )
+        self.assertEqual(response.status_code, 200)
+
+        second = self._get(HTTP_IF_NONE_MATCH=first["ETag"])
+        self.assertEqual(second.status_code, 200)
+        self.assertNotEqual(second["ETag"], first["ETag"])
+        self.assertNotIn("Last-Modified", second)  # rendered, not read from the cache
+        self.assertNotEqual(second.pdf, first.pdf)
+
+
+class AppendTests(ApiMixin, TestCase):
+    def _append(self, dataset_id, content):
+        return self.client.post(
+            f"/api/dataset/{dataset_id}/append/",
+            {"file": SimpleUploadedFile("delta.csv", content)}, format="multipart",
+        )
+
+    def test_failed_append_leaves_the_store_unchanged(self):
+        dataset_id = self.upload(self.csv(rows=100)).json()["dataset_id"]
+        with mock.patch("api.services.index_readings", side_effect=RuntimeError("disk full")):
+            response = self._append(dataset_id, self.csv(rows=50, seed=1))
+        self.assertEqual(response.status_code, 400)
+        ds = Dataset.objects.get(pk=dataset_id)
+        self.assertEqual((ds.row_count, ds.revision), (100, 1))
+        self.assertEqual(ColumnarReader(ds.storage_path).row_count, 100)
+
+        # the next append must not bring back the rows of the failed one
+        delta = self.csv(rows=20, seed=2)
+        response = self._append(dataset_id, delta)
+        self.assertEqual(response.status_code, 200)
+        ds.refresh_from_db()
+        reader = ColumnarReader(ds.storage_path)
+        self.assertEqual(reader.row_count, 120)
+        self.assertEqual(ds.summary["total_count"], 120)
+        expected = pd.read_csv(io.BytesIO(delta), dtype=str)["Equipment Name"]
+        self.assertEqual(list(reader.column("Equipment Name", 100)),
+                         [None if pd.isna(v) else v for v in expected])
+        named = sum(1 for name in reader.column("Equipment Name") if name)
+        self.assertEqual(ds.readings.count(), named)
+
+
+class RowsTests(ApiMixin, TestCase):
+    CSV = (
+        "Equipment Name,Type,Flowrate,Pressure,Temperature\n"
+        "Pump-1,Pump,3.0,5.0,100\n"
+        "Valve-1,Valve,,4.0,90\n"
+        "Pump-2,Pump,1.0,6.0,110\n"
+        "Straße-1,Reactor,2.0,,120\n"
+        "Valve-2,Valve,4.0,3.0,80\n"
+    )
+
+    def setUp(self):
+        super().setUp()
+        self.dataset_id = self.upload(self.CSV.encode()).json()["dataset_id"]
+
+    def _get(self, **params):
+        response = self.client.get(f"/api/dataset/{self.dataset_id}/rows/", params)
+        self.assertEqual(response.status_code, 200, response.content)
+        return response.json()
+
+    def _names(self, **params):
+        return [row["Equipment Name"] for row in self._get(**params)["rows"]]
+
+    def test_paging(self):
+        body = self._get(offset=0, limit=2)
+        self.assertEqual(body["total_rows"], 5)
+        self.assertEqual(body["next_offset"], 2)
+        self.assertEqual(body["rows"][0], {
+            "Equipment Name": "Pump-1", "Type": "Pump",
+            "Flowrate": 3.0, "Pressure": 5.0, "Temperature": 100.0,
+        })
+        self.assertIsNone(body["rows"][1]["Flowrate"])
+
+        self.assertEqual(self._names(offset=2, limit=2), ["Pump-2", "Straße-1"])
+        body = self._get(offset=4, limit=2)
+        self.assertEqual([row["Equipment Name"] for row in body["rows"]], ["Valve-2"])
+        self.assertIsNone(body["next_offset"])
+        self.assertEqual(self._get(offset=10)["rows"], [])
+
+        latest = self.client.get("/api/dataset/latest/rows/", {"limit": 1}).json()
+        self.assertEqual(latest["dataset_id"], self.dataset_id)
+        self.assertEqual(latest["next_offset"], 1)
+
+    def test_fields(self):
+        body = self._get(fields="Flowrate, Type", limit=1)
+        self.assertEqual(body["columns"], ["Flowrate", "Type"])
+        self.assertEqual(body["rows"], [{"Flowrate": 3.0, "Type": "Pump"}])
+
+    def test_sort(self):
+        self.assertEqual(self._names(sort="Flowrate"),
+                         ["Pump-2", "Straße-1", "Pump-1", "Valve-2", "Valve-1"])
+        # missing values stay last when descending too
+        self.assertEqual(self._names(sort="-Flowrate"),
+                         ["Valve-2", "Pump-1", "Straße-1", "Pump-2", "Valve-1"])
+        self.assertEqual(self._names(sort="-Pressure", limit=2), ["Pump-2", "Pump-1"])
+        self.assertEqual(self._names(sort="Equipment Name", offset=3),
+                         ["Valve-1", "Valve-2"])
+
+    def test_search_and_type(self):
+        body = self._get(search="valve")
+        self.assertEqual([row["Equipment Name"] for row in body["rows"]],
+                         ["Valve-1", "Valve-2"])
+        self.assertEqual(body["total_rows"], 2)
+        self.assertEqual(self._names(search="STRAßE"), ["Straße-1"])
+        self.assertEqual(self._names(search="pump", limit=1), ["Pump-1"])
+        self.assertEqual(self._get(search="pump", limit=1)["next_offset"], 1)
+
+        body = self._get(type="Pump", sort="-Temperature")
+        self.assertEqual([row["Equipment Name"] for row in body["rows"]],
+                         ["Pump-2", "Pump-1"])
+        self.assertEqual(body["total_rows"], 2)
+        self.assertEqual(self._get(type="pump")["total_rows"], 0)
+        self.assertEqual(self._names(type="Valve", search="2"), ["Valve-2"])
+
+    def test_validation(self):
+        for params in ({"offset": -1}, {"limit": 0}, {"limit": 1001}, {"offset": "x"},
+                       {"fields": "Flowrate,Nope"}, {"sort": "-Nope"}):
+            response = self.client.get(f"/api/dataset/{self.dataset_id}/rows/", params)
+            self.assertEqual(response.status_code, 400, params)
+            self.assertIn("detail", response.json())
+        self.assertEqual(self.client.get("/api/dataset/999/rows/").status_code, 404)
+
+
+class AggregateTests(ApiMixin, TestCase):
+    TYPES =["Pump", "Valve", "Reactor", "", "Pump", "Pump"]
+
+    def setUp(self):
+        super().setUp()
+        lines = ["Equipment Name,Type,Flowrate,Pressure,Temperature"]
+        for i in range(600):
+            flowrate = "" if i % 50 == 7 else i
+            lines.append(f"E-{i},{self.TYPES[i % 6]},{flowrate},{np.sin(i / 20) * 10:.4f},{i % 7}")
+        self.frame = pd.read_csv(io.StringIO("\n".join(lines)))
+        self.dataset_id = self.upload("\n".join(lines).encode()).json()["dataset_id"]
+
+    def _get(self, **params):
+        return self.client.get(f"/api/dataset/{self.dataset_id}/aggregates/", params)
+
+    def test_histograms(self):
+        body = self._get(bins=8, points=0).json()
+        self.assertEqual(body["series"], {})
+        flowrate = self.frame["Flowrate"].dropna()
+        counts, edges = np.histogram(flowrate, bins=8)
+        self.assertEqual(body["histograms"]["Flowrate"]["counts"], counts.tolist())
+        np.testing.assert_allclose(body["histograms"]["Flowrate"]["edges"], edges)
+        self.assertEqual(sum(body["histograms"]["Temperature"]["counts"]), 600)
+
+        body = self._get(fields="Pressure", points=0).json()
+        self.assertEqual(list(body["histograms"]), ["Pressure"])
+
+    def test_box_stats_by_type(self):
+        box = self._get(points=0).json()["box"]
+        # JSON turns the missing Type into the key "null", listed last
+        self.assertEqual(list(box), ["Pump", "Reactor", "Valve", "null"])
+        pump = self.frame[self.frame["Type"] == "Pump"]["Flowrate"].dropna()
+        stats = box["Pump"]["Flowrate"]
+        self.assertEqual(stats["count"], pump.size)
+        q1, median, q3 = np.percentile(pump, [25, 50, 75])
+        self.assertAlmostEqual(stats["q1"], q1)
+        self.assertAlmostEqual(stats["median"], median)
+        self.assertAlmostEqual(stats["q3"], q3)
+        self.assertEqual((stats["min"], stats["max"]), (pump.min(), pump.max()))
+        self.assertEqual(stats["outliers"], 0)
+
+        # past max_types, the least common Types share one box
+        ds = Dataset.objects.get(pk=self.dataset_id)
+        box = compute_aggregates(ds.open_rows(), ["Flowrate"], points=0, max_types=2)["box"]
+        self.assertEqual(list(box), ["Pump", "Reactor", OTHER_TYPES])
+        rest = self.frame[~self.frame["Type"].isin(["Pump", "Reactor"])]
+        self.assertEqual(box[OTHER_TYPES]["Flowrate"]["count"], rest["Flowrate"].count())
+
+    def test_type_grouping_on_raw_bytes(self):
+        ds = Dataset.objects.get(pk=self.dataset_id)
+        reader = ds.open_rows()
+        codes, uniques = reader.factorize("Type")
+        self.assertEqual(set(uniques), {"Pump", "Reactor", "Valve", None})
+        self.assertEqual([uniques[c] for c in codes], list(reader.column("Type")))
+
+    def test_downsampled_series(self):
+        for method in ("lttb", "minmax"):
+            series = self._get(method=method, points=20).json()["series"]["Pressure"]
+            self.assertLessEqual(len(series["x"]), 20)
+            self.assertEqual(series["x"], sorted(series["x"]))
+            pressure = self.frame["Pressure"]
+            self.assertEqual(series["y"], pressure[series["x"]].tolist())
+            if method == "lttb":
+                self.assertEqual((series["x"][0], series["x"][-1]), (0, 599))
+            else:
+                self.assertIn(pressure.max(), series["y"])
+                self.assertIn(pressure.min(), series["y"])
+
+        # missing values are skipped; x keeps the original row numbers
+        series = self._get(points=600, fields="Flowrate").json()["series"]["Flowrate"]
+        self.assertEqual(series["x"], self.frame["Flowrate"].dropna().index.tolist())
+
+    def test_validation_and_etag(self):
+        for params in ({"bins": 0}, {"points": 2}, {"method": "stride"}, {"fields": "Type"},
+                       {"bins": "x"}):
+            self.assertEqual(self._get(**params).status_code, 400, params)
+        self.assertEqual(
+            self.client.get("/api/dataset/999/aggregates/").status_code, 404
+        )
+        response = self._get()
+        self.assertEqual(response.json()["total_rows"], 600)
+        again = self.client.get(f"/api/dataset/{self.dataset_id}/aggregates/",
+                                HTTP_IF_NONE_MATCH=response["ETag"])
+        self.assertEqual(again.status_code, 304)
+        latest = self.client.get("/api/dataset/latest/aggregates/", {"points": 0})
+        self.assertEqual(latest.json()["dataset_id"], self.dataset_id)
+
+
+class CompareTests(ApiMixin, TestCase):
+    HEADER = "Equipment Name,Type,Flowrate,Pressure,Temperature\n"
+    BASE = HEADER + (
+        "P-1,Pump,10,1,100\n"
+        "P-1,Pump,20,1,100\n"
+        "V-1,Valve,5,2,50\n"
+        "R-1,Reactor,1,1,1\n"
+    )
+    TARGET = HEADER + (
+        "P-1,Pump,30,1,100\n"
+        "V-1,Valve,4,2,50\n"
+        "N-1,Valve,7,3,60\n"
+    )
+
+    def setUp(self):
+        super().setUp()
+        self.base = self.upload(self.BASE.encode(), "base.csv").json()["dataset_id"]
+        self.target = self.upload(self.TARGET.encode(), "target.csv").json()["dataset_id"]
+
+    def test_compare_summaries(self):
+        body = self.client.get("/api/compare/").json()
+        self.assertEqual(body["base"]["dataset_id"], self.base)
+        self.assertEqual(body["target"]["dataset_id"], self.target)
+        self.assertEqual(body["total_count"],
+                         {"base": 4, "target": 3, "delta": -1, "pct_change": -25.0})
+        self.assertEqual(body["columns"]["Flowrate"]["max"],
+                         {"base": 20.0, "target": 30.0, "delta": 10.0, "pct_change": 50.0})
+        # a Type only in one dataset counts zero units in the other
+        self.assertEqual(body["by_type"]["Reactor"]["count"],
+                         {"base": 1, "target": 0, "delta": -1, "pct_change": -100.0})
+        self.assertIsNone(body["by_type"]["Reactor"]["Flowrate"]["mean"]["target"])
+        self.assertEqual(body["by_type"]["Valve"]["Flowrate"]["mean"]["target"], 5.5)
+
+        # explicit ids, either way round
+        body = self.client.get(
+            "/api/compare/", {"base": self.target, "target": self.base}
+        ).json()
+        self.assertEqual(body["total_count"]["delta"], 1)
+
+    def test_compare_equipment(self):
+        body = self.client.get("/api/compare/equipment/", {"sort": "Equipment Name"}).json()
+        self.assertEqual(body["counts"], {"both": 2, "added": 1, "removed": 1})
+        self.assertEqual(body["total_rows"], 4)
+        rows = {row["Equipment Name"]: row for row in body["rows"]}
+        self.assertEqual(list(rows), ["N-1", "P-1", "R-1", "V-1"])
+        self.assertEqual(rows["P-1"]["readings_base"], 2)
+        self.assertEqual(rows["P-1"]["Flowrate_base"], 15.0)
+        self.assertEqual(rows["P-1"]["Flowrate_delta"], 15.0)
+        self.assertEqual(rows["N-1"]["status"], "added")
+        self.assertIsNone(rows["N-1"]["Flowrate_base"])
+        self.assertEqual(rows["R-1"]["status"], "removed")
+        self.assertEqual(rows["R-1"]["readings_target"], 0)
+
+        def names(**params):
+            body = self.client.get("/api/compare/equipment/", params).json()
+            return [row["Equipment Name"] for row in body["rows"]]
+
+        self.assertEqual(names(status="both", sort="-Flowrate_delta"), ["P-1", "V-1"])
+        self.assertEqual(names(status="both", sort="Flowrate_delta", abs="1"), ["V-1", "P-1"])
+        self.assertEqual(names(type="Valve", sort="Equipment Name"), ["N-1", "V-1"])
+        self.assertEqual(names(sort="Equipment Name", offset=1, limit=2), ["P-1", "R-1"])
+
+        response = self.client.get("/api/compare/equipment/", {"limit": 1})
+        self.assertEqual(response.json()["next_offset"], 1)
+        again = self.client.get("/api/compare/equipment/", {"limit": 1},
+                                HTTP_IF_NONE_MATCH=response["ETag"])
+        self.assertEqual(again.status_code, 304)
+
+    def test_compare_errors(self):
+        for url in ("/api/compare/", "/api/compare/equipment/"):
+            for params, code in (
+                ({"base": "x"}, 400),
+                ({"target": "1.5"}, 400),
+                ({"base": 999}, 404),
+                ({"target": 999}, 404),
+                # nothing was uploaded before the first dataset
+                ({"target": self.base}, 404),
+            ):
+                response = self.client.get(url, params)
+                self.assertEqual(response.status_code, code, (url, params))
+                self.assertIn("detail", response.json())
+        for params in ({"offset": -1}, {"limit": 0}, {"sort": "Nope"}, {"status": "gone"}):
+            response = self.client.get("/api/compare/equipment/", params)
+            self.assertEqual(response.status_code, 400, params)
+
+    def test_compare_etag_follows_appends(self):
+        response = self.client.get("/api/compare/")
+        again = self.client.get("/api/compare/", HTTP_IF_NONE_MATCH=response["ETag"])
+        self.assertEqual(again.status_code, 304)
+
+        self.client.post(
+            f"/api/dataset/{self.target}/append/",
+            {"file": SimpleUploadedFile("d.csv", (self.HEADER + "P-1,Pump,50,1,100\n").encode())},
+            format="multipart",
+        )
+        response = self.client.get("/api/compare/", HTTP_IF_NONE_MATCH=response["ETag"])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["total_count"]["target"], 4)
+
+    def test_trends(self):
+        third = self.upload((self.HEADER + "X-1,Mixer,1,1,1\n").encode(), "c.csv")
+        third = third.json()["dataset_id"]
+        body = self.client.get("/api/trends/").json()
+        self.assertEqual(body["dataset_ids"], [self.base, self.target, third])
+        self.assertEqual(body["filenames"], ["base.csv", "target.csv", "c.csv"])
+        self.assertEqual(body["total_count"], [4, 3, 1])
+        self.assertEqual(body["metrics"]["Flowrate"]["max"], [20.0, 30.0, 1.0])
+        self.assertEqual(body["type_counts"]["Reactor"], [1, 0, 0])
+        self.assertEqual(body["type_counts"]["Mixer"], [0, 0, 1])
+
+        body = self.client.get("/api/trends/", {"limit": 2}).json()
+        self.assertEqual(body["dataset_ids"], [self.target, third])
+
+        # since/until bound the upload time
+        now = timezone.now()
+        Dataset.objects.filter(pk=self.base).update(uploaded_at=now - timedelta(days=2))
+        Dataset.objects.filter(pk=self.target).update(uploaded_at=now - timedelta(days=1))
+        since = (now - timedelta(hours=36)).isoformat()
+        until = (now - timedelta(hours=12)).isoformat()
+        body = self.client.get("/api/trends/", {"since": since, "until": until}).json()
+        self.assertEqual(body["dataset_ids"], [self.target])
+
+        response = self.client.get("/api/trends/")
+        again = self.client.get("/api/trends/", HTTP_IF_NONE_MATCH=response["ETag"])
+        self.assertEqual(again.status_code, 304)
+
+        for params in ({"limit": 0}, {"limit": "x"}, {"limit": 1001}, {"since": "yesterday"},
+                       {"until": "2026-13-01"}):
+            self.assertEqual(self.client.get("/api/trends/", params).status_code, 400, params)
+
+
+class ReadingTests(ApiMixin, TestCase):
+    HEADER = "Equipment Name,Type,Flowrate,Pressure,Temperature\n"
+
+    def _append(self, dataset_id, content):
+        return self.client.post(
+            f"/api/dataset/{dataset_id}/append/",
+            {"file": SimpleUploadedFile("d.csv", content.encode())}, format="multipart",
+        )
+
+    def _readings(self, dataset_id):
+        return list(Reading.objects.filter(dataset_id=dataset_id).order_by("id").values_list(
+            "equipment_name", "equipment_type", "flowrate", "pressure", "temperature",
+        ))
+
+    def test_rows_are_indexed_on_create_and_append(self):
+        dataset_id = self.upload((self.HEADER + (
+            "P-1,Pump,1.5,2,90\n"
+            ",Pump,9,9,9\n"
+            "V-1,,,3,80\n"
+        )).encode()).json()["dataset_id"]
+        # rows without a name are skipped, missing values stay NULL
+        self.assertEqual(self._readings(dataset_id), [
+            ("P-1", "Pump", 1.5, 2.0, 90.0),
+            ("V-1", "", None, 3.0, 80.0),
+        ])
+
+        self.assertEqual(self._append(dataset_id, self.HEADER + "P-1,Pump,2.5,2,91\n")
+                         .status_code, 200)
+        # only the new rows are indexed
+        self.assertEqual(self._readings(dataset_id)[2:], [("P-1", "Pump", 2.5, 2.0, 91.0)])
+
+    def test_equipment_history(self):
+        first = self.upload((self.HEADER + "P-1,Pump,1,10,100\nV-1,Valve,5,5,5\n").encode(),
+                            "a.csv").json()["dataset_id"]
+        second = self.upload((self.HEADER + "P-1,Pump,2,,110\n").encode(),
+                             "b.csv").json()["dataset_id"]
+        self._append(second, self.HEADER + "P-1,Booster,3,30,120\n")
+
+        body = self.client.get("/api/equipment/history/", {"name": "P-1"}).json()
+        self.assertEqual(body["equipment_name"], "P-1")
+        self.assertEqual(body["points"], 3)
+        self.assertEqual(body["type"], "Booster")
+        self.assertEqual(body["dataset_ids"], [first, second, second])
+        self.assertEqual(body["metrics"], {
+            "Flowrate": [1.0, 2.0, 3.0],
+            "Pressure": [10.0, None, 30.0],
+            "Temperature": [100.0, 110.0, 120.0],
+        })
+
+        body = self.client.get("/api/equipment/history/", {"name": "P-1", "limit": 2}).json()
+        self.assertEqual(body["metrics"]["Flowrate"], [2.0, 3.0])
+
+        Dataset.objects.filter(pk=first).update(uploaded_at=timezone.now() - timedelta(days=2))
+        since = (timezone.now() - timedelta(days=1)).isoformat()
+        body = self.client.get("/api/equipment/history/", {"name": "P-1", "until": since}).json()
+        self.assertEqual(body["dataset_ids"], [first])
+        body = self.client.get("/api/equipment/history/", {"name": "P-1", "since": since}).json()
+        self.assertEqual(body["dataset_ids"], [second, second])
+
+        body = self.client.get("/api/equipment/history/", {"name": "nope"}).json()
+        self.assertEqual((body["points"], body["type"]), (0, None))
+        self.assertEqual(body["metrics"], {"Flowrate": [], "Pressure": [], "Temperature": []})
+
+        for params in ({}, {"name": " "}, {"name": "P-1", "limit": 0},
+                       {"name": "P-1", "limit": "x"}, {"name": "P-1", "since": "soon"}):
+            response = self.client.get("/api/equipment/history/", params)
+            self.assertEqual(response.status_code, 400, params)
+
+
+class ChunkedUploadTests(ApiMixin, TestCase):
+    def _initiate(self, content, chunk_size=2048):
+        response = self.client.post("/api/uploads/", {
+            "filename": "big.csv", "size": len(content), "chunk_size": chunk_size,
+        }, format="json")
+        self.assertEqual(response.status_code, 201)
+        return response.json()
+
+    def _put(self, upload_id, number, body, checksum=None):
+        return self.client.put(
+            f"/api/uploads/{upload_id}/parts/{number}/", body,
+            content_type="application/octet-stream",
+            HTTP_X_CHUNK_SHA256=checksum or hashlib.sha256(body).hexdigest(),
+        )
+
+    def _parts(self, content, chunk_size=2048):
+        return [content[i:i + chunk_size] for i in range(0, len(content), chunk_size)]
+
+    def test_bad_checksum_is_rejected(self):
+        content = self.csv()
+        session = self._initiate(content)
+        part = self._parts(content)[0]
+        response = self._put(session["upload_id"], 1, part, checksum="0" * 64)
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("Checksum mismatch", response.json()["detail"])
+        status = self.client.get(f"/api/uploads/{session['upload_id']}/").json()
+        self.assertEqual(status["received_parts"], [])
+
+    def test_resume_through_status(self):
+        content = self.csv()
+        parts = self._parts(content)
+        session = self._initiate(content)
+        upload_id = session["upload_id"]
+        self.assertEqual(session["total_parts"], len(parts))
+        for number in (1, 3):
+            self.assertEqual(self._put(upload_id, number, parts[number - 1]).status_code, 200)
+
+        # a client coming back asks what is missing and sends only that
+        status = self.client.get(f"/api/uploads/{upload_id}/").json()
+        self.assertEqual(status["received_parts"], [1, 3])
+        self.assertFalse(status["completed"])
+        response = self.client.post(f"/api/uploads/{upload_id}/complete/", {}, format="json")
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()["missing_parts"],
+                         [n for n in range(1, len(parts) + 1) if n not in (1, 3)])
+
+        for number, part in enumerate(parts, start=1):
+            if number not in status["received_parts"]:
+                self.assertEqual(self._put(upload_id, number, part).status_code, 200)
+        response = self.client.post(f"/api/uploads/{upload_id}/complete/", {}, format="json")
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json()["total_count"], 300)
+        self.assertTrue(self.client.get(f"/api/uploads/{upload_id}/").json()["completed"])
+        self.assertEqual(self._put(upload_id, 1, parts[0]).status_code, 409)
+
+    def test_failed_ingest_can_be_retried(self):
+        content = b"not,a,dataset\n1,2,3\n"
+        upload_id = self._initiate(content)["upload_id"]
+        self.assertEqual(self._put(upload_id, 1, content).status_code, 200)
+
+        for _ in range(2):
+            response = self.client.post(f"/api/uploads/{upload_id}/complete/", {}, format="json")
+            self.assertEqual(response.status_code, 400)
+        status = self.client.get(f"/api/uploads/{upload_id}/").json()
+        self.assertFalse(status["completed"])
+        self.assertEqual(status["received_parts"], [1])
+
+
+class JobTests(ApiMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        # run jobs inline, in the test's transaction
+        for target, kwargs in (
+            ("api.jobs._executor.submit", {"side_effect": lambda fn, *args: fn(*args)}),
+            ("api.jobs.schedule_retention", {}),
+        ):
+            patcher = mock.patch(target, **kwargs)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def _upload_async(self, content):
+        response = self.client.post("/api/upload/", {
+            "file": SimpleUploadedFile("a.csv", content), "async": "1",
+        }, format="multipart")
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(response.json()["status_url"], f"/api/jobs/{response.json()['job_id']}/")
+        return self.client.get(response.json()["status_url"])
+
+    def test_job_status(self):
+        response = self._upload_async(self.csv())
+        self.assertEqual(response.status_code, 200)
+        job = response.json()
+        self.assertEqual((job["status"], job["progress"], job["error"]), ("succeeded", 1.0, None))
+        self.assertEqual(job["bytes_done"], job["bytes_total"])
+        self.assertEqual(job["result"]["dataset_id"], job["dataset_id"])
+        self.assertEqual(job["result"]["total_count"], 300)
+        self.assertEqual(self.client.get("/api/jobs/999/").status_code, 404)
+
+    def test_failed_job(self):
+        job = self._upload_async(b"not,a,dataset\n1,2,3\n").json()
+        self.assertEqual(job["status"], "failed")
+        self.assertTrue(job["error"])
+        self.assertIsNone(job["dataset_id"])
+        self.assertIsNone(job["result"])
+        self.assertFalse(Dataset.objects.exists())
+        self.assertEqual(os.listdir(os.path.join(self.tmp, INCOMING_DIR)), [])
+
+    def test_stale_job_releases_its_upload(self):
+        content = self.csv()
+        session = self.client.post("/api/uploads/", {
+            "filename": "big.csv", "size": len(content), "chunk_size": len(content),
+        }, format="json").json()
+        upload_id = session["upload_id"]
+        self.client.put(
+            f"/api/uploads/{upload_id}/parts/1/", content,
+            content_type="application/octet-stream",
+            HTTP_X_CHUNK_SHA256=hashlib.sha256(content).hexdigest(),
+        )
+        # a job whose worker process went away mid-ingest
+        job = Job.objects.create(filename="big.csv", source_path=parts_dir(upload_id),
+                                 status=Job.RUNNING)
+        complete = f"/api/uploads/{upload_id}/complete/"
+        self.assertEqual(self.client.post(complete, {}, format="json").status_code, 409)
+        self.assertEqual(fail_stale_jobs(), [])
+
+        Job.objects.filter(pk=job.pk).update(updated_at=timezone.now() - timedelta(minutes=31))
+        self.assertEqual(fail_stale_jobs(), [job.pk])
+        status = self.client.get(f"/api/jobs/{job.pk}/").json()
+        self.assertEqual(status["status"], "failed")
+        self.assertIn("Interrupted", status["error"])
+        # a failed job is not started again if it was still queued somewhere
+        jobs._run(job.pk)
+        self.assertEqual(Job.objects.get(pk=job.pk).status, Job.FAILED)
+
+        response = self.client.post(complete, {}, format="json")
+        self.assertEqual(response.status_code, 201)
+
+
+class DeduplicationTests(ApiMixin, TestCase):
+    def test_second_upload_returns_the_same_dataset(self):
+        content = self.csv()
+        first = self.upload(content)
+        self.assertEqual(first.status_code, 201)
+
+        second = self.upload(content, name="again.csv")
+        self.assertEqual(second.status_code, 200)
+        self.assertTrue(second.json()["deduplicated"])
+        self.assertEqual(second.json()["dataset_id"], first.json()["dataset_id"])
+        self.assertEqual(self.upload(self.csv(seed=1)).status_code, 201)
+
+    def _initiate(self, content, **extra):
+        return self.client.post("/api/uploads/", {
+            "filename": "again.csv", "size": len(content), "chunk_size": len(content), **extra,
+        }, format="json")
+
+    def _send(self, upload_id, content):
+        self.client.put(
+            f"/api/uploads/{upload_id}/parts/1/", content,
+            content_type="application/octet-stream",
+            HTTP_X_CHUNK_SHA256=hashlib.sha256(content).hexdigest(),
+        )
+        return self.client.post(f"/api/uploads/{upload_id}/complete/", {}, format="json")
+
+    def test_chunked_upload_of_a_stored_file(self):
+        content = self.csv()
+        sha256 = hashlib.sha256(content).hexdigest()
+        upload_id = self._initiate(content, sha256=sha256).json()["upload_id"]
+        # the same file is stored by someone else while the parts go up
+        dataset_id = self.upload(content).json()["dataset_id"]
+
+        response = self._send(upload_id, content)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.json()["deduplicated"])
+        self.assertEqual(response.json()["dataset_id"], dataset_id)
+
+        # declared up front, nothing has to be sent at all
+        response = self._initiate(content, sha256=sha256.upper())
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["dataset_id"], dataset_id)
+
+    def test_declared_hash_is_verified_on_ingest(self):
+        content = self.csv()
+        self.assertEqual(self._initiate(content, sha256="xyz").status_code, 400)
+        upload_id = self._initiate(content, sha256="0" * 64).json()["upload_id"]
+
+        response = self._send(upload_id, content)
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("declared SHA-256", response.json()["detail"])
+        self.assertFalse(Dataset.objects.exists())
+        self.assertFalse(self.client.get(f"/api/uploads/{upload_id}/").json()["completed"])
+
+        # undeclared, the hash taken on the ingest pass is stored for dedup
+        upload_id = self._initiate(content).json()["upload_id"]
+        self.assertEqual(self._send(upload_id, content).status_code, 201)
+        self.assertEqual(Dataset.objects.get().content_hash, hashlib.sha256(content).hexdigest())
+
+class EventTests(ApiMixin, TransactionTestCase):
+    def setUp(self):
+        super().setUp()
+        self.key = Token.objects.get(user=self.user).key
+        poll = mock.patch("api.events.POLL_SECONDS", 0.01)
+        poll.start()
+        self.addCleanup(poll.stop)
+
+    async def _next(self, stream):
+        return await asyncio.wait_for(anext(stream), 5)
+
+    def test_publish_waits_for_the_commit(self):
+        with transaction.atomic():
+            events.publish(events.DATASET_CREATED, {"dataset_id": 1})
+            self.assertFalse(Event.objects.exists())
+        self.assertEqual(list(Event.objects.values_list("event", "data")),
+                         [(events.DATASET_CREATED, '{"dataset_id": 1}')])
+
+    async def test_replay_then_tail(self):
+        ids = [(await Event.objects.acreate(event=events.JOB_PROGRESS, data=str(i))).pk
+               for i in range(3)]
+        stream = events.stream(last_id=ids[0])
+        try:
+            self.assertEqual(await self._next(stream), f"retry: {events.RETRY_MS}\n\n")
+            for event_id, data in zip(ids[1:], "12"):
+                self.assertEqual(await self._next(stream),
+                                 f"id: {event_id}\nevent: job.progress\ndata: {data}\n\n")
+            # whichever process publishes, the row reaches every stream
+            await sync_to_async(events.publish)(events.JOB_FINISHED, {"job_id": 7})
+            self.assertEqual(await self._next(stream),
+                             f"id: {ids[-1] + 1}\nevent: job.finished\ndata: {{\"job_id\": 7}}\n\n")
+        finally:
+            await stream.aclose()
+        self.assertEqual(events.hub.subscriber_count, 0)
+
+    async def test_events_stream(self):
+        self.assertEqual((await self.async_client.get("/api/events/")).status_code, 401)
+        event = await Event.objects.acreate(event=events.DATASET_CREATED, data="{}")
+
+        response = await self.async_client.get(
+            "/api/events/", {"token": self.key}, headers={"Last-Event-ID": str(event.pk - 1)},
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["Content-Type"], "text/event-stream")
+        stream = aiter(response.streaming_content)
+        try:
+            await self._next(stream)  # retry
+            self.assertEqual(await self._next(stream),
+                             f"id: {event.pk}\nevent: dataset.created\ndata: {{}}\n\n".encode())
+        finally:
+            await stream.aclose()
+
+
+class RetentionTests(ApiMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        now = timezone.now()
+        # newest first: 10 MB, 1 day old; then 20 MB at 5 days; 30 MB at 10 days...
+        self.ids = []
+        for i in range(4):
+            ds = Dataset.objects.create(
+                name=f"{i}.csv", uploaded_at=now - timedelta(days=[1, 5, 10, 40][i]),
+                size_bytes=(i + 1) * 10_000_000, storage_path=f"datasets/{i}",
+            )
+            self.ids.append(ds.pk)
+        self.now = now
+
+    def _expired(self, **limits):
+        return [pk for pk, _ in select_expired(now=self.now, **limits)]
+
+    def test_limits(self):
+        self.assertEqual(self._expired(), [])
+        self.assertEqual(self._expired(max_datasets=2), self.ids[2:])
+        self.assertEqual(self._expired(max_age_days=7), self.ids[2:])
+        self.assertEqual(self._expired(max_bytes=60_000_000), self.ids[3:])
+        # the strictest limit wins
+        self.assertEqual(self._expired(max_datasets=3, max_age_days=3), self.ids[1:])
+
+    def test_newest_is_always_kept(self):
+        self.assertEqual(self._expired(max_datasets=0), self.ids[1:])
+        self.assertEqual(self._expired(max_age_days=0), self.ids[1:])
+        self.assertEqual(self._expired(max_bytes=1), self.ids[1:])
+
+    def test_prune_removes_rows_and_files(self):
+        kept = Dataset.objects.get(pk=self.ids[0])
+        with override_settings(RETENTION_MAX_DATASETS=1):
+            with self.captureOnCommitCallbacks(execute=True):
+                prune_datasets()
+        self.assertEqual(list(Dataset.objects.values_list("pk", flat=True)), [kept.pk])
+
+
+class ResponseCacheTests(ApiMixin, TestCase):
+    def test_upload_invalidates_summary_and_history(self):
+        self.upload(self.csv(), name="first.csv")
+        summary = self.client.get("/api/summary/latest/")
+        history = self.client.get("/api/history/")
+        self.assertEqual(summary.json()["filename"], "first.csv")
+        self.assertEqual(
+            self.client.get("/api/summary/latest/",
+                            HTTP_IF_NONE_MATCH=summary["ETag"]).status_code,
+            304,
+        )
+
+        self.upload(self.csv(seed=1), name="second.csv")
+        fresh = self.client.get("/api/summary/latest/", HTTP_IF_NONE_MATCH=summary["ETag"])
+        self.assertEqual(fresh.status_code, 200)
+        self.assertEqual(fresh.json()["filename"], "second.csv")
+        self.assertNotEqual(fresh["ETag"], summary["ETag"])
+
+        items = self.client.get("/api/history/", HTTP_IF_NONE_MATCH=history["ETag"]).json()
+        self.assertEqual([i["filename"] for i in items["items"]], ["second.csv", "first.csv"])
+
+    def test_writes_outside_the_api_are_seen(self):
+        self.upload(self.csv())
+        etag = self.client.get("/api/summary/latest/")["ETag"]
+        # e.g. `manage.py prune_datasets` in another process
+        Dataset.objects.all().delete()
+        self.assertEqual(
+            self.client.get("/api/summary/latest/", HTTP_IF_NONE_MATCH=etag).status_code, 404
+        )
+
+
+class BenchmarkTests(TestCase):
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp, ignore_errors=True)
+
+    def _read(self, path):
+        with open(path, "rb") as f:
+            return f.read()
+
+    def test_generator_is_seeded_and_dirty(self):
+        a = generate_csv(os.path.join(self.tmp, "a.csv"), 2000, seed=1)
+        b = generate_csv(os.path.join(self.tmp, "b.csv"), 2000, seed=1)
+        c = generate_csv(os.path.join(self.tmp, "c.csv"), 2000, seed=2)
+        self.assertEqual(self._read(a), self._read(b))
+        self.assertNotEqual(self._read(a), self._read(c))
+
+        frame = pd.read_csv(a, dtype=str, keep_default_na=False)
+        self.assertEqual(
+            list(frame.columns), ["Equipment Name", "Type", "Flowrate", "Pressure", "Temperature"]
+        )
+        self.assertEqual(len(frame), 2000)
+        junk = sum(
+            pd.to_numeric(frame[col], errors="coerce").isna().sum()
+            for col in ("Flowrate", "Pressure", "Temperature")
+        )
+        self.assertTrue(0 < junk < 200)
+
+    def test_run_benchmarks_measures_every_scenario(self):
+        with override_settings(MEDIA_ROOT=self.tmp):
+            results = run_benchmarks([300], data_dir=self.tmp)
+
+        self.assertEqual(set(results["300"]), set(SCENARIOS))
+        for m in results["300"].values():
+            self.assertGreaterEqual(m["seconds"], 0)
+            self.assertGreaterEqual(m["queries"], 0)
+        self.assertGreater(results["300"]["ingest"]["queries"], 0)
+
+    def test_compare_to_baseline(self):
+        base = {"results": {"1000": {
+            "rows": {"seconds": 1.0, "peak_rss_mb": 100.0, "queries": 1},
+        }}}
+        same = {"1000": {"rows": {"seconds": 1.1, "peak_rss_mb": 110.0, "queries": 1}}}
+        worse = {"1000": {"rows": {"seconds": 2.0, "peak_rss_mb": 200.0, "queries": 3}}}
+        self.assertEqual(compare_to_baseline(same, base, threshold=0.25), [])
+        self.assertEqual(len(compare_to_baseline(worse, base, threshold=0.25)), 3)
+        # unknown sizes are not regressions
+        self.assertEqual(compare_to_baseline({"5": worse["1000"]}, base), [])
+
+
+class TokenCacheTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user("alice", password="secret")
+        self.token = Token.objects.create(user=self.user)
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION="Token " + self.token.key)
+        token_cache.clear()
+
+    def test_cached_token_skips_the_database(self):
+        self.assertEqual(self.client.get("/api/history/").status_code, 200)
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self.client.get("/api/history/").status_code, 200)
+        self.assertFalse(any("authtoken" in q["sql"] for q in queries.captured_queries))
+
+    def test_logout_invalidates(self):
+        self.assertEqual(self.client.get("/api/history/").status_code, 200)
+        self.assertEqual(self.client.post("/api/auth/logout/").status_code, 200)
+        self.assertEqual(self.client.get("/api/history/").status_code, 401)
+
+    def test_deactivation_invalidates(self):
+        self.assertEqual(self.client.get("/api/history/").status_code, 200)
+        self.user.is_active = False
+        self.user.save()
+        self.assertEqual(self.client.get("/api/history/").status_code, 401)
+
+    def test_entries_expire_and_are_bounded(self):
+        cache = TokenCache(size=2, ttl=60)
+        tokens = [Token(key=str(i), user=self.user) for i in range(3)]
+        for token in tokens:
+            cache.put(token.key, token, cache.generation)
+        self.assertIsNone(cache.get("0"))
+        self.assertIs(cache.get("2"), tokens[2])
+
+        cache.ttl = -1
+        cache.put("3", tokens[0], cache.generation)
+        self.assertIsNone(cache.get("3"))
+
+
+class MetricsTests(TestCase):
+    def test_requires_a_staff_token(self):
+        user = User.objects.create_user("alice", password="secret")
+        client = APIClient()
+        self.assertEqual(client.get("/api/metrics/").status_code, 401)
+
+        client.credentials(HTTP_AUTHORIZATION="Token " + Token.objects.create(user=user).key)
+        self.assertEqual(client.get("/api/metrics/").status_code, 403)
+
+        user.is_staff = True
+        user.save()
+        response = client.get("/api/metrics/")
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("api_requests_total", response.content.decode())
+
+
+class DatabaseProfileTests(TestCase):
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp, ignore_errors=True)
+
+    def _connection(self, env=None):
+        config = database_settings(
+            {"SQLITE_PATH": os.path.join(self.tmp, "db.sqlite3"), **(env or {})}, Path(self.tmp)
+        )
+        conn = ConnectionHandler(config)["default"]
+        self.addCleanup(conn.close)
+        return conn
+
+    def test_sqlite_profile(self):
+        config = database_settings({}, Path(self.tmp))["default"]
+        self.assertEqual(config["ENGINE"], "django.db.backends.sqlite3")
+        self.assertEqual(config["OPTIONS"]["transaction_mode"], "IMMEDIATE")
+        self.assertEqual(config["CONN_MAX_AGE"], 60)
+        self.assertTrue(config["CONN_HEALTH_CHECKS"])
+        self.assertEqual(
+            database_settings({"DB_CONN_MAX_AGE": "0"}, Path(self.tmp))["default"]["CONN_MAX_AGE"],
+            0,
+        )
+
+        with self._connection().cursor() as cursor:
+            cursor.execute("PRAGMA journal_mode")
+            self.assertEqual(cursor.fetchone()[0], "wal")
+            cursor.execute("PRAGMA busy_timeout")
+            self.assertEqual(cursor.fetchone()[0], 20_000)
+
+    def test_reads_do_not_wait_for_a_writer(self):
+        writer, reader = self._connection(), self._connection()
+        with writer.cursor() as cursor:
+            cursor.execute("CREATE TABLE t (x INTEGER)")
+        writer.connection.execute("BEGIN IMMEDIATE")
+        writer.connection.execute("INSERT INTO t VALUES (1)")
+        try:
+            started = time.monotonic()
+            with reader.cursor() as cursor:
+                cursor.execute("SELECT count(*) FROM t")
+                self.assertEqual(cursor.fetchone()[0], 0)
+            self.assertLess(time.monotonic() - started, 1)
+        finally:
+            writer.connection.execute("COMMIT")
+
+    def test_postgresql_profile(self):
+        config = database_settings({
+            "DB_ENGINE": "postgresql", "POSTGRES_DB": "eq", "POSTGRES_USER": "app",
+            "POSTGRES_PASSWORD": "pw", "POSTGRES_HOST": "db", "POSTGRES_PORT": "5433",
+        }, Path(self.tmp))["default"]
+        self.assertEqual(config["ENGINE"], "django.db.backends.postgresql")
+        self.assertEqual(
+            [config[k] for k in ("NAME", "USER", "PASSWORD", "HOST", "PORT")],
+            ["eq", "app", "pw", "db", "5433"],
+        )
+        pooled = database_settings({"DB_ENGINE": "postgresql", "DB_POOL": "1"}, Path(self.tmp))
+        self.assertEqual(pooled["default"]["OPTIONS"], {"pool": True})
+        self.assertEqual(pooled["default"]["CONN_MAX_AGE"], 0)
+
+        with self.assertRaises(ImproperlyConfigured):
+            database_settings({"DB_ENGINE": "mysql"}, Path(self.tmp))
+
+    def test_postgresql_connection(self):
+        # runs against the server the POSTGRES_* variables point at, if any
+        try:
+            import psycopg  # noqa: F401
+        except ImportError:
+            self.skipTest("psycopg is not installed")
+        conn = self._connection({**os.environ, "DB_ENGINE": "postgresql"})
+        try:
+            conn.ensure_connection()
+        except OperationalError:
+            self.skipTest("PostgreSQL is not reachable")
+
+        with conn.cursor() as cursor:
+            cursor.execute("SHOW transaction_isolation")
+            self.assertEqual(cursor.fetchone()[0], "read committed")
+            cursor.execute("CREATE TEMPORARY TABLE t (x integer)")
+            cursor.execute("INSERT INTO t VALUES (1), (2)")
+            cursor.execute("SELECT sum(x) FROM t")
+            self.assertEqual(cursor.fetchone()[0], 3)
+
+    @override_settings(DATABASE_SINGLE_WRITER=True)
+    def test_single_writer(self):
+        entered = threading.Event()
+
+        def write():
+            with single_writer():
+                entered.set()
+
+        with single_writer():
+            thread = threading.Thread(target=write)
+            thread.start()
+            self.assertFalse(entered.wait(0.1))
+        thread.join(5)
+        self.assertTrue(entered.is_set())
@@ -0,0 +1,203 @@
+"""
+Chunked, resumable uploads.
+
+A client initiates an UploadSession, PUTs the file in numbered parts (each
+with its SHA-256) and then completes it. Parts are stored as individual
+files under MEDIA_ROOT/chunked/<session id>/, so the set of received parts
+is simply what is on disk and a dropped connection only costs the part in
+flight. On completion the parts are read back-to-back through
+ConcatenatedReader straight into the ingestion pipeline; they are never
+assembled into one big file. A session is only marked complete, and its
+parts removed, once ingestion succeeds, so a failed one can be completed
+again.
+"""
+import hashlib
+import io
+import os
+import shutil
+
+from django.core.files.uploadhandler import FileUploadHandler
+from django.utils import timezone
+
+from .models import UploadSession
+from .storage import absolute_path
+
+CHUNKED_DIR = "chunked"
+# single-file uploads spooled for background ingestion (jobs.py)
+INCOMING_DIR = "incoming"
+DEFAULT_CHUNK_SIZE = 8 * 1024 * 1024
+MAX_CHUNK_SIZE = 64 * 1024 * 1024
+PART_SUFFIX = ".part"
+
+_READ_SIZE = 64 * 1024
+
+
+def parts_dir(session_id):
+    """Directory holding a session's parts, relative to MEDIA_ROOT."""
+    return os.path.join(CHUNKED_DIR, str(session_id))
+
+
+def received_parts(session_id):
+    path = absolute_path(parts_dir(session_id))
+    if not os.path.isdir(path):
+        return []
+    return sorted(
+        int(name[:-len(PART_SUFFIX)])
+        for name in os.listdir(path)
+        if name.endswith(PART_SUFFIX)
+    )
+
+
+def write_part(session_id, number, stream, expected_size, expected_sha256):
+    """
+    Stream one part to disk, verifying its size and SHA-256 before it is
+    made visible. Re-sending a part simply replaces it.
+    """
+    directory = absolute_path(parts_dir(session_id))
+    os.makedirs(directory, exist_ok=True)
+    final = os.path.join(directory, f"{number}{PART_SUFFIX}")
+    tmp = final + ".tmp"
+
+    digest = hashlib.sha256()
+    size = 0
+    try:
+        with open(tmp, "wb") as out:
+            while True:
+                block = stream.read(_READ_SIZE)
+                if not block:
+                    break
+                digest.update(block)
+                size += len(block)
+                out.write(block)
+
+        if size != expected_size:
+            raise ValueError(f"Part {number} should be {expected_size} bytes, got {size}.")
+        if digest.hexdigest() != expected_sha256.lower():
+            raise ValueError(f"Checksum mismatch for part {number}.")
+        os.replace(tmp, final)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+    return size, digest.hexdigest()
+
+
+def discard_parts(session_id):
+    shutil.rmtree(absolute_path(parts_dir(session_id)), ignore_errors=True)
+
+
+def complete_upload(session_id):
+    """Mark a session as ingested and drop its parts."""
+    UploadSession.objects.filter(pk=session_id).update(completed_at=timezone.now())
+    discard_parts(session_id)
+
+
+class ConcatenatedReader(io.RawIOBase):
+    """Read a list of files as one continuous byte stream."""
+
+    def __init__(self, paths):
+        self._paths = list(paths)
+        self._current = None
+
+    def readable(self):
+        return True
+
+    def readinto(self, b):
+        while True:
+            if self._current is None:
+                if not self._paths:
+                    return 0
+                self._current = open(self._paths.pop(0), "rb")
+            n = self._current.readinto(b)
+            if n:
+                return n
+            self._current.close()
+            self._current = None
+
+    def close(self):
+        if self._current is not None:
+            self._current.close()
+            self._current = None
+        super().close()
+
+
+class HashingReader:
+    """File wrapper that computes the SHA-256 of everything read through it."""
+
+    def __init__(self, f):
+        self._f = f
+        self.digest = hashlib.sha256()
+
+    def read(self, size=-1):
+        data = self._f.read(size)
+        self.digest.update(data)
+        return data
+
+    def read1(self, size=-1):
+        data = self._f.read1(size)
+        self.digest.update(data)
+        return data
+
+    def readinto(self, b):
+        n = self._f.readinto(b)
+        if n:
+            self.digest.update(memoryview(b)[:n])
+        return n
+
+    def hexdigest(self):
+        return self.digest.hexdigest()
+
+    def __getattr__(self, name):
+        return getattr(self._f, name)
+
+
+class HashingUploadHandler(FileUploadHandler):
+    """
+    Hashes multipart file uploads as Django receives them, so the content
+    hash is known before parsing without a second read. Data is passed on
+    untouched to the next handler; digests end up in
+    request.upload_sha256[field_name].
+    """
+
+    def new_file(self, field_name, *args, **kwargs):
+        super().new_file(field_name, *args, **kwargs)
+        self._digest = hashlib.sha256()
+
+    def receive_data_chunk(self, raw_data, start):
+        self._digest.update(raw_data)
+        return raw_data
+
+    def file_complete(self, file_size):
+        if not hasattr(self.request, "upload_sha256"):
+            self.request.upload_sha256 = {}
+        self.request.upload_sha256[self.field_name] = self._digest.hexdigest()
+        return None
+
+
+def open_source(relpath):
+    """
+    Open an ingestion source: either a single spooled CSV or a directory of
+    numbered upload parts, which is read as one stream.
+    """
+    path = absolute_path(relpath)
+    if not os.path.isdir(path):
+        return open(path, "rb")
+    names = sorted(
+        (n for n in os.listdir(path) if n.endswith(PART_SUFFIX)),
+        key=lambda n: int(n[:-len(PART_SUFFIX)]),
+    )
+    return io.BufferedReader(ConcatenatedReader(os.path.join(path, n) for n in names))
+
+
+def source_size(relpath):
+    path = absolute_path(relpath)
+    if not os.path.isdir(path):
+        return os.path.getsize(path)
+    return sum(os.path.getsize(os.path.join(path, n)) for n in os.listdir(path))
+
+
+def remove_source(relpath):
+    path = absolute_path(relpath)
+    if os.path.isdir(path):
+        shutil.rmtree(path, ignore_errors=True)
+    elif os.path.exists(path):
+        os.remove(path)
@@ -1,17 +1,36 @@
 from django.urls import path
 from .views import (
-    health, upload_csv, summary_latest, history, 
-    report_latest, login_view, logout_view, dataset_latest_rows
+    health, upload_csv, append_csv, job_status, summary_latest,
+    upload_initiate, upload_status, upload_part, upload_complete, history, 
+    report_latest, report_dataset, login_view, logout_view, dataset_latest_rows, dataset_rows,
+    dataset_latest_aggregates, dataset_aggregates, events_stream,
+    compare, compare_equipment, trends, equipment_history, metrics_view,
 )
 
 
 urlpatterns = [
     path('health/', health),
+    path('metrics/', metrics_view),
+    path('events/', events_stream),
     path('upload/', upload_csv),
+    path('dataset/<int:dataset_id>/append/', append_csv),
+    path('jobs/<int:job_id>/', job_status),
+    path('uploads/', upload_initiate),
+    path('uploads/<int:upload_id>/', upload_status),
+    path('uploads/<int:upload_id>/parts/<int:part_number>/', upload_part),
+    path('uploads/<int:upload_id>/complete/', upload_complete),
     path('summary/latest/', summary_latest),
     path('history/', history),
     path('report/latest/', report_latest),
+    path('report/<int:dataset_id>/', report_dataset),
     path('auth/login/', login_view),
     path('auth/logout/', logout_view),
     path("dataset/latest/rows/", dataset_latest_rows),
+    path("dataset/<int:dataset_id>/rows/", dataset_rows),
+    path("dataset/latest/aggregates/", dataset_latest_aggregates),
+    path("dataset/<int:dataset_id>/aggregates/", dataset_aggregates),
+    path("compare/", compare),
+    path("compare/equipment/", compare_equipment),
+    path("trends/", trends),
+    path("equipment/history/", equipment_history),
 ]
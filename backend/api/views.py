@@ -1,25 +1,43 @@
 # backend/api/views.py
-import json
-import pandas as pd  # NEW: to build raw rows from uploaded CSV
+import hashlib
+import re
 
 from rest_framework.decorators import api_view, parser_classes
 from rest_framework.response import Response
 from rest_framework import status
 from rest_framework.parsers import MultiPartParser, FormParser
+from asgiref.sync import sync_to_async
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
 from django.utils import timezone
-from django.http import FileResponse
-from io import BytesIO
-from reportlab.lib.pagesizes import A4
-from reportlab.pdfgen import canvas
+from django.utils.dateparse import parse_datetime
 from django.contrib.auth import authenticate
 from rest_framework.authtoken.models import Token
-from rest_framework.authentication import TokenAuthentication
-from rest_framework.permissions import IsAuthenticated
+from rest_framework.permissions import IsAdminUser, IsAuthenticated
 from rest_framework.decorators import authentication_classes, permission_classes
 
-from .models import Dataset
+from . import events, metrics
+from .authentication import CachedTokenAuthentication, get_token
+from .response_cache import cached_json
+from .compare import (
+    STATUSES, compare_summaries, equipment_columns, equipment_deltas, equipment_rows,
+    select_equipment, trend_series,
+)
+from .aggregates import (
+    DEFAULT_BINS, DEFAULT_POINTS, DOWNSAMPLE_METHODS, LTTB, MAX_BINS, MAX_POINTS,
+    compute_aggregates,
+)
+from .jobs import active_job, enqueue_ingest, schedule_retention, spool_upload
+from .uploads import (
+    DEFAULT_CHUNK_SIZE, MAX_CHUNK_SIZE, complete_upload, open_source, parts_dir,
+    received_parts, write_part,
+)
+from .models import Dataset, Job, Reading, UploadSession
+from .reports import serve_report
 from .serializers import DatasetSerializer  # noqa: F401 (kept for later use)
-from .services import compute_summary
+from .services import (
+    NUMERIC_COLS, append_csv_to_dataset, create_dataset_from_csv, dataset_payload,
+    reuse_duplicate, select_rows,
+)
 
 
 @api_view(['GET'])
@@ -27,14 +45,26 @@ def health(request):
     return Response({"status": "ok"})
 
 
+@api_view(['GET'])
+@authentication_classes([CachedTokenAuthentication])
+@permission_classes([IsAdminUser])
+def metrics_view(request):
+    """
+    Request and pipeline metrics of this process, for Prometheus to scrape
+    with a staff user's token (routes and timings are not public).
+    """
+    return HttpResponse(metrics.render(), content_type=metrics.CONTENT_TYPE)
+
+
 @api_view(['POST'])
-@authentication_classes([TokenAuthentication])
+@authentication_classes([CachedTokenAuthentication])
 @permission_classes([IsAuthenticated])
 @parser_classes([MultiPartParser, FormParser])
 def upload_csv(request):
     """
     Multipart form-data:
-      file: <CSV file>
+      file:  <CSV file>
+      async: optional; "1" queues a background job and returns 202 + job_id
     """
     if 'file' not in request.FILES:
         return Response(
@@ -43,134 +73,359 @@ def upload_csv(request):
         )
 
     csv_file = request.FILES['file']
+
+    # Identical file already stored? Hash was taken while the upload streamed in.
+    content_hash = getattr(request, 'upload_sha256', {}).get('file')
+    duplicate = reuse_duplicate(content_hash)
+    if duplicate:
+        return Response({**dataset_payload(duplicate), "deduplicated": True})
+
+    if str(request.data.get('async', '')).lower() in ('1', 'true', 'yes'):
+        # Hand the spooled file to the worker pool; poll /api/jobs/<id>/
+        job = enqueue_ingest(spool_upload(csv_file), csv_file.name)
+        return Response(
+            {"job_id": job.id, "status": job.status, "status_url": f"/api/jobs/{job.id}/"},
+            status=status.HTTP_202_ACCEPTED,
+        )
+
     try:
-        # 1) Compute summary (uses the uploaded file)
-        summary = compute_summary(csv_file)
-
-        # 2) Build raw rows (first reset pointer so pandas can read)
-        csv_file.seek(0)
-        df = pd.read_csv(csv_file)
-        records = df.to_dict(orient="records")
-
-        # 3) Create Dataset (NO csv_file field; we store summary + raw_data)
-        ds = Dataset.objects.create(
-            name=csv_file.name,
-            uploaded_at=timezone.now(),
-            summary=summary,
-            raw_data=records,  # NEW: save raw rows into JSONField
-        )
-
-        # 4) Keep only last 5 datasets
-        qs = Dataset.objects.order_by('-uploaded_at')
-        if qs.count() > 5:
-            for old in qs[5:]:
-                old.delete()
-
-        data = {
-            "dataset_id": ds.id,
-            "filename": ds.name,
-            "uploaded_at": ds.uploaded_at,
-            **summary,
-        }
-        return Response(data, status=status.HTTP_201_CREATED)
+        # 1) Single pass over the upload: summary + column-stored rows
+        ds = create_dataset_from_csv(csv_file, name=csv_file.name, content_hash=content_hash)
+
+        # 2) Retention runs in the background (see retention.py)
+        schedule_retention()
+
+        return Response(dataset_payload(ds), status=status.HTTP_201_CREATED)
+
+    except Exception as e:
+        return Response(
+            {"detail": str(e)},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
 
+
+@api_view(['POST'])
+@authentication_classes([CachedTokenAuthentication])
+@permission_classes([IsAuthenticated])
+@parser_classes([MultiPartParser, FormParser])
+def append_csv(request, dataset_id):
+    """
+    Multipart form-data:
+      file: <CSV delta with the same columns as the dataset>
+    Appends the rows and updates the summary from the stored accumulators.
+    """
+    if 'file' not in request.FILES:
+        return Response(
+            {"detail": "No file provided."},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+    if not Dataset.objects.filter(pk=dataset_id).exists():
+        return Response({"detail": "Dataset not found."}, status=status.HTTP_404_NOT_FOUND)
+
+    try:
+        ds, appended = append_csv_to_dataset(dataset_id, request.FILES['file'])
     except Exception as e:
         return Response(
             {"detail": str(e)},
             status=status.HTTP_400_BAD_REQUEST,
         )
+    # the dataset grew, which counts against RETENTION_MAX_BYTES
+    schedule_retention()
+
+    return Response({"appended_rows": appended, **dataset_payload(ds)})
+
+
+SHA256_RE = re.compile(r"[0-9a-f]{64}")
+
+
+def _upload_session_data(session):
+    return {
+        "upload_id": session.id,
+        "filename": session.filename,
+        "size": session.size,
+        "chunk_size": session.chunk_size,
+        "total_parts": session.total_parts,
+        "received_parts": received_parts(session.id),
+        "completed": session.completed_at is not None,
+    }
+
+
+@api_view(['POST'])
+@authentication_classes([CachedTokenAuthentication])
+@permission_classes([IsAuthenticated])
+def upload_initiate(request):
+    """
+    Body: { "filename": "...", "size": <bytes>, "chunk_size": <bytes, optional>,
+            "sha256": <hex of the whole file, optional> }
+    Starts a chunked upload; send parts 1..total_parts to
+    /api/uploads/<upload_id>/parts/<n>/ and then POST .../complete/.
+    If sha256 matches a stored dataset, that dataset is returned instead
+    (200, "deduplicated": true) and nothing needs to be sent. Otherwise it
+    is kept with the upload and the assembled file must match it.
+    """
+    filename = request.data.get("filename")
+    try:
+        size = int(request.data.get("size"))
+        chunk_size = int(request.data.get("chunk_size") or DEFAULT_CHUNK_SIZE)
+    except (TypeError, ValueError):
+        return Response(
+            {"detail": "size and chunk_size must be integers."},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+    if not filename or size < 0 or not 1 <= chunk_size <= MAX_CHUNK_SIZE:
+        return Response(
+            {"detail": f"filename, size >= 0 and chunk_size <= {MAX_CHUNK_SIZE} required."},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+
+    sha256 = str(request.data.get("sha256") or "").lower()
+    if sha256 and not SHA256_RE.fullmatch(sha256):
+        return Response(
+            {"detail": "sha256 must be 64 hex digits."},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+
+    duplicate = reuse_duplicate(sha256)
+    if duplicate:
+        return Response({**dataset_payload(duplicate), "deduplicated": True})
+
+    session = UploadSession.objects.create(
+        filename=filename, size=size, chunk_size=chunk_size, sha256=sha256,
+    )
+    return Response(_upload_session_data(session), status=status.HTTP_201_CREATED)
 
 
 @api_view(['GET'])
-@authentication_classes([TokenAuthentication])
+@authentication_classes([CachedTokenAuthentication])
+@permission_classes([IsAuthenticated])
+def upload_status(request, upload_id):
+    """Which parts the server already has, so a client can resume."""
+    session = UploadSession.objects.filter(pk=upload_id).first()
+    if not session:
+        return Response({"detail": "Upload not found."}, status=status.HTTP_404_NOT_FOUND)
+    return Response(_upload_session_data(session))
+
+
+@api_view(['PUT'])
+@authentication_classes([CachedTokenAuthentication])
+@permission_classes([IsAuthenticated])
+def upload_part(request, upload_id, part_number):
+    """
+    Raw body: bytes of 1-based part `part_number`.
+    Header X-Chunk-SHA256: hex SHA-256 of the body (verified before storing).
+    """
+    session = UploadSession.objects.filter(pk=upload_id).first()
+    if not session:
+        return Response({"detail": "Upload not found."}, status=status.HTTP_404_NOT_FOUND)
+    if session.completed_at:
+        return Response({"detail": "Upload already completed."}, status=status.HTTP_409_CONFLICT)
+    if active_job(parts_dir(session.id)):
+        return Response(
+            {"detail": "Upload is already being ingested."}, status=status.HTTP_409_CONFLICT,
+        )
+    if not 1 <= part_number <= session.total_parts:
+        return Response(
+            {"detail": f"part_number must be between 1 and {session.total_parts}."},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+    checksum = request.headers.get("X-Chunk-SHA256")
+    if not checksum:
+        return Response(
+            {"detail": "X-Chunk-SHA256 header required."},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+
+    try:
+        size, digest = write_part(
+            session.id, part_number, request.stream,
+            session.part_size(part_number), checksum,
+        )
+    except ValueError as e:
+        return Response({"detail": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    return Response({"part_number": part_number, "size": size, "sha256": digest})
+
+
+@api_view(['POST'])
+@authentication_classes([CachedTokenAuthentication])
+@permission_classes([IsAuthenticated])
+def upload_complete(request, upload_id):
+    """
+    Body: { "async": "1" } (optional)
+    Streams the parts, in order, straight into ingestion. Sync mode answers
+    201 with the summary; async mode answers 202 with a job id. The upload
+    stays open until ingestion succeeds, so a failed one can be retried.
+    If the sha256 declared at initiation now matches a stored dataset, the
+    parts are not ingested: sync mode answers 200 with "deduplicated": true,
+    a job just succeeds. Otherwise it is checked on the ingest pass.
+    """
+    session = UploadSession.objects.filter(pk=upload_id).first()
+    if not session:
+        return Response({"detail": "Upload not found."}, status=status.HTTP_404_NOT_FOUND)
+    if session.completed_at:
+        return Response({"detail": "Upload already completed."}, status=status.HTTP_409_CONFLICT)
+
+    source = parts_dir(session.id)
+    job = active_job(source)
+    if job:
+        return Response(
+            {"detail": "Upload is already being ingested.", "job_id": job.id,
+             "status_url": f"/api/jobs/{job.id}/"},
+            status=status.HTTP_409_CONFLICT,
+        )
+
+    missing = sorted(set(range(1, session.total_parts + 1)) - set(received_parts(session.id)))
+    if missing:
+        return Response(
+            {"detail": "Missing parts.", "missing_parts": missing},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+
+    if str(request.data.get('async', '')).lower() in ('1', 'true', 'yes'):
+        job = enqueue_ingest(
+            source, session.filename, upload_id=session.id, declared_hash=session.sha256,
+        )
+        return Response(
+            {"job_id": job.id, "status": job.status, "status_url": f"/api/jobs/{job.id}/"},
+            status=status.HTTP_202_ACCEPTED,
+        )
+
+    # a declared file stored since initiation; undeclared ones are hashed
+    # on the ingest pass below, for later uploads to be matched against
+    duplicate = reuse_duplicate(session.sha256)
+    if duplicate:
+        complete_upload(session.id)
+        return Response({**dataset_payload(duplicate), "deduplicated": True})
+
+    try:
+        with open_source(source) as f:
+            ds = create_dataset_from_csv(f, name=session.filename, declared_hash=session.sha256)
+    except Exception as e:
+        return Response(
+            {"detail": str(e)},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+    complete_upload(session.id)
+    schedule_retention()
+    return Response(dataset_payload(ds), status=status.HTTP_201_CREATED)
+
+
+@api_view(['GET'])
+@authentication_classes([CachedTokenAuthentication])
+@permission_classes([IsAuthenticated])
+def job_status(request, job_id):
+    """
+    Progress of a background upload; `result` holds the dataset summary
+    once status is "succeeded".
+    """
+    job = Job.objects.filter(pk=job_id).first()
+    if not job:
+        return Response({"detail": "Job not found."}, status=status.HTTP_404_NOT_FOUND)
+    return Response({
+        "job_id": job.id,
+        "filename": job.filename,
+        "status": job.status,
+        "progress": job.progress,
+        "bytes_done": job.bytes_done,
+        "bytes_total": job.bytes_total,
+        "dataset_id": job.dataset_id,
+        "result": job.result or None,
+        "error": job.error or None,
+    })
+
+
+@api_view(['GET'])
+@authentication_classes([CachedTokenAuthentication])
 @permission_classes([IsAuthenticated])
 def summary_latest(request):
-    ds = Dataset.objects.order_by('-uploaded_at').first()
-    if not ds:
+    etag, body = cached_json("summary_latest", _summary_latest)
+    if body is None:
         return Response({"detail": "No datasets yet."}, status=status.HTTP_404_NOT_FOUND)
-    data = {
-        "dataset_id": ds.id,
-        "filename": ds.name,
-        "uploaded_at": ds.uploaded_at,
-        **ds.summary
-    }
-    return Response(data)
+    return _cached_response(request, etag, body)
+
+
+def _summary_latest():
+    ds = Dataset.objects.metadata().first()
+    if not ds:
+        return None, None
+    return f'"{ds.version_tag}"', dataset_payload(ds)
 
 
 @api_view(['GET'])
-@authentication_classes([TokenAuthentication])
+@authentication_classes([CachedTokenAuthentication])
 @permission_classes([IsAuthenticated])
 def history(request):
-    qs = Dataset.objects.order_by('-uploaded_at')[:5]
+    etag, body = cached_json("history", _history)
+    return _cached_response(request, etag, body)
+
+
+def _history():
+    qs = Dataset.objects.metadata()[:5]
+    etag = '"h{}"'.format(".".join(ds.version_tag for ds in qs))
     items = [{
         "dataset_id": ds.id,
         "filename": ds.name,
         "uploaded_at": ds.uploaded_at,
+        "content_hash": ds.content_hash,
         "summary": ds.summary,
     } for ds in qs]
-    return Response({"items": items})
+    return etag, {"items": items}
+
+
+def _cached_response(request, etag, body):
+    """Serve pre-rendered JSON; no-cache makes browsers revalidate with the ETag."""
+    if _etag_matches(request, etag):
+        response = _not_modified(etag)
+    else:
+        response = HttpResponse(body, content_type="application/json")
+        response["ETag"] = etag
+    response["Cache-Control"] = "private, no-cache"
+    return response
+
+
+def _etag_matches(request, etag):
+    if_none_match = request.headers.get("If-None-Match", "")
+    return etag in [t.strip() for t in if_none_match.split(",")]
+
+
+def _not_modified(etag):
+    response = Response(status=status.HTTP_304_NOT_MODIFIED)
+    response["ETag"] = etag
+    return response
+
+
+REPORT_FIELDS = ('id', 'name', 'uploaded_at', 'summary', 'revision', 'storage_path', 'row_count')
+
 
 @api_view(['GET'])
-@authentication_classes([TokenAuthentication])
+@authentication_classes([CachedTokenAuthentication])
 @permission_classes([IsAuthenticated])
 def report_latest(request):
     """
-    Generate a simple PDF report for the latest dataset.
+    PDF report for the latest dataset (ETag / Last-Modified aware).
     """
-    ds = Dataset.objects.order_by('-uploaded_at').first()
+    ds = Dataset.objects.latest_first().only(*REPORT_FIELDS).first()
     if not ds:
         return Response(
             {"detail": "No datasets yet."},
             status=status.HTTP_404_NOT_FOUND,
         )
 
-    buf = BytesIO()
-    p = canvas.Canvas(buf, pagesize=A4)
-    width, height = A4
-
-    y = height - 50
-    p.setFont("Helvetica-Bold", 16)
-    p.drawString(50, y, "Chemical Equipment Report (Latest Dataset)")
-    y -= 40
-
-    p.setFont("Helvetica", 11)
-    p.drawString(50, y, f"File: {ds.name}")
-    y -= 20
-    p.drawString(50, y, f"Uploaded At: {ds.uploaded_at}")
-    y -= 30
-
-    summary = ds.summary or {}
-    total = summary.get("total_count", "N/A")
-    av = summary.get("averages", {})
-    dist = summary.get("type_distribution", {})
-
-    p.drawString(50, y, f"Total Rows: {total}")
-    y -= 20
-    p.drawString(50, y, f"Avg Flowrate: {av.get('Flowrate')}")
-    y -= 20
-    p.drawString(50, y, f"Avg Pressure: {av.get('Pressure')}")
-    y -= 20
-    p.drawString(50, y, f"Avg Temperature: {av.get('Temperature')}")
-    y -= 30
-
-    p.setFont("Helvetica-Bold", 12)
-    p.drawString(50, y, "Type Distribution:")
-    y -= 20
-    p.setFont("Helvetica", 11)
-    for eq_type, count in dist.items():
-        p.drawString(70, y, f"- {eq_type}: {count}")
-        y -= 18
-        if y < 80:  # new page if we run out of space
-            p.showPage()
-            y = height - 50
-            p.setFont("Helvetica", 11)
-
-    p.showPage()
-    p.save()
-    buf.seek(0)
-
-    filename = "latest_equipment_report.pdf"
-    return FileResponse(buf, as_attachment=True, filename=filename)
+    # Built once per dataset revision and cached on disk; supports 304s.
+    return serve_report(request, ds, filename="latest_equipment_report.pdf")
+
+
+@api_view(['GET'])
+@authentication_classes([CachedTokenAuthentication])
+@permission_classes([IsAuthenticated])
+def report_dataset(request, dataset_id):
+    """
+    PDF report for any dataset: charts plus the full equipment table,
+    streamed while it renders the first time, then served from the cache.
+    """
+    ds = Dataset.objects.only(*REPORT_FIELDS).filter(pk=dataset_id).first()
+    if not ds:
+        return Response({"detail": "Dataset not found."}, status=status.HTTP_404_NOT_FOUND)
+    return serve_report(request, ds, filename=f"equipment_report_{ds.id}.pdf")
 
 
 @api_view(['POST'])
@@ -200,7 +455,7 @@ def login_view(request):
 
 
 @api_view(['POST'])
-@authentication_classes([TokenAuthentication])
+@authentication_classes([CachedTokenAuthentication])
 @permission_classes([IsAuthenticated])
 def logout_view(request):
     """
@@ -212,20 +467,497 @@ def logout_view(request):
     return Response({"detail": "Logged out."})
 
 
+DEFAULT_ROWS_LIMIT = 50
+MAX_ROWS_LIMIT = 1000
+
+
+def _rows_page(request, ds):
+    """
+    Build one page of rows for `ds` from ?offset=, ?limit=, ?fields= and the
+    optional ?sort=, ?search= and ?type= view params. Only the requested
+    rows and columns are read from storage.
+    """
+    try:
+        offset = int(request.query_params.get("offset", 0))
+        limit = int(request.query_params.get("limit", DEFAULT_ROWS_LIMIT))
+    except ValueError:
+        return Response(
+            {"detail": "offset and limit must be integers."},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+    if offset < 0 or not 1 <= limit <= MAX_ROWS_LIMIT:
+        return Response(
+            {"detail": f"offset must be >= 0 and limit between 1 and {MAX_ROWS_LIMIT}."},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+
+    reader = ds.open_rows()
+    fields = None
+    if request.query_params.get("fields"):
+        fields = [f.strip() for f in request.query_params["fields"].split(",") if f.strip()]
+        unknown = [f for f in fields if f not in reader.column_names]
+        if unknown:
+            return Response(
+                {"detail": f"Unknown fields: {', '.join(unknown)}"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+    sort = request.query_params.get("sort", "")
+    descending = sort.startswith("-")
+    sort = sort.lstrip("-")
+    if sort and sort not in reader.column_names:
+        return Response(
+            {"detail": f"Unknown sort field: {sort}"},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+
+    order = select_rows(
+        ds, sort=sort, descending=descending,
+        search=request.query_params.get("search", "").strip(),
+        type_=request.query_params.get("type", "").strip(),
+    )
+    if order is None:
+        total = ds.row_count
+        rows = reader.rows(offset, offset + limit, fields=fields)
+    else:
+        total = len(order)
+        rows = reader.rows_at(order[offset:offset + limit], fields=fields)
+
+    next_offset = offset + len(rows)
+    return Response({
+        "dataset_id": ds.id,
+        "filename": ds.name,
+        "columns": fields or reader.column_names,
+        "offset": offset,
+        "limit": limit,
+        "rows": rows,
+        "total_rows": total,
+        "next_offset": next_offset if next_offset < total else None,
+    })
+
+
 @api_view(['GET'])
-@authentication_classes([TokenAuthentication])
+@authentication_classes([CachedTokenAuthentication])
 @permission_classes([IsAuthenticated])
 def dataset_latest_rows(request):
     """
-    Returns the first 50 rows of the latest dataset (raw CSV rows).
+    Rows of the latest dataset; same paging params as dataset_rows.
     """
-    ds = Dataset.objects.order_by('-uploaded_at').first()
+    ds = Dataset.objects.latest_first().only('id', 'name', 'storage_path', 'row_count').first()
     if not ds:
         return Response({"detail": "No datasets yet."}, status=404)
+    return _rows_page(request, ds)
 
-    rows = ds.raw_data or []
-    return Response({
+
+@api_view(['GET'])
+@authentication_classes([CachedTokenAuthentication])
+@permission_classes([IsAuthenticated])
+def dataset_rows(request, dataset_id):
+    """
+    Query params:
+      offset: first row to return (default 0)
+      limit:  page size (default 50, max 1000)
+      fields: comma-separated column projection, e.g. Flowrate,Pressure
+      sort:   column to order by, "-" prefix for descending
+      search: case-insensitive substring over the text columns
+      type:   only rows of this equipment Type
+    total_rows counts the rows matching search/type.
+    """
+    ds = Dataset.objects.only('id', 'name', 'storage_path', 'row_count').filter(pk=dataset_id).first()
+    if not ds:
+        return Response({"detail": "Dataset not found."}, status=status.HTTP_404_NOT_FOUND)
+    return _rows_page(request, ds)
+
+
+def _aggregates(request, ds):
+    """
+    Chart aggregates for `ds` from ?bins=, ?points=, ?method= and ?fields=.
+    The response size depends on those parameters, not on the row count.
+    """
+    try:
+        bins = int(request.query_params.get("bins", DEFAULT_BINS))
+        points = int(request.query_params.get("points", DEFAULT_POINTS))
+    except ValueError:
+        return Response(
+            {"detail": "bins and points must be integers."},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+    if not 1 <= bins <= MAX_BINS or not (points == 0 or 3 <= points <= MAX_POINTS):
+        return Response(
+            {"detail": f"bins must be between 1 and {MAX_BINS}, points 0 or between 3 and {MAX_POINTS}."},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+    method = request.query_params.get("method", LTTB)
+    if method not in DOWNSAMPLE_METHODS:
+        return Response(
+            {"detail": f"method must be one of: {', '.join(DOWNSAMPLE_METHODS)}"},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+
+    fields = NUMERIC_COLS
+    if request.query_params.get("fields"):
+        fields = [f.strip() for f in request.query_params["fields"].split(",") if f.strip()]
+        unknown = [f for f in fields if f not in NUMERIC_COLS]
+        if unknown:
+            return Response(
+                {"detail": f"Unknown numeric fields: {', '.join(unknown)}"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+    # aggregates only change with the dataset; the params are part of the URL
+    etag = f'"a{ds.version_tag}"'
+    if _etag_matches(request, etag):
+        return _not_modified(etag)
+
+    response = Response({
+        "dataset_id": ds.id,
         "filename": ds.name,
-        "rows": rows[:50],
-        "total_rows": len(rows)
+        "total_rows": ds.row_count,
+        "bins": bins,
+        "points": points,
+        "method": method,
+        **compute_aggregates(ds.open_rows(), fields, bins=bins, points=points, method=method),
     })
+    response["ETag"] = etag
+    return response
+
+
+@api_view(['GET'])
+@authentication_classes([CachedTokenAuthentication])
+@permission_classes([IsAuthenticated])
+def dataset_latest_aggregates(request):
+    """
+    Chart aggregates of the latest dataset; same params as dataset_aggregates.
+    """
+    ds = Dataset.objects.latest_first().only(
+        'id', 'name', 'storage_path', 'row_count', 'revision', 'uploaded_at'
+    ).first()
+    if not ds:
+        return Response({"detail": "No datasets yet."}, status=404)
+    return _aggregates(request, ds)
+
+
+@api_view(['GET'])
+@authentication_classes([CachedTokenAuthentication])
+@permission_classes([IsAuthenticated])
+def dataset_aggregates(request, dataset_id):
+    """
+    Query params:
+      bins:   histogram bins per column (default 20, max 200)
+      points: downsampled series length (default 500, max 5000, 0 = none)
+      method: "lttb" (default) or "minmax"
+      fields: comma-separated numeric columns (default all)
+    Returns histograms, per-Type box-plot stats and downsampled series.
+    """
+    ds = Dataset.objects.only(
+        'id', 'name', 'storage_path', 'row_count', 'revision', 'uploaded_at'
+    ).filter(pk=dataset_id).first()
+    if not ds:
+        return Response({"detail": "Dataset not found."}, status=status.HTTP_404_NOT_FOUND)
+    return _aggregates(request, ds)
+
+
+DEFAULT_TREND_POINTS = 100
+MAX_TREND_POINTS = 1000
+DEFAULT_HISTORY_POINTS = 500
+MAX_HISTORY_POINTS = 5000
+
+# summary is deferred: a 304 never loads it
+COMPARE_FIELDS = ('id', 'name', 'uploaded_at', 'revision', 'storage_path', 'row_count')
+
+
+def _compare_pair(request):
+    """
+    The datasets named by ?base= and ?target=: target defaults to the latest
+    dataset, base to the one uploaded just before target. Returns
+    (base, target, None), or (None, None, error response).
+    """
+    try:
+        ids = {key: int(request.query_params[key]) if request.query_params.get(key) else None
+               for key in ("base", "target")}
+    except ValueError:
+        return None, None, Response(
+            {"detail": "base and target must be dataset ids."},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+
+    qs = Dataset.objects.only(*COMPARE_FIELDS)
+    if ids["target"] is None:
+        target = qs.latest_first().first()
+    else:
+        target = qs.filter(pk=ids["target"]).first()
+    if target is None:
+        return None, None, Response(
+            {"detail": "Target dataset not found."}, status=status.HTTP_404_NOT_FOUND
+        )
+
+    if ids["base"] is None:
+        base = qs.latest_first().filter(uploaded_at__lt=target.uploaded_at).first()
+    else:
+        base = qs.filter(pk=ids["base"]).first()
+    if base is None:
+        return None, None, Response(
+            {"detail": "Base dataset not found."}, status=status.HTTP_404_NOT_FOUND
+        )
+    return base, target, None
+
+
+def _dataset_ref(ds):
+    return {"dataset_id": ds.id, "filename": ds.name, "uploaded_at": ds.uploaded_at}
+
+
+@api_view(['GET'])
+@authentication_classes([CachedTokenAuthentication])
+@permission_classes([IsAuthenticated])
+def compare(request):
+    """
+    Query params:
+      base:   dataset id (default: the dataset uploaded before target)
+      target: dataset id (default: the latest dataset)
+    Dataset-level and per-Type changes from base to target of Flowrate,
+    Pressure and Temperature: base, target, delta and % change per metric.
+    Computed from the stored summaries.
+    """
+    base, target, error = _compare_pair(request)
+    if error:
+        return error
+
+    etag = f'"c{base.version_tag}.{target.version_tag}"'
+    if _etag_matches(request, etag):
+        return _not_modified(etag)
+
+    response = Response({
+        "base": _dataset_ref(base),
+        "target": _dataset_ref(target),
+        **compare_summaries(base, target),
+    })
+    response["ETag"] = etag
+    return response
+
+
+@api_view(['GET'])
+@authentication_classes([CachedTokenAuthentication])
+@permission_classes([IsAuthenticated])
+def compare_equipment(request):
+    """
+    Query params:
+      base, target:  as for compare
+      offset, limit: paging (default 0 / 50, max 1000)
+      status:        "both", "added" (only in target) or "removed" (only in base)
+      type:          only this equipment Type
+      sort:          any returned column, "-" prefix for descending
+      abs:           "1" sorts deltas by magnitude
+    Per-equipment changes: readings are averaged per Equipment Name in each
+    dataset and matched by name.
+    """
+    base, target, error = _compare_pair(request)
+    if error:
+        return error
+
+    try:
+        offset = int(request.query_params.get("offset", 0))
+        limit = int(request.query_params.get("limit", DEFAULT_ROWS_LIMIT))
+    except ValueError:
+        return Response(
+            {"detail": "offset and limit must be integers."},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+    if offset < 0 or not 1 <= limit <= MAX_ROWS_LIMIT:
+        return Response(
+            {"detail": f"offset must be >= 0 and limit between 1 and {MAX_ROWS_LIMIT}."},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+
+    columns = equipment_columns()
+    sort = request.query_params.get("sort", "")
+    descending = sort.startswith("-")
+    sort = sort.lstrip("-")
+    if sort and sort not in columns:
+        return Response(
+            {"detail": f"Unknown sort field: {sort}"},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+    status_filter = request.query_params.get("status", "").strip()
+    if status_filter and status_filter not in STATUSES:
+        return Response(
+            {"detail": f"status must be one of: {', '.join(STATUSES)}"},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+
+    etag = f'"e{base.version_tag}.{target.version_tag}"'
+    if _etag_matches(request, etag):
+        return _not_modified(etag)
+
+    table = equipment_deltas(base, target)
+    order = select_equipment(
+        table, status=status_filter, type_=request.query_params.get("type", "").strip(),
+        sort=sort, descending=descending,
+        by_magnitude=request.query_params.get("abs", "").lower() in ("1", "true", "yes"),
+    )
+    rows = equipment_rows(table, order[offset:offset + limit])
+    statuses = table["status"].value_counts()
+
+    total = len(order)
+    next_offset = offset + len(rows)
+    response = Response({
+        "base": _dataset_ref(base),
+        "target": _dataset_ref(target),
+        "columns": columns,
+        "counts": {s: int(statuses.get(s, 0)) for s in STATUSES},
+        "offset": offset,
+        "limit": limit,
+        "rows": rows,
+        "total_rows": total,
+        "next_offset": next_offset if next_offset < total else None,
+    })
+    response["ETag"] = etag
+    return response
+
+
+def _upload_window(request, qs, field="uploaded_at"):
+    """
+    Narrow `qs` to ?since= / ?until= (ISO 8601) on the upload time `field`.
+    Returns (queryset, None), or (None, error response).
+    """
+    for key, lookup in (("since", f"{field}__gte"), ("until", f"{field}__lte")):
+        if request.query_params.get(key):
+            try:
+                bound = parse_datetime(request.query_params[key])
+            except ValueError:
+                bound = None
+            if bound is None:
+                return None, Response(
+                    {"detail": f"{key} must be an ISO 8601 date-time."},
+                    status=status.HTTP_400_BAD_REQUEST,
+                )
+            if timezone.is_naive(bound):
+                bound = timezone.make_aware(bound)
+            qs = qs.filter(**{lookup: bound})
+    return qs, None
+
+
+@api_view(['GET'])
+@authentication_classes([CachedTokenAuthentication])
+@permission_classes([IsAuthenticated])
+def trends(request):
+    """
+    Query params:
+      limit: most recent datasets to include (default 100, max 1000)
+      since, until: ISO 8601 bounds on the upload time
+    Summary metrics (total rows, mean/std/min/max per numeric column, units
+    per Type) over time, oldest first, as parallel arrays.
+    """
+    try:
+        limit = int(request.query_params.get("limit", DEFAULT_TREND_POINTS))
+    except ValueError:
+        limit = 0
+    if not 1 <= limit <= MAX_TREND_POINTS:
+        return Response(
+            {"detail": f"limit must be between 1 and {MAX_TREND_POINTS}."},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+
+    qs, error = _upload_window(request, Dataset.objects.latest_first())
+    if error:
+        return error
+
+    versions = qs.only('id', 'revision', 'uploaded_at')[:limit]
+    etag = '"t{}"'.format(hashlib.sha1(
+        ".".join(ds.version_tag for ds in versions).encode()
+    ).hexdigest())
+    if _etag_matches(request, etag):
+        return _not_modified(etag)
+
+    datasets = list(qs.values('id', 'name', 'uploaded_at', 'summary')[:limit])[::-1]
+    response = Response(trend_series(datasets))
+    response["ETag"] = etag
+    return response
+
+
+@api_view(['GET'])
+@authentication_classes([CachedTokenAuthentication])
+@permission_classes([IsAuthenticated])
+def equipment_history(request):
+    """
+    Query params:
+      name:  Equipment Name (required)
+      limit: most recent readings to include (default 500, max 5000)
+      since, until: ISO 8601 bounds on the upload time
+    One equipment's readings across uploads, oldest first, as parallel
+    arrays. Served from the Reading index, so no dataset is opened.
+    """
+    name = request.query_params.get("name", "").strip()
+    if not name:
+        return Response({"detail": "name is required."}, status=status.HTTP_400_BAD_REQUEST)
+    try:
+        limit = int(request.query_params.get("limit", DEFAULT_HISTORY_POINTS))
+    except ValueError:
+        limit = 0
+    if not 1 <= limit <= MAX_HISTORY_POINTS:
+        return Response(
+            {"detail": f"limit must be between 1 and {MAX_HISTORY_POINTS}."},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+
+    qs, error = _upload_window(
+        request,
+        Reading.objects.filter(equipment_name=name).order_by('-dataset__uploaded_at', '-id'),
+        field="dataset__uploaded_at",
+    )
+    if error:
+        return error
+    readings = list(qs.values_list(
+        'dataset_id', 'dataset__uploaded_at', 'equipment_type', 'flowrate', 'pressure', 'temperature',
+    )[:limit])[::-1]
+
+    columns = [list(c) for c in zip(*readings)] or [[] for _ in range(6)]
+    dataset_ids, uploaded_at, types, *values = columns
+    return Response({
+        "equipment_name": name,
+        "type": types[-1] if types else None,
+        "points": len(readings),
+        "dataset_ids": dataset_ids,
+        "uploaded_at": uploaded_at,
+        "metrics": dict(zip(NUMERIC_COLS, values)),
+    })
+
+
+def _token_user(key):
+    token = get_token(key)
+    return token.user if token else None
+
+
+async def events_stream(request):
+    """
+    Server-sent event stream: dataset.created, dataset.updated, job.progress
+    and job.finished. EventSource cannot set headers, so the token may be
+    passed as ?token=; Authorization: Token <token> works too. Needs the ASGI
+    entry point (backend/asgi.py), e.g. uvicorn backend.asgi:application.
+    """
+    if request.method != 'GET':
+        return JsonResponse({"detail": "Method not allowed."}, status=405)
+    if "wsgi.version" in request.META:
+        return JsonResponse(
+            {"detail": "The event stream needs the ASGI server (backend.asgi)."},
+            status=status.HTTP_501_NOT_IMPLEMENTED,
+        )
+
+    key = request.GET.get("token", "")
+    auth = request.headers.get("Authorization", "")
+    if not key and auth.startswith("Token "):
+        key = auth[len("Token "):]
+    if not key or await sync_to_async(_token_user)(key) is None:
+        return JsonResponse(
+            {"detail": "Invalid or missing token."},
+            status=status.HTTP_401_UNAUTHORIZED,
+        )
+
+    try:
+        last_id = int(request.headers.get("Last-Event-ID", ""))
+    except ValueError:
+        last_id = None
+
+    response = StreamingHttpResponse(events.stream(last_id), content_type="text/event-stream")
+    response["Cache-Control"] = "no-cache"
+    response["X-Accel-Buffering"] = "no"  # don't let nginx buffer the stream
+    return response
@@ -0,0 +1,69 @@
+"""
+Database profiles, chosen with environment variables so the same settings
+serve a laptop and a multi-worker deployment.
+
+SQLite (default): WAL journal, so readers never wait for a writer; a busy
+timeout instead of immediate "database is locked" errors; IMMEDIATE
+transactions, so a writer takes the lock when it begins rather than
+failing to upgrade a read lock halfway through; and a few cache pragmas.
+The timeout and IMMEDIATE transactions are what serialise writers across
+processes; DATABASE_SINGLE_WRITER (api/db.py) only queues the writers
+within one process.
+
+PostgreSQL: DB_ENGINE=postgresql plus POSTGRES_DB, POSTGRES_USER,
+POSTGRES_PASSWORD, POSTGRES_HOST and POSTGRES_PORT. Needs psycopg.
+
+Connections are kept open between requests for DB_CONN_MAX_AGE seconds
+(default 60), with a health check before reuse, so WSGI workers (gunicorn)
+skip the connect on most requests; 0 closes them after every request.
+Under ASGI each request gets a fresh connection regardless, so for
+PostgreSQL under ASGI, DB_POOL=1 uses Django's connection pool instead.
+"""
+from django.core.exceptions import ImproperlyConfigured
+
+SQLITE_TIMEOUT = 20  # seconds a writer waits for the lock
+SQLITE_PRAGMAS = ";".join([
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",  # durable with WAL up to the last checkpoint
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA cache_size=-32000",  # KiB
+    "PRAGMA mmap_size=268435456",
+])
+
+
+def database_settings(env, base_dir):
+    """DATABASES for the profile selected by `env` (e.g. os.environ)."""
+    engine = env.get("DB_ENGINE", "sqlite").lower()
+    common = {
+        "CONN_MAX_AGE": int(env.get("DB_CONN_MAX_AGE", 60)),
+        "CONN_HEALTH_CHECKS": True,
+    }
+
+    if engine == "sqlite":
+        return {"default": {
+            "ENGINE": "django.db.backends.sqlite3",
+            "NAME": env.get("SQLITE_PATH", base_dir / "db.sqlite3"),
+            "OPTIONS": {
+                "timeout": SQLITE_TIMEOUT,
+                "transaction_mode": "IMMEDIATE",
+                "init_command": SQLITE_PRAGMAS,
+            },
+            **common,
+        }}
+
+    if engine in ("postgres", "postgresql"):
+        config = {
+            "ENGINE": "django.db.backends.postgresql",
+            "NAME": env.get("POSTGRES_DB", "equipment"),
+            "USER": env.get("POSTGRES_USER", "postgres"),
+            "PASSWORD": env.get("POSTGRES_PASSWORD", ""),
+            "HOST": env.get("POSTGRES_HOST", "localhost"),
+            "PORT": env.get("POSTGRES_PORT", "5432"),
+            **common,
+        }
+        if env.get("DB_POOL", "") in ("1", "true", "yes"):
+            # pooled connections can't also be persistent
+            config.update(CONN_MAX_AGE=0, OPTIONS={"pool": True})
+        return {"default": config}
+
+    raise ImproperlyConfigured(f"DB_ENGINE must be 'sqlite' or 'postgresql', not {engine!r}.")
@@ -10,8 +10,13 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import os
 from pathlib import Path
 
+from corsheaders.defaults import default_headers
+
+from .database import database_settings
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -44,6 +49,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'api.metrics.MetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -57,6 +63,8 @@ MIDDLEWARE = [
 ROOT_URLCONF = 'backend.urls'
 
 CORS_ALLOW_ALL_ORIGINS = True  # OK for local dev
+# chunked uploads send each part's checksum in X-Chunk-SHA256
+CORS_ALLOW_HEADERS = (*default_headers, 'x-chunk-sha256')
 
 
 REST_FRAMEWORK = {
@@ -87,12 +95,13 @@ WSGI_APPLICATION = 'backend.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
-DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
-    }
-}
+# SQLite by default, tuned for several workers; DB_ENGINE=postgresql switches
+# to PostgreSQL. See backend/database.py for the environment variables.
+DATABASES = database_settings(os.environ, BASE_DIR)
+
+# Serialise this process's dataset writes (api/db.py). SQLite allows one
+# writer at a time, so queueing here beats waiting out its busy timeout.
+DATABASE_SINGLE_WRITER = DATABASES['default']['ENGINE'].endswith('sqlite3')
 
 
 # Password validation
@@ -142,3 +151,53 @@ BASE_DIR = Path(__file__).resolve().parent.parent
 
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
+
+# Hash uploads while they stream in (content-hash deduplication), then
+# fall through to Django's default handlers.
+FILE_UPLOAD_HANDLERS = [
+    'api.uploads.HashingUploadHandler',
+    'django.core.files.uploadhandler.MemoryFileUploadHandler',
+    'django.core.files.uploadhandler.TemporaryFileUploadHandler',
+]
+
+# Background ingestion (api/jobs.py): size of the local worker pool that
+# parses uploads sent with async=1. A queued or running job that has not
+# reported progress for JOB_STALE_MINUTES is taken to have died with its
+# process: it no longer blocks its upload and retention marks it failed.
+INGEST_WORKERS = 2
+JOB_STALE_MINUTES = 30
+
+# Dataset retention (api/retention.py), applied in the background after each
+# upload and by `manage.py prune_datasets`. None disables a limit; the newest
+# dataset is always kept.
+RETENTION_MAX_DATASETS = 5
+RETENTION_MAX_AGE_DAYS = None
+RETENTION_MAX_BYTES = None
+# Unfinished chunked uploads and files no dataset or job refers to are
+# removed once they are this old.
+RETENTION_STALE_HOURS = 24
+
+# Request profiling (api/metrics.py), off by default. When on, requests served
+# synchronously (WSGI, runserver) run under cProfile and those slower than
+# PROFILE_SLOW_MS leave a .prof dump in PROFILE_DIR (`python -m pstats <file>`).
+PROFILE_REQUESTS = False
+PROFILE_SLOW_MS = 500
+PROFILE_DIR = BASE_DIR / 'profiles'
+
+# Token authentication cache (api/authentication.py): tokens seen recently are
+# trusted for AUTH_TOKEN_CACHE_TTL seconds without a DB lookup. Logout and
+# user changes evict them at once in this process; the TTL bounds how long
+# other worker processes may still accept them.
+AUTH_TOKEN_CACHE_TTL = 60
+AUTH_TOKEN_CACHE_SIZE = 1024
+
+# Rendered summary and history responses (api/response_cache.py), keyed by a
+# generation read from the dataset table, so writes from any process are
+# seen at once. RESPONSE_CACHE_TTL only frees entries of past generations.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'api',
+    },
+}
+RESPONSE_CACHE_TTL = 300
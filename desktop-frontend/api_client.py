@@ -0,0 +1,325 @@
+# desktop-frontend/api_client.py
+"""
+HTTP layer for the desktop client.
+
+One pooled requests.Session with bounded timeouts and retry/backoff, plus an
+on-disk cache for responses the server tags with an ETag (latest summary,
+history, PDF reports). Cached entries are revalidated with If-None-Match, so
+an unchanged dataset costs a 304 instead of a re-download, also across app
+restarts. The cache belongs to one auth token: logging out, or in with a
+different token, empties it, so one user's responses never serve another.
+EventStream reads the server-sent event stream.
+"""
+import hashlib
+import json
+import os
+import shutil
+import socket
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+CACHE_DIR = os.path.join(os.path.expanduser("~"), ".chemviz_cache")
+
+# (connect, read) seconds
+TIMEOUT = (5, 60)
+RETRIES = 3
+BACKOFF = 0.5
+POOL_SIZE = 8
+
+# the server sends a heartbeat every 15 s; a silent stream is a dead one
+EVENTS_READ_TIMEOUT = 45
+EVENTS_MAX_DELAY = 30
+
+# pseudo-events EventStream yields when the connection opens / drops
+STREAM_OPEN = "stream.open"
+STREAM_CLOSED = "stream.closed"
+
+
+class ApiError(Exception):
+    def __init__(self, status, detail):
+        super().__init__(detail)
+        self.status = status
+
+
+class ResponseCache:
+    """
+    Bodies are stored as files named after the request URL; index.json maps
+    each URL to its ETag and the dataset id the body belongs to. The owner
+    file names who the entries were fetched for (see claim).
+    """
+
+    def __init__(self, directory=CACHE_DIR):
+        self.directory = directory
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+        self._index_path = os.path.join(directory, "index.json")
+        try:
+            with open(self._index_path) as f:
+                self._index = json.load(f)
+        except (OSError, ValueError):
+            self._index = {}
+
+    def _body_path(self, url):
+        return os.path.join(self.directory, hashlib.sha1(url.encode()).hexdigest())
+
+    def lookup(self, url):
+        """Return (etag, body path) for `url`, or (None, None)."""
+        with self._lock:
+            entry = self._index.get(url)
+        if entry and os.path.exists(self._body_path(url)):
+            return entry["etag"], self._body_path(url)
+        return None, None
+
+    def store(self, url, etag, source_path, dataset_id=None):
+        """Move the file at `source_path` into the cache for `url`."""
+        os.replace(source_path, self._body_path(url))
+        with self._lock:
+            self._index[url] = {"etag": etag, "dataset_id": dataset_id}
+            self._save()
+
+    def store_bytes(self, url, etag, body, dataset_id=None):
+        tmp = self._body_path(url) + ".tmp"
+        with open(tmp, "wb") as f:
+            f.write(body)
+        self.store(url, etag, tmp, dataset_id)
+
+    def claim(self, owner):
+        """
+        Keep the entries only if they were stored for `owner` (e.g. a hash
+        of the auth token); otherwise clear the cache and record `owner`.
+        """
+        path = os.path.join(self.directory, "owner")
+        try:
+            with open(path) as f:
+                current = f.read()
+        except OSError:
+            current = None
+        if current == owner:
+            return
+        self.clear()
+        if owner:
+            with open(path, "w") as f:
+                f.write(owner)
+
+    def clear(self):
+        with self._lock:
+            self._index = {}
+            shutil.rmtree(self.directory, ignore_errors=True)
+            os.makedirs(self.directory, exist_ok=True)
+
+    def _save(self):
+        tmp = self._index_path + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump(self._index, f)
+        os.replace(tmp, self._index_path)
+
+
+class ApiClient:
+    """Thread-safe enough to share between the app's worker threads."""
+
+    def __init__(self, base_url, cache_dir=CACHE_DIR, timeout=TIMEOUT):
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+        self.cache = ResponseCache(cache_dir)
+
+        # Connection errors are retried for every method (nothing was sent);
+        # read errors and 502/503/504 only for idempotent ones. Upload parts
+        # are PUTs, so they are retried too.
+        retry = Retry(
+            total=RETRIES,
+            backoff_factor=BACKOFF,
+            status_forcelist=(502, 503, 504),
+            allowed_methods=frozenset({"GET", "HEAD", "PUT", "DELETE", "OPTIONS"}),
+            raise_on_status=False,
+        )
+        adapter = HTTPAdapter(max_retries=retry, pool_connections=POOL_SIZE,
+                              pool_maxsize=POOL_SIZE)
+        self.session = requests.Session()
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def set_token(self, token):
+        """Authenticate later requests as `token` (None logs out)."""
+        if token:
+            self.session.headers["Authorization"] = f"Token {token}"
+            self.cache.claim(hashlib.sha256(token.encode()).hexdigest())
+        else:
+            self.session.headers.pop("Authorization", None)
+            self.cache.claim(None)
+
+    def close(self):
+        self.session.close()
+
+    def url(self, path):
+        return f"{self.base_url}/{path.lstrip('/')}"
+
+    # ---------- plain requests ----------
+
+    def request(self, method, path, **kwargs):
+        kwargs.setdefault("timeout", self.timeout)
+        return self.session.request(method, self.url(path), **kwargs)
+
+    def get(self, path, **kwargs):
+        return self.request("GET", path, **kwargs)
+
+    def post(self, path, **kwargs):
+        return self.request("POST", path, **kwargs)
+
+    def put(self, path, **kwargs):
+        return self.request("PUT", path, **kwargs)
+
+    @staticmethod
+    def check(resp):
+        """Raise ApiError with the server's detail message on 4xx/5xx."""
+        if resp.status_code >= 400:
+            try:
+                detail = resp.json().get("detail", resp.text)
+            except ValueError:
+                detail = resp.text or resp.reason
+            raise ApiError(resp.status_code, detail)
+        return resp
+
+    # ---------- cached requests ----------
+
+    def get_json_cached(self, path):
+        """
+        GET a JSON resource, revalidating any cached copy. Returns
+        (data, from_cache); raises ApiError on 4xx/5xx.
+        """
+        url = self.url(path)
+        etag, cached = self.cache.lookup(url)
+        headers = {"If-None-Match": etag} if etag else {}
+        resp = self.get(path, headers=headers)
+        if resp.status_code == 304 and cached:
+            with open(cached, "rb") as f:
+                return json.loads(f.read()), True
+
+        self.check(resp)
+        data = resp.json()
+        if resp.headers.get("ETag"):
+            dataset_id = data.get("dataset_id") if isinstance(data, dict) else None
+            self.cache.store_bytes(url, resp.headers["ETag"], resp.content, dataset_id)
+        return data, False
+
+    def download_cached(self, path, dest, on_progress=None, check_cancel=None,
+                        block_size=64 * 1024):
+        """
+        Stream a file (e.g. a PDF report) to `dest`. If the cached copy is
+        still current it is copied instead. `on_progress(done, total)` and
+        `check_cancel()` are called between blocks. Returns True when served
+        from the cache.
+        """
+        url = self.url(path)
+        etag, cached = self.cache.lookup(url)
+        headers = {"If-None-Match": etag} if etag else {}
+        with self.get(path, headers=headers, stream=True) as resp:
+            if resp.status_code == 304 and cached:
+                shutil.copyfile(cached, dest)
+                return True
+            self.check(resp)
+
+            total = int(resp.headers.get("Content-Length") or 0)
+            done = 0
+            tmp = dest + ".part"
+            try:
+                with open(tmp, "wb") as f:
+                    for block in resp.iter_content(chunk_size=block_size):
+                        if check_cancel:
+                            check_cancel()
+                        f.write(block)
+                        done += len(block)
+                        if on_progress:
+                            on_progress(done, total)
+                new_etag = resp.headers.get("ETag")
+                if new_etag:
+                    shutil.copyfile(tmp, tmp + ".cache")
+                    self.cache.store(url, new_etag, tmp + ".cache")
+                os.replace(tmp, dest)
+            finally:
+                for leftover in (tmp, tmp + ".cache"):
+                    if os.path.exists(leftover):
+                        os.remove(leftover)
+        return False
+
+
+class EventStream:
+    """
+    Iterate over the server's event stream as (event, data) pairs. Dropped
+    connections are re-opened with backoff and resume from the last event
+    id, so nothing is missed. Iteration ends when close() is called or the
+    server has no event stream (e.g. running under WSGI); callers then fall
+    back to polling.
+    """
+
+    def __init__(self, client):
+        self.client = client
+        self.last_id = None
+        self._response = None
+        self._stop = threading.Event()
+
+    def close(self):
+        self._stop.set()
+        response = self._response
+        if response is not None:
+            # Closing the response would wait for the blocked read to finish
+            # (up to a heartbeat). Shutting the socket down ends it right away;
+            # the reading thread then closes the response itself.
+            conn = getattr(response.raw, "_connection", None)
+            sock = getattr(conn, "sock", None)
+            try:
+                if sock is not None:
+                    sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+
+    def __iter__(self):
+        delay = 1
+        while not self._stop.is_set():
+            headers = {"Accept": "text/event-stream"}
+            if self.last_id:
+                headers["Last-Event-ID"] = self.last_id
+            try:
+                self._response = self.client.get(
+                    "events/", headers=headers, stream=True,
+                    timeout=(self.client.timeout[0], EVENTS_READ_TIMEOUT),
+                )
+                self.client.check(self._response)
+                delay = 1
+                yield STREAM_OPEN, None
+                yield from self._parse(self._response)
+            except ApiError:
+                return  # unauthorised or no ASGI server: nothing to retry
+            except Exception:
+                if self._stop.is_set():
+                    return
+            finally:
+                if self._response is not None:
+                    self._response.close()
+                    self._response = None
+            yield STREAM_CLOSED, None
+            self._stop.wait(delay)
+            delay = min(delay * 2, EVENTS_MAX_DELAY)
+
+    def _parse(self, response):
+        event, data, event_id = "message", [], None
+        for line in response.iter_lines(decode_unicode=True):
+            if self._stop.is_set():
+                return
+            if not line:
+                if event_id:
+                    self.last_id = event_id
+                if data:
+                    yield event, json.loads("\n".join(data))
+                event, data, event_id = "message", [], None
+            elif not line.startswith(":"):  # ":" lines are heartbeats
+                field, _, value = line.partition(":")
+                value = value[1:] if value.startswith(" ") else value
+                if field == "event":
+                    event = value
+                elif field == "data":
+                    data.append(value)
+                elif field == "id":
+                    event_id = value
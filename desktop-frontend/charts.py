@@ -0,0 +1,133 @@
+# desktop-frontend/charts.py
+"""
+Embedded Overview charts.
+
+One persistent FigureCanvasQTAgg holds the Type distribution and a histogram
+per numeric column. Refreshing only moves the existing bar artists
+(set_height / set_x / set_width) and blits them over a cached background;
+the figure is fully redrawn only when an axis range or the set of Types
+changes. No pyplot figures or windows are created.
+"""
+from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg
+from matplotlib.figure import Figure
+
+NUMERIC_COLS = ["Flowrate", "Pressure", "Temperature"]
+COLORS = ["#FFF58A", "#FFBBE1", "#DD7BDF", "#B3BFFF"]
+HIST_BINS = 20
+
+BACKGROUND = "#020617"
+FOREGROUND = "#9ca3af"
+
+# y-limits only change (forcing a full redraw) when data outgrows them or
+# shrinks below this fraction of them
+SHRINK_RATIO = 0.5
+HEADROOM = 1.15
+
+
+class ChartPanel(FigureCanvasQTAgg):
+    def __init__(self, parent=None):
+        figure = Figure(figsize=(8, 4.5), facecolor=BACKGROUND, tight_layout=True)
+        super().__init__(figure)
+        self.setParent(parent)
+
+        axes = figure.subplots(2, 2)
+        self.type_ax = axes[0][0]
+        self.hist_axes = dict(zip(NUMERIC_COLS, [axes[0][1], axes[1][0], axes[1][1]]))
+        self._style(self.type_ax, "Equipment Type Distribution")
+        for col, ax in self.hist_axes.items():
+            self._style(ax, f"{col} Distribution")
+
+        self.type_labels = None
+        self.type_bars = []
+        self.hist_bars = {col: [] for col in NUMERIC_COLS}
+
+        self._background = None
+        self._full_redraw = True
+        self.mpl_connect("draw_event", self._on_draw)
+
+    @staticmethod
+    def _style(ax, title):
+        ax.set_facecolor(BACKGROUND)
+        ax.set_title(title, color=FOREGROUND, fontsize=9)
+        ax.tick_params(colors=FOREGROUND, labelsize=8)
+        for spine in ax.spines.values():
+            spine.set_color("#1f2933")
+
+    # ---------- updates ----------
+
+    def update_types(self, dist):
+        labels = list(dist)
+        values = [dist[k] for k in labels]
+        if labels != self.type_labels:
+            # different categories: rebuild the bars (and tick labels)
+            for bar in self.type_bars:
+                bar.remove()
+            self.type_bars = list(self.type_ax.bar(
+                range(len(labels)), values, animated=True,
+                color=[COLORS[i % len(COLORS)] for i in range(len(labels))],
+            ))
+            self.type_ax.set_xticks(range(len(labels)))
+            self.type_ax.set_xticklabels([str(k) for k in labels], rotation=20)
+            self.type_ax.set_xlim(-0.6, len(labels) - 0.4)
+            self.type_labels = labels
+            self._full_redraw = True
+        else:
+            for bar, value in zip(self.type_bars, values):
+                bar.set_height(value)
+        self._fit_ylim(self.type_ax, max(values, default=0))
+
+    def update_histograms(self, histograms):
+        for col, ax in self.hist_axes.items():
+            hist = histograms.get(col) or {"edges": [], "counts": []}
+            edges, counts = hist["edges"], hist["counts"]
+            bars = self.hist_bars[col]
+            if len(bars) != len(counts):
+                for bar in bars:
+                    bar.remove()
+                bars = self.hist_bars[col] = list(ax.bar(
+                    [0] * len(counts), [0] * len(counts), align="edge",
+                    color=COLORS[(NUMERIC_COLS.index(col) + 1) % len(COLORS)],
+                    animated=True,
+                ))
+                self._full_redraw = True
+            for bar, left, right, count in zip(bars, edges, edges[1:], counts):
+                bar.set_x(left)
+                bar.set_width(right - left)
+                bar.set_height(count)
+            if edges:
+                self._fit_xlim(ax, edges[0], edges[-1])
+            self._fit_ylim(ax, max(counts, default=0))
+
+    def _fit_xlim(self, ax, lo, hi):
+        if (lo, hi) != tuple(ax.get_xlim()):
+            ax.set_xlim(lo, hi if hi > lo else lo + 1)
+            self._full_redraw = True
+
+    def _fit_ylim(self, ax, peak):
+        top = ax.get_ylim()[1]
+        if peak > top or peak < top * SHRINK_RATIO:
+            ax.set_ylim(0, max(peak, 1) * HEADROOM)
+            self._full_redraw = True
+
+    def refresh(self):
+        """Repaint after updates: blit the bars, or redraw if the axes changed."""
+        if self._full_redraw or self._background is None:
+            self._full_redraw = False
+            self.draw_idle()  # draw_event re-caches the background
+            return
+        self.restore_region(self._background)
+        self._draw_bars()
+        self.blit(self.figure.bbox)
+
+    # ---------- blitting ----------
+
+    def _on_draw(self, event):
+        self._background = self.copy_from_bbox(self.figure.bbox)
+        self._draw_bars()
+
+    def _draw_bars(self):
+        for bar in self.type_bars:
+            self.figure.draw_artist(bar)
+        for bars in self.hist_bars.values():
+            for bar in bars:
+                self.figure.draw_artist(bar)
@@ -1,6 +1,9 @@
 # desktop-frontend/main.py
+import hashlib
+import json
+import os
 import sys
-import requests
+import threading
 
 from PyQt5.QtWidgets import (
     QApplication,
@@ -18,15 +21,90 @@ from PyQt5.QtWidgets import (
     QGroupBox,
     QTabWidget,
     QHeaderView,
+    QProgressBar,
+    QTableView,
+    QComboBox,
+    QAction,
 )
-from PyQt5.QtCore import Qt
+from PyQt5.QtCore import QObject, QRunnable, Qt, QThreadPool, QTimer, pyqtSignal
 
-import matplotlib
-
-matplotlib.use("Qt5Agg")
-import matplotlib.pyplot as plt  # noqa: E402
+from api_client import STREAM_CLOSED, STREAM_OPEN, ApiClient, ApiError, EventStream
+from charts import HIST_BINS, ChartPanel
+from rows_model import PAGE_SIZE, RowsModel
 
 API_BASE = "http://127.0.0.1:8000/api"
+JOB_POLL_MS = 1000
+# while the server pushes job events, polling is only a safety net
+JOB_POLL_FALLBACK_MS = 10000
+FILTER_DELAY_MS = 400
+
+# chunked, resumable uploads (see backend api/uploads.py)
+CHUNK_SIZE = 8 * 1024 * 1024
+RESUME_FILE = os.path.join(os.path.expanduser("~"), ".chemviz_uploads.json")
+
+# network calls run on this many worker threads, never on the GUI thread
+MAX_WORKERS = 4
+
+
+class Cancelled(Exception):
+    pass
+
+
+class TaskSignals(QObject):
+    # QRunnable is not a QObject, so its signals live here. They are emitted
+    # from the worker thread and delivered on the GUI thread.
+    progress = pyqtSignal(int, int)  # done, total (bytes or parts)
+    status = pyqtSignal(str)
+    message = pyqtSignal(str, object)  # name, data (e.g. pushed server events)
+    result = pyqtSignal(object)
+    error = pyqtSignal(str)
+    cancelled = pyqtSignal()
+    finished = pyqtSignal()
+
+
+class Task(QRunnable):
+    """
+    Run fn(task, *args) on the thread pool. `fn` reports through
+    task.progress()/task.status() and calls task.check() at safe points so
+    that cancel() can stop it.
+    """
+
+    def __init__(self, fn, *args):
+        super().__init__()
+        self.fn = fn
+        self.args = args
+        self.signals = TaskSignals()
+        self._cancel = threading.Event()
+        self.setAutoDelete(False)  # owned by App.tasks until finished
+
+    def cancel(self):
+        self._cancel.set()
+
+    def check(self):
+        if self._cancel.is_set():
+            raise Cancelled()
+
+    def progress(self, done, total):
+        self.signals.progress.emit(int(done), int(total))
+
+    def status(self, text):
+        self.signals.status.emit(text)
+
+    def emit(self, name, data=None):
+        self.signals.message.emit(name, data)
+
+    def run(self):
+        try:
+            result = self.fn(self, *self.args)
+            self.check()
+        except Cancelled:
+            self.signals.cancelled.emit()
+        except Exception as e:
+            self.signals.error.emit(str(e))
+        else:
+            self.signals.result.emit(result)
+        finally:
+            self.signals.finished.emit()
 
 
 class App(QWidget):
@@ -127,6 +205,26 @@ class App(QWidget):
         self.auth_token = None
         self.auth_user = None
 
+        # --- networking: one pooled, cached client; calls run on worker threads ---
+        self.api = ApiClient(API_BASE)
+        self.pool = QThreadPool(self)
+        self.pool.setMaxThreadCount(MAX_WORKERS)
+        self.tasks = set()  # keep running tasks (and their signals) alive
+        self.transfer = None  # the upload/download the progress bar tracks
+
+        # --- pushed server events, on their own thread so workers stay free ---
+        self.events_pool = QThreadPool(self)
+        self.events_pool.setMaxThreadCount(1)
+        self.event_stream = None
+        self.events_task = None
+
+        # --- background upload job being polled ---
+        self.job_id = None
+        self.job_polling = False
+        self.job_timer = QTimer(self)
+        self.job_timer.setInterval(JOB_POLL_MS)
+        self.job_timer.timeout.connect(self.poll_job)
+
         # === ROOT LAYOUT ===
         root = QVBoxLayout()
         root.setContentsMargins(16, 16, 16, 16)
@@ -182,6 +280,19 @@ class App(QWidget):
         btn_row.addStretch()
         ov_layout.addLayout(btn_row)
 
+        # transfer progress (upload / PDF download) with cancel
+        progress_row = QHBoxLayout()
+        self.progress = QProgressBar()
+        self.progress.setTextVisible(True)
+        self.btn_cancel = QPushButton("Cancel")
+        self.btn_cancel.setObjectName("GhostButton")
+        self.btn_cancel.clicked.connect(self.cancel_transfer)
+        progress_row.addWidget(self.progress)
+        progress_row.addWidget(self.btn_cancel)
+        ov_layout.addLayout(progress_row)
+        self.progress.hide()
+        self.btn_cancel.hide()
+
         # summary group
         self.summary_group = QGroupBox("Dataset Summary")
         sg_layout = QVBoxLayout()
@@ -189,15 +300,17 @@ class App(QWidget):
         self.summary_label.setWordWrap(True)
         sg_layout.addWidget(self.summary_label)
 
-        tip = QLabel(
-            "Tip: After loading a dataset, a bar chart for Equipment Type Distribution will pop up."
-        )
-        tip.setStyleSheet("color: #9ca3af; font-size: 11px;")
-        sg_layout.addWidget(tip)
-
         self.summary_group.setLayout(sg_layout)
         ov_layout.addWidget(self.summary_group)
 
+        # charts: one embedded canvas, updated in place on every refresh
+        charts_group = QGroupBox("Charts")
+        cg_layout = QVBoxLayout()
+        self.charts = ChartPanel()
+        cg_layout.addWidget(self.charts)
+        charts_group.setLayout(cg_layout)
+        ov_layout.addWidget(charts_group, stretch=1)
+
         self.tabs.addTab(overview, "Overview")
 
         # ---------- HISTORY TAB ----------
@@ -214,6 +327,9 @@ class App(QWidget):
 
         self.table = QTableWidget(0, 3)
         self.table.setHorizontalHeaderLabels(["Filename", "Uploaded At", "Total Rows"])
+        self.table.setContextMenuPolicy(Qt.ActionsContextMenu)
+        self.history_report_action = QAction("Download PDF report", self.table)
+        self.table.addAction(self.history_report_action)
         self.table.horizontalHeader().setSectionResizeMode(0, QHeaderView.Stretch)
         self.table.horizontalHeader().setSectionResizeMode(1, QHeaderView.Stretch)
         self.table.horizontalHeader().setSectionResizeMode(2, QHeaderView.ResizeToContents)
@@ -226,22 +342,124 @@ class App(QWidget):
 
         self.tabs.addTab(history_tab, "Upload History")
 
+        # ---------- ROWS TAB ----------
+        rows_tab = QWidget()
+        r_layout = QVBoxLayout()
+        r_layout.setSpacing(10)
+        rows_tab.setLayout(r_layout)
+
+        r_btn_row = QHBoxLayout()
+        self.btn_rows = QPushButton("Load Latest Dataset Rows")
+        self.search_edit = QLineEdit()
+        self.search_edit.setPlaceholderText("Search name / type...")
+        self.type_combo = QComboBox()
+        self.type_combo.addItem("All types", "")
+        self.rows_label = QLabel("")
+        self.rows_label.setObjectName("SubtitleLabel")
+        r_btn_row.addWidget(self.btn_rows)
+        r_btn_row.addWidget(self.search_edit)
+        r_btn_row.addWidget(self.type_combo)
+        r_btn_row.addWidget(self.rows_label)
+        r_btn_row.addStretch()
+        r_layout.addLayout(r_btn_row)
+
+        # pages are fetched lazily as the view scrolls; see rows_model.py
+        self.rows_model = RowsModel(self._fetch_rows_page, self)
+        self.rows_model.modelReset.connect(self._rows_loaded)
+        self.rows_view = QTableView()
+        self.rows_view.setModel(self.rows_model)
+        self.rows_view.setSortingEnabled(True)
+        self.rows_view.horizontalHeader().setSortIndicator(-1, Qt.AscendingOrder)
+        self.rows_view.horizontalHeader().setSectionResizeMode(QHeaderView.Stretch)
+        # uniform row heights keep scrolling O(visible rows)
+        self.rows_view.verticalHeader().setSectionResizeMode(QHeaderView.Fixed)
+        self.rows_view.verticalHeader().setDefaultSectionSize(22)
+
+        rows_group = QGroupBox("Dataset Rows")
+        rg_layout = QVBoxLayout()
+        rg_layout.addWidget(self.rows_view)
+        rows_group.setLayout(rg_layout)
+        r_layout.addWidget(rows_group)
+
+        self.tabs.addTab(rows_tab, "Rows")
+
+        self.filter_timer = QTimer(self)
+        self.filter_timer.setSingleShot(True)
+        self.filter_timer.setInterval(FILTER_DELAY_MS)
+        self.filter_timer.timeout.connect(self.apply_row_filters)
+
         # === SIGNALS ===
         self.btn_upload.clicked.connect(self.upload_csv)
         self.btn_refresh.clicked.connect(self.load_latest)
         self.btn_history.clicked.connect(self.load_history)
-        self.btn_pdf.clicked.connect(self.download_pdf)
+        self.btn_pdf.clicked.connect(lambda: self.download_pdf(None))
+        self.history_report_action.triggered.connect(self._download_history_report)
+        self.btn_rows.clicked.connect(lambda: self.load_rows(None))
+        self.search_edit.textChanged.connect(self.filter_timer.start)
+        self.type_combo.currentIndexChanged.connect(self.apply_row_filters)
+        self.table.cellDoubleClicked.connect(self._open_history_rows)
 
     # ======================== HELPERS ========================
 
     def alert(self, title, message):
         QMessageBox.information(self, title, message)
 
-    def _auth_headers(self):
-        headers = {}
-        if self.auth_token:
-            headers["Authorization"] = f"Token {self.auth_token}"
-        return headers
+    def _set_token(self, token):
+        self.auth_token = token
+        self.api.set_token(token)
+
+    def run_task(self, fn, *args, on_result=None, on_error=None, transfer=False):
+        """
+        Run fn(task, *args) on the worker pool; `on_result` gets the return
+        value on the GUI thread. With transfer=True the task drives the
+        progress bar and can be cancelled from the UI.
+        """
+        task = Task(fn, *args)
+        self.tasks.add(task)
+        sig = task.signals
+        if on_result:
+            sig.result.connect(on_result)
+        sig.error.connect(on_error or (lambda msg: self.alert("Error", msg)))
+        sig.finished.connect(lambda: self.tasks.discard(task))
+
+        if transfer:
+            self.transfer = task
+            self.progress.setRange(0, 0)  # busy until the first report
+            self.progress.setFormat("%p%")
+            self.progress.show()
+            self.btn_cancel.show()
+            sig.progress.connect(self._on_progress)
+            sig.status.connect(self.summary_label.setText)
+            sig.finished.connect(lambda: self._end_transfer(task))
+
+        self.pool.start(task)
+        return task
+
+    def _on_progress(self, done, total):
+        if total > 0:
+            self.progress.setRange(0, total)
+            self.progress.setValue(min(done, total))
+
+    def _end_transfer(self, task):
+        if self.transfer is task:
+            self.transfer = None
+            self.progress.hide()
+            self.btn_cancel.hide()
+
+    def cancel_transfer(self):
+        if self.transfer is not None:
+            self.transfer.cancel()
+            self.btn_cancel.hide()
+
+    def closeEvent(self, event):
+        self.stop_events()
+        for task in list(self.tasks):
+            task.cancel()
+        self.job_timer.stop()
+        self.pool.waitForDone(2000)
+        self.events_pool.waitForDone(2000)
+        self.api.close()
+        super().closeEvent(event)
 
     def _ensure_logged_in(self):
         """Return True if logged in, otherwise show a message and return False."""
@@ -255,13 +473,16 @@ class App(QWidget):
     def handle_auth_button(self):
         """Login if logged out; logout if logged in."""
         if self.auth_token:
-            # logout
-            try:
-                requests.post(f"{API_BASE}/auth/logout/", headers=self._auth_headers())
-            except Exception:
-                pass  # ignore errors
+            # logout: fire and forget, errors are ignored
+            api = self.api
+            headers = {"Authorization": f"Token {self.auth_token}"}
+            self.run_task(
+                lambda task: api.post("auth/logout/", headers=headers),
+                on_error=lambda msg: None,
+            )
 
-            self.auth_token = None
+            self.stop_events()
+            self._set_token(None)
             self.auth_user = None
             self.user_label.setText("Logged out")
             self.login_btn.setText("Login")
@@ -279,20 +500,67 @@ class App(QWidget):
         if not ok or not password:
             return
 
-        try:
-            resp = requests.post(
-                f"{API_BASE}/auth/login/",
-                json={"username": username, "password": password},
+        def login(task):
+            resp = self.api.post(
+                "auth/login/", json={"username": username, "password": password}
             )
-            resp.raise_for_status()
-            data = resp.json()
-            self.auth_token = data.get("token")
-            self.auth_user = data.get("username")
-            self.user_label.setText(f"Logged in as <b>{self.auth_user}</b>")
-            self.login_btn.setText("Log out")
-            self.alert("Login", f"Logged in as {self.auth_user}")
-        except Exception as e:
-            self.alert("Error", f"Login failed: {e}")
+            return self.api.check(resp).json()
+
+        self.login_btn.setEnabled(False)
+        task = self.run_task(
+            login,
+            on_result=self._logged_in,
+            on_error=lambda msg: self.alert("Error", f"Login failed: {msg}"),
+        )
+        task.signals.finished.connect(lambda: self.login_btn.setEnabled(True))
+
+    def _logged_in(self, data):
+        self._set_token(data.get("token"))
+        self.auth_user = data.get("username")
+        self.user_label.setText(f"Logged in as <b>{self.auth_user}</b>")
+        self.login_btn.setText("Log out")
+        self.start_events()
+        self.alert("Login", f"Logged in as {self.auth_user}")
+
+    # ======================== PUSHED EVENTS ========================
+
+    def start_events(self):
+        """Listen to the server's event stream (needs the ASGI server)."""
+        self.stop_events()
+        stream = self.event_stream = EventStream(self.api)
+
+        def listen(task):
+            for name, data in stream:
+                task.emit(name, data)
+
+        task = self.events_task = Task(listen)
+        task.signals.message.connect(self._on_server_event)
+        task.signals.error.connect(lambda msg: None)  # polling still works
+        self.events_pool.start(task)
+
+    def stop_events(self):
+        if self.event_stream is not None:
+            self.event_stream.close()
+            self.events_task.cancel()
+            self.event_stream = self.events_task = None
+        self.job_timer.setInterval(JOB_POLL_MS)
+
+    def _on_server_event(self, name, data):
+        if name == STREAM_OPEN:
+            self.job_timer.setInterval(JOB_POLL_FALLBACK_MS)
+        elif name == STREAM_CLOSED:
+            self.job_timer.setInterval(JOB_POLL_MS)
+        elif name in ("dataset.created", "dataset.updated"):
+            # revalidated against the cache, so these are cheap
+            self.load_latest()
+            if self.table.rowCount():
+                self.load_history()
+        elif self.job_id is not None and data.get("job_id") == self.job_id:
+            if name == "job.progress":
+                pct = int(data.get("progress", 0) * 100)
+                self.summary_label.setText(f"Processing {data.get('filename')}... {pct}%")
+            elif name == "job.finished":
+                self.poll_job()  # fetch the result now instead of at the next tick
 
     # ======================== API CALLS ========================
 
@@ -306,89 +574,261 @@ class App(QWidget):
         if not path:
             return
 
-        try:
-            with open(path, "rb") as f:
-                resp = requests.post(
-                    f"{API_BASE}/upload/", files={"file": f}, headers=self._auth_headers()
-                )
+        self.btn_upload.setEnabled(False)
+        task = self.run_task(
+            self.upload_chunked, path,
+            on_result=self._upload_sent,
+            on_error=self._upload_failed,
+            transfer=True,
+        )
+        task.signals.cancelled.connect(self._upload_cancelled)
 
-            if resp.status_code >= 400:
-                raise RuntimeError(resp.text)
+    def _upload_sent(self, sent):
+        job_id, data = sent
+        if data is not None:
+            # identical file already on the server: nothing was sent
+            self.btn_upload.setEnabled(True)
+            self.render_summary(data)
+            self.alert("Upload Successful", f"Already uploaded: {data.get('filename')}")
+            return
 
-            data = resp.json()
+        # server parses in the background; poll the job until it finishes
+        self.job_id = job_id
+        self.summary_label.setText("Processing upload...")
+        self.job_timer.start()
+
+    def _upload_failed(self, msg):
+        self.btn_upload.setEnabled(True)
+        self.alert("Error", f"{msg}\n\nUpload again to resume where it stopped.")
+
+    def _upload_cancelled(self):
+        self.btn_upload.setEnabled(True)
+        self.summary_label.setText("Upload cancelled. Upload the same file again to resume.")
+
+    def upload_chunked(self, task, path):
+        """
+        Send `path` in checksummed parts (runs on a worker thread). Progress
+        is remembered per file in RESUME_FILE, so after a dropped connection
+        or a cancel only missing parts are re-sent. Returns (job_id, None), or
+        (None, summary) when the server already has a dataset with the same
+        content hash.
+        """
+        stat = os.stat(path)
+        resume_key = f"{os.path.abspath(path)}|{stat.st_size}|{int(stat.st_mtime)}"
+        saved = _load_resume()
+
+        session = None
+        if resume_key in saved:
+            resp = self.api.get(f"uploads/{saved[resume_key]}/")
+            if resp.ok and not resp.json().get("completed"):
+                session = resp.json()
+        if session is None:
+            task.status("Checking file...")
+            sha256 = _file_sha256(path, task)
+            resp = self.api.post(
+                "uploads/",
+                json={
+                    "filename": os.path.basename(path),
+                    "size": stat.st_size,
+                    "chunk_size": CHUNK_SIZE,
+                    "sha256": sha256,
+                },
+            )
+            session = self.api.check(resp).json()
+            if session.get("deduplicated"):
+                return None, session
+            saved[resume_key] = session["upload_id"]
+            _save_resume(saved)
+
+        upload_id = session["upload_id"]
+        total = session["total_parts"]
+        have = set(session["received_parts"])
+        with open(path, "rb") as f:
+            for part in range(1, total + 1):
+                task.check()
+                if part not in have:
+                    f.seek((part - 1) * session["chunk_size"])
+                    body = f.read(session["chunk_size"])
+                    self._put_part(task, upload_id, part, body)
+                task.status(f"Uploading... part {part}/{total}")
+                task.progress(min(part * session["chunk_size"], stat.st_size), stat.st_size)
+
+        task.check()
+        resp = self.api.check(self.api.post(
+            f"uploads/{upload_id}/complete/", json={"async": "1"}
+        ))
+
+        saved.pop(resume_key, None)
+        _save_resume(saved)
+        return resp.json()["job_id"], None
+
+    def _put_part(self, task, upload_id, part, body):
+        # PUT is idempotent, so the client retries dropped parts with backoff
+        headers = {
+            "Content-Type": "application/octet-stream",
+            "X-Chunk-SHA256": hashlib.sha256(body).hexdigest(),
+        }
+        self.api.check(self.api.put(
+            f"uploads/{upload_id}/parts/{part}/", data=body, headers=headers
+        ))
+
+    def poll_job(self):
+        if self.job_polling:
+            return  # previous poll still in flight
+
+        def fetch(task, job_id):
+            return self.api.check(self.api.get(f"jobs/{job_id}/")).json()
+
+        def failed(msg):
+            self._finish_job()
+            self.alert("Error", msg)
+
+        self.job_polling = True
+        task = self.run_task(fetch, self.job_id, on_result=self._job_polled, on_error=failed)
+        task.signals.finished.connect(lambda: setattr(self, "job_polling", False))
+
+    def _job_polled(self, job):
+        if self.job_id is None:
+            return
+        if job["status"] == "succeeded":
+            self._finish_job()
+            data = job["result"]
             self.render_summary(data)
             self.alert("Upload Successful", f"Uploaded: {data.get('filename')}")
-        except Exception as e:
-            self.alert("Error", str(e))
+        elif job["status"] == "failed":
+            self._finish_job()
+            self.summary_label.setText("Upload failed.")
+            self.alert("Error", job.get("error") or "Upload failed.")
+        else:
+            pct = int(job.get("progress", 0) * 100)
+            self.summary_label.setText(f"Processing {job.get('filename')}... {pct}%")
+
+    def _finish_job(self):
+        self.job_timer.stop()
+        self.job_id = None
+        self.btn_upload.setEnabled(True)
 
     def load_latest(self):
         if not self._ensure_logged_in():
             return
 
-        try:
-            resp = requests.get(
-                f"{API_BASE}/summary/latest/", headers=self._auth_headers()
-            )
-            if resp.status_code == 404:
-                self.summary_label.setText(
-                    "No datasets yet. Upload a CSV first."
-                )
-                return
-            resp.raise_for_status()
-            self.render_summary(resp.json())
-        except Exception as e:
-            self.alert("Error", str(e))
+        def fetch(task):
+            # revalidated against the on-disk cache: unchanged data is a 304
+            try:
+                return self.api.get_json_cached("summary/latest/")[0]
+            except ApiError as e:
+                if e.status == 404:
+                    return None
+                raise
+
+        def show(data):
+            if data is None:
+                self.summary_label.setText("No datasets yet. Upload a CSV first.")
+            else:
+                self.render_summary(data)
+
+        self.btn_refresh.setEnabled(False)
+        task = self.run_task(fetch, on_result=show)
+        task.signals.finished.connect(lambda: self.btn_refresh.setEnabled(True))
 
     def load_history(self):
         if not self._ensure_logged_in():
             return
 
-        try:
-            resp = requests.get(f"{API_BASE}/history/", headers=self._auth_headers())
-            resp.raise_for_status()
-            items = resp.json().get("items", [])
-
-            self.table.setRowCount(0)
-            for it in items:
-                row = self.table.rowCount()
-                self.table.insertRow(row)
-                self.table.setItem(row, 0, QTableWidgetItem(it.get("filename")))
-                self.table.setItem(row, 1, QTableWidgetItem(str(it.get("uploaded_at"))))
-                self.table.setItem(
-                    row, 2, QTableWidgetItem(str(it["summary"]["total_count"]))
-                )
-        except Exception as e:
-            self.alert("Error", str(e))
+        def fetch(task):
+            return self.api.get_json_cached("history/")[0].get("items", [])
+
+        self.btn_history.setEnabled(False)
+        task = self.run_task(fetch, on_result=self.render_history)
+        task.signals.finished.connect(lambda: self.btn_history.setEnabled(True))
+
+    def render_history(self, items):
+        self.table.setRowCount(0)
+        for it in items:
+            row = self.table.rowCount()
+            self.table.insertRow(row)
+            name_item = QTableWidgetItem(it.get("filename"))
+            name_item.setData(Qt.UserRole, it.get("dataset_id"))
+            name_item.setToolTip("Double-click to browse rows; right-click for the PDF report")
+            self.table.setItem(row, 0, name_item)
+            self.table.setItem(row, 1, QTableWidgetItem(str(it.get("uploaded_at"))))
+            self.table.setItem(
+                row, 2, QTableWidgetItem(str(it["summary"]["total_count"]))
+            )
+
+    # ---------- rows ----------
 
-    def download_pdf(self):
+    def load_rows(self, dataset_id):
+        """Browse `dataset_id` (None = latest) in the Rows tab."""
+        if not self._ensure_logged_in():
+            return
+        self.tabs.setCurrentIndex(self.tabs.count() - 1)
+        self.rows_label.setText("Loading...")
+        self.rows_model.load(dataset_id)
+
+    def _open_history_rows(self, row, column):
+        item = self.table.item(row, 0)
+        if item is not None and item.data(Qt.UserRole) is not None:
+            self.load_rows(item.data(Qt.UserRole))
+
+    def _download_history_report(self):
+        item = self.table.item(self.table.currentRow(), 0)
+        if item is not None and item.data(Qt.UserRole) is not None:
+            self.download_pdf(item.data(Qt.UserRole))
+
+    def apply_row_filters(self):
+        if self.rows_model.dataset_id is None:
+            return  # nothing loaded yet
+        self.rows_model.set_filters(
+            self.search_edit.text().strip(), self.type_combo.currentData() or ""
+        )
+
+    def _fetch_rows_page(self, path, on_result, on_error):
+        def fetch(task):
+            return self.api.check(self.api.get(path)).json()
+
+        self.run_task(fetch, on_result=on_result, on_error=on_error)
+
+    def _rows_loaded(self):
+        model = self.rows_model
+        if model.columns:
+            self.rows_label.setText(f"{model.total:,} rows ({PAGE_SIZE} per page)")
+
+    def download_pdf(self, dataset_id=None):
+        """Save the report of `dataset_id` (None = latest)."""
         if not self._ensure_logged_in():
             return
 
         save_path, _ = QFileDialog.getSaveFileName(
             self,
             "Save PDF Report As",
-            "latest_equipment_report.pdf",
+            "latest_equipment_report.pdf" if dataset_id is None
+            else f"equipment_report_{dataset_id}.pdf",
             "PDF Files (*.pdf)",
         )
         if not save_path:
             return
 
-        try:
-            resp = requests.get(
-                f"{API_BASE}/report/latest/",
-                stream=True,
-                headers=self._auth_headers(),
-            )
-            resp.raise_for_status()
-
-            with open(save_path, "wb") as f:
-                for chunk in resp.iter_content(chunk_size=8192):
-                    if chunk:
-                        f.write(chunk)
-
-            self.alert("Report Saved", f"Saved to: {save_path}")
-        except Exception as e:
-            self.alert("Error", str(e))
+        self.btn_pdf.setEnabled(False)
+        task = self.run_task(
+            self.fetch_report, save_path, dataset_id,
+            on_result=lambda path: self.alert("Report Saved", f"Saved to: {path}"),
+            transfer=True,
+        )
+        task.signals.cancelled.connect(
+            lambda: self.summary_label.setText("PDF download cancelled.")
+        )
+        task.signals.finished.connect(lambda: self.btn_pdf.setEnabled(True))
+
+    def fetch_report(self, task, save_path, dataset_id=None):
+        """Stream a report to `save_path` (worker thread)."""
+        task.status("Downloading report...")
+        target = "latest" if dataset_id is None else dataset_id
+        cached = self.api.download_cached(
+            f"report/{target}/", save_path, on_progress=task.progress, check_cancel=task.check
+        )
+        task.status("Report unchanged, saved from cache." if cached else "Report downloaded.")
+        return save_path
 
     # ======================== UI HELPERS ========================
 
@@ -404,18 +844,56 @@ class App(QWidget):
         )
         self.summary_label.setText(text)
 
-        # show bar chart
-        dist = data.get("type_distribution", {})
-        if dist:
-            labels = list(dist.keys())
-            values = list(dist.values())
-            plt.figure()
-            plt.bar(labels, values, color=["#FFF58A", "#FFBBE1", "#DD7BDF", "#B3BFFF"])
-            plt.title("Equipment Type Distribution")
-            plt.xlabel("Type")
-            plt.ylabel("Count")
-            plt.tight_layout()
-            plt.show()
+        types = list(data.get("type_distribution", {}))
+        if types != [self.type_combo.itemData(i) for i in range(1, self.type_combo.count())]:
+            self.type_combo.blockSignals(True)
+            current = self.type_combo.currentData()
+            self.type_combo.clear()
+            self.type_combo.addItem("All types", "")
+            for t in types:
+                self.type_combo.addItem(str(t), t)
+            self.type_combo.setCurrentIndex(max(self.type_combo.findData(current), 0))
+            self.type_combo.blockSignals(False)
+
+        self.charts.update_types(data.get("type_distribution", {}))
+        self.charts.refresh()
+        if data.get("dataset_id") is not None:
+            self.load_charts(data["dataset_id"])
+
+    def load_charts(self, dataset_id):
+        """Fetch histogram aggregates (a few KB, ETag-cached) for the charts."""
+        def fetch(task):
+            path = f"dataset/{dataset_id}/aggregates/?bins={HIST_BINS}&points=0"
+            return self.api.get_json_cached(path)[0]
+
+        def show(data):
+            self.charts.update_histograms(data.get("histograms", {}))
+            self.charts.refresh()
+
+        self.run_task(fetch, on_result=show)
+
+
+def _file_sha256(path, task=None):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            if task is not None:
+                task.check()
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _load_resume():
+    try:
+        with open(RESUME_FILE) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _save_resume(saved):
+    with open(RESUME_FILE, "w") as f:
+        json.dump(saved, f)
 
 
 if __name__ == "__main__":
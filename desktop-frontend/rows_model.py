@@ -0,0 +1,148 @@
+# desktop-frontend/rows_model.py
+"""
+Lazily paged table model for dataset rows.
+
+Rows are fetched from /dataset/<id>/rows/ one page at a time, only when the
+view asks for a cell on that page, and at most MAX_PAGES pages are kept, so
+scrolling through a million-row dataset holds a bounded number of rows in
+memory. Sorting and filtering are done by the server; changing either just
+resets the model.
+"""
+from collections import OrderedDict
+from urllib.parse import urlencode
+
+from PyQt5.QtCore import QAbstractTableModel, QModelIndex, Qt
+
+PAGE_SIZE = 200
+MAX_PAGES = 25
+
+
+class RowsModel(QAbstractTableModel):
+    """
+    `fetch(path, on_result, on_error)` must GET `path` asynchronously and
+    call back on the GUI thread (App.run_task does exactly that).
+    """
+
+    def __init__(self, fetch, parent=None):
+        super().__init__(parent)
+        self._fetch = fetch
+        self.dataset_id = None
+        self.columns = []
+        self.total = 0
+        self.sort_field = None
+        self.descending = False
+        self.search = ""
+        self.type_filter = ""
+        self._pages = OrderedDict()  # page number -> list of row dicts (LRU)
+        self._pending = set()
+        self._generation = 0  # bumps on reset; late pages from before are dropped
+
+    # ---------- view state ----------
+
+    def load(self, dataset_id=None):
+        """(Re)load from the first page; None means the latest dataset."""
+        self.dataset_id = dataset_id
+        self._reset()
+
+    def set_filters(self, search="", type_filter=""):
+        self.search, self.type_filter = search, type_filter
+        self._reset()
+
+    def sort(self, column, order=Qt.AscendingOrder):
+        if not 0 <= column < len(self.columns):
+            return
+        self.sort_field = self.columns[column]
+        self.descending = order == Qt.DescendingOrder
+        self._reset()
+
+    def _reset(self):
+        self.beginResetModel()
+        self._generation += 1
+        self._pages.clear()
+        self._pending.clear()
+        self.total = 0
+        self.endResetModel()
+        self._request(0)
+
+    # ---------- paging ----------
+
+    def _path(self, page):
+        target = "latest" if self.dataset_id is None else self.dataset_id
+        params = {"offset": page * PAGE_SIZE, "limit": PAGE_SIZE}
+        if self.sort_field:
+            params["sort"] = ("-" if self.descending else "") + self.sort_field
+        if self.search:
+            params["search"] = self.search
+        if self.type_filter:
+            params["type"] = self.type_filter
+        return f"dataset/{target}/rows/?{urlencode(params)}"
+
+    def _request(self, page):
+        if page in self._pending:
+            return
+        self._pending.add(page)
+        generation = self._generation
+        self._fetch(
+            self._path(page),
+            lambda data: self._page_loaded(generation, page, data),
+            lambda msg: self._pending.discard(page),
+        )
+
+    def _page_loaded(self, generation, page, data):
+        if generation != self._generation:
+            return
+        self._pending.discard(page)
+        self._pages[page] = data["rows"]
+        self._pages.move_to_end(page)
+        while len(self._pages) > MAX_PAGES:
+            self._pages.popitem(last=False)
+
+        if self.dataset_id is None or data["columns"] != self.columns \
+                or data["total_rows"] != self.total:
+            # first page: pin the dataset so later pages come from the same one
+            self.beginResetModel()
+            self.dataset_id = data["dataset_id"]
+            self.columns = data["columns"]
+            self.total = data["total_rows"]
+            self.endResetModel()
+            return
+
+        first = page * PAGE_SIZE
+        last = min(first + len(data["rows"]), self.total) - 1
+        if last >= first:
+            self.dataChanged.emit(
+                self.index(first, 0), self.index(last, len(self.columns) - 1)
+            )
+
+    # ---------- QAbstractTableModel ----------
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else self.total
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.columns)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid() or role not in (Qt.DisplayRole, Qt.TextAlignmentRole):
+            return None
+        page, offset = divmod(index.row(), PAGE_SIZE)
+        rows = self._pages.get(page)
+        if rows is None:
+            self._request(page)
+            return "…" if role == Qt.DisplayRole else None
+        self._pages.move_to_end(page)
+        if offset >= len(rows):
+            return None
+        value = rows[offset].get(self.columns[index.column()])
+        if role == Qt.TextAlignmentRole:
+            return int(Qt.AlignRight | Qt.AlignVCenter) if isinstance(value, float) else None
+        if value is None:
+            return ""
+        return f"{value:.4g}" if isinstance(value, float) else str(value)
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if role != Qt.DisplayRole:
+            return None
+        if orientation == Qt.Horizontal:
+            return self.columns[section] if section < len(self.columns) else None
+        return str(section + 1)
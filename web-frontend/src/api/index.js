@@ -4,12 +4,196 @@ const api = axios.create({
   baseURL: process.env.REACT_APP_API_BASE || "http://127.0.0.1:8000/api",
 });
 
+let currentToken = null;
+
 export function setAuthToken(token) {
+  currentToken = token || null;
   if (token) {
     api.defaults.headers.common["Authorization"] = `Token ${token}`;
   } else {
     delete api.defaults.headers.common["Authorization"];
+    closeEvents();
   }
 }
 
 export default api;
+
+// Fetch one page of raw rows; only the requested range/columns are read server-side.
+// sort ("-" prefix = descending), search and type are applied by the server.
+export function fetchRows(datasetId, { offset = 0, limit = 50, fields, sort, search, type } = {}) {
+  const params = { offset, limit };
+  if (fields && fields.length) params.fields = fields.join(",");
+  if (sort) params.sort = sort;
+  if (search) params.search = search;
+  if (type) params.type = type;
+  return api.get(`/dataset/${datasetId}/rows/`, { params });
+}
+
+// Chart aggregates (histograms, per-Type box stats, downsampled series);
+// the payload size depends on bins/points, not on the dataset size.
+export function fetchAggregates(datasetId, { bins = 20, points = 500, method = "lttb", fields } = {}) {
+  const params = { bins, points, method };
+  if (fields && fields.length) params.fields = fields.join(",");
+  const target = datasetId == null ? "latest" : datasetId;
+  return api.get(`/dataset/${target}/aggregates/`, { params });
+}
+
+// Full PDF report (charts plus every row); datasetId null means the latest.
+export function fetchReport(datasetId, { onDownloadProgress } = {}) {
+  const target = datasetId == null ? "latest" : datasetId;
+  return api.get(`/report/${target}/`, { responseType: "blob", onDownloadProgress });
+}
+
+const CHUNK_SIZE = 8 * 1024 * 1024;
+const PART_RETRIES = 3;
+
+async function sha256Hex(buffer) {
+  const digest = await crypto.subtle.digest("SHA-256", buffer);
+  return Array.from(new Uint8Array(digest))
+    .map((b) => b.toString(16).padStart(2, "0"))
+    .join("");
+}
+
+function sleep(ms) {
+  return new Promise((resolve) => setTimeout(resolve, ms));
+}
+
+// Server-sent events (dataset.created / dataset.updated / job.progress /
+// job.finished). One EventSource is shared by all subscribers; it reconnects
+// on its own and the server replays what was missed. Returns an unsubscribe
+// function.
+const EVENT_TYPES = ["dataset.created", "dataset.updated", "job.progress", "job.finished"];
+let eventSource = null;
+const eventListeners = new Set();
+
+export function subscribeEvents(onEvent) {
+  if (!currentToken || typeof EventSource === "undefined") return () => {};
+  if (!eventSource) {
+    const token = encodeURIComponent(currentToken);
+    eventSource = new EventSource(`${api.defaults.baseURL}/events/?token=${token}`);
+    EVENT_TYPES.forEach((type) =>
+      eventSource.addEventListener(type, (e) => {
+        const data = JSON.parse(e.data);
+        eventListeners.forEach((fn) => fn(type, data));
+      })
+    );
+  }
+  eventListeners.add(onEvent);
+  return () => {
+    eventListeners.delete(onEvent);
+    if (!eventListeners.size) closeEvents();
+  };
+}
+
+function closeEvents() {
+  if (eventSource) {
+    eventSource.close();
+    eventSource = null;
+  }
+}
+
+function eventsConnected() {
+  return eventSource !== null && eventSource.readyState === EventSource.OPEN;
+}
+
+// Wait for a background job; resolves with the dataset summary. Progress and
+// completion arrive as events; the job is only polled as a slow fallback
+// (or every second when no event stream is available).
+export function waitForJob(jobId, { onProgress, fallbackMs = 5000, pollMs = 1000 } = {}) {
+  return new Promise((resolve, reject) => {
+    let done = false;
+    let timer = null;
+    let unsubscribe = () => {};
+
+    const finish = (settle, value) => {
+      if (done) return;
+      done = true;
+      clearTimeout(timer);
+      unsubscribe();
+      settle(value);
+    };
+
+    const check = async () => {
+      clearTimeout(timer);
+      try {
+        const { data } = await api.get(`/jobs/${jobId}/`);
+        if (data.status === "succeeded") return finish(resolve, data.result);
+        if (data.status === "failed") {
+          return finish(reject, new Error(data.error || "Processing failed."));
+        }
+        if (onProgress) onProgress({ phase: "processing", fraction: data.progress });
+      } catch (err) {
+        return finish(reject, err);
+      }
+      if (!done) timer = setTimeout(check, eventsConnected() ? fallbackMs : pollMs);
+    };
+
+    unsubscribe = subscribeEvents((type, data) => {
+      if (data.job_id !== jobId) return;
+      if (type === "job.progress" && onProgress) {
+        onProgress({ phase: "processing", fraction: data.progress });
+      } else if (type === "job.finished") {
+        check(); // fetch the final result
+      }
+    });
+    check();
+  });
+}
+
+// Resumable chunked upload: parts already on the server (e.g. before a
+// dropped connection or page reload) are skipped. Resolves with the summary.
+export async function uploadChunked(file, { chunkSize = CHUNK_SIZE, onProgress } = {}) {
+  const resumeKey = `upload:${file.name}:${file.size}:${file.lastModified}`;
+  let session = null;
+
+  const savedId = localStorage.getItem(resumeKey);
+  if (savedId) {
+    try {
+      const { data } = await api.get(`/uploads/${savedId}/`);
+      if (!data.completed) session = data;
+    } catch (e) {
+      // unknown/expired upload id: start over
+    }
+  }
+  if (!session) {
+    const { data } = await api.post("/uploads/", {
+      filename: file.name,
+      size: file.size,
+      chunk_size: chunkSize,
+    });
+    session = data;
+    localStorage.setItem(resumeKey, String(session.upload_id));
+  }
+
+  const have = new Set(session.received_parts);
+  for (let part = 1; part <= session.total_parts; part++) {
+    if (!have.has(part)) {
+      const start = (part - 1) * session.chunk_size;
+      const body = await file.slice(start, start + session.chunk_size).arrayBuffer();
+      const checksum = await sha256Hex(body);
+      for (let attempt = 1; ; attempt++) {
+        try {
+          await api.put(`/uploads/${session.upload_id}/parts/${part}/`, body, {
+            headers: {
+              "Content-Type": "application/octet-stream",
+              "X-Chunk-SHA256": checksum,
+            },
+          });
+          break;
+        } catch (err) {
+          if (attempt >= PART_RETRIES) throw err;
+          await sleep(500 * 2 ** attempt);
+        }
+      }
+    }
+    if (onProgress) onProgress({ phase: "uploading", fraction: part / session.total_parts });
+  }
+
+  const { data } = await api.post(`/uploads/${session.upload_id}/complete/`, {
+    async: "1",
+  });
+  // a failed ingest leaves the upload open, so a retry resumes it
+  const result = await waitForJob(data.job_id, { onProgress });
+  localStorage.removeItem(resumeKey);
+  return result;
+}
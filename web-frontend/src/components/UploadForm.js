@@ -1,15 +1,12 @@
 // src/components/UploadForm.js
 import React, { useState } from "react";
-import api from "../api/index";
-
-console.log("API base:", process.env.REACT_APP_API_BASE);
-console.log("Has post:", typeof api.post);
-
+import { uploadChunked } from "../api/index";
 
 export default function UploadForm({ onUploaded }) {
   const [file, setFile] = useState(null);
   const [busy, setBusy] = useState(false);
   const [error, setError] = useState("");
+  const [progress, setProgress] = useState(null);
 
   const handleUpload = async (e) => {
     e.preventDefault();
@@ -18,13 +15,10 @@ export default function UploadForm({ onUploaded }) {
       setError("Please choose a CSV file.");
       return;
     }
-    const form = new FormData();
-    form.append("file", file);
     try {
       setBusy(true);
-      await api.post("/upload/", form, {
-        headers: { "Content-Type": "multipart/form-data" },
-      });
+      // chunked + resumable: re-submitting after a failure skips parts already sent
+      await uploadChunked(file, { onProgress: setProgress });
       setFile(null);
       if (onUploaded) onUploaded();
     } catch (err) {
@@ -32,6 +26,7 @@ export default function UploadForm({ onUploaded }) {
       setError(msg);
     } finally {
       setBusy(false);
+      setProgress(null);
     }
   };
 
@@ -47,6 +42,12 @@ export default function UploadForm({ onUploaded }) {
         <button type="submit" disabled={busy}>
           {busy ? "Uploading..." : "Upload"}
         </button>
+        {progress && (
+          <span className="muted">
+            {progress.phase === "uploading" ? "Uploading" : "Processing"}{" "}
+            {Math.round((progress.fraction || 0) * 100)}%
+          </span>
+        )}
         {file && <span className="muted">{file.name}</span>}
       </div>
       {error && <div className="error">{error}</div>}
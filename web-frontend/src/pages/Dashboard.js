@@ -1,6 +1,6 @@
 // src/pages/Dashboard.js
 import React, { useEffect, useState, useCallback } from "react";
-import api, { setAuthToken } from "../api";   // <-- import setAuthToken
+import api, { fetchReport, setAuthToken, subscribeEvents } from "../api";   // <-- import setAuthToken
 import UploadForm from "../components/UploadForm";
 import SummaryCards from "../components/SummaryCards";
 import TypeBarChart from "../components/TypeBarChart";
@@ -52,12 +52,19 @@ export default function Dashboard({ authUser, onLogout }) {
     load();
   }, [load]);
 
+  // new or changed datasets are pushed by the server; no polling needed
+  useEffect(
+    () =>
+      subscribeEvents((type) => {
+        if (type === "dataset.created" || type === "dataset.updated") load();
+      }),
+    [load]
+  );
+
   const handleDownloadPdf = async () => {
     setError("");
     try {
-      const res = await api.get("/report/latest/", {
-        responseType: "blob",
-      });
+      const res = await fetchReport(null);
 
       const blob = new Blob([res.data], { type: "application/pdf" });
       const url = window.URL.createObjectURL(blob);